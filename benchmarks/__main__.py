@@ -0,0 +1,118 @@
+"""
+Generates synthetic oozie repository and times parsing, schema imports and store lookups on it:
+
+    python -m benchmarks --scale 1 --output bench.json
+
+Result is written as json, so runs can be compared over time
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import shutil
+import sys
+import tempfile
+from datetime import datetime
+from time import perf_counter
+from typing import List, Dict, Any, Callable
+
+from benchmarks.generator import generate_repository
+from jobs import run_job, hive_schema_job, impala_schema_job, workflows_job
+from parsing_tool import parse_workflows_coroutine, HqlParseCache
+from store import Store, Table, Workflow
+
+# size of repository hive_structure.csv and impala-schema.csv
+BASE_TABLES_COUNT: int = 4939
+BASE_WORKFLOWS_COUNT: int = 500
+
+
+def parse_args(argv: List[str]) -> argparse.Namespace:
+    parser: argparse.ArgumentParser = argparse.ArgumentParser(prog='python -m benchmarks', description=__doc__,
+                                                              formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--scale', type=float, default=1,
+                        help=f'multiplier of {BASE_TABLES_COUNT} tables and {BASE_WORKFLOWS_COUNT} workflows')
+    parser.add_argument('--tables', type=int, default=None, help='number of tables, overrides scale')
+    parser.add_argument('--workflows', type=int, default=None, help='number of workflows, overrides scale')
+    parser.add_argument('--seed', type=int, default=0, help='seed of generated repository and samples')
+    parser.add_argument('--processes', type=int, default=None,
+                        help='number of parallel parsing processes, default number of cpus')
+    parser.add_argument('--samples', type=int, default=200,
+                        help='number of tables and workflows populated by store benchmarks')
+    parser.add_argument('--output', default=None, help='json file, default stdout')
+    parser.add_argument('--keep', default=None, help='directory to keep generated repository and database in')
+    return parser.parse_args(argv)
+
+
+def timed(seconds: Dict[str, float], name: str, func: Callable[[], Any]) -> Any:
+    started: float = perf_counter()
+    result: Any = func()
+    seconds[name] = round(perf_counter() - started, 4)
+    return result
+
+
+def main(argv: List[str] = None) -> int:
+    args: argparse.Namespace = parse_args(sys.argv[1:] if argv is None else argv)
+    tables_count: int = args.tables or int(BASE_TABLES_COUNT * args.scale)
+    workflows_count: int = args.workflows or int(BASE_WORKFLOWS_COUNT * args.scale)
+    root: str = args.keep or tempfile.mkdtemp(prefix='oozie_benchmark_')
+    os.makedirs(root, exist_ok=True)
+    seconds: Dict[str, float] = {}
+    per_call_ms: Dict[str, float] = {}
+    try:
+        paths: Dict[str, str] = timed(seconds, 'generate', lambda: generate_repository(
+            root, workflows_count, tables_count, seed=args.seed))
+        db_name: str = os.path.join(root, 'benchmark.sqlite3')
+        if os.path.exists(db_name):
+            os.remove(db_name)
+        store: Store = Store(db_name)
+        timed(seconds, 'import_hive_schema', lambda: run_job(store, hive_schema_job(paths['hive_schema'])))
+        timed(seconds, 'import_impala_schema', lambda: run_job(store, impala_schema_job(paths['impala_schema'])))
+
+        table_id_name_pairs = store.get_tables(id_name_pairs=True)
+        for name, processes in (('parse_serial', 1), ('parse_parallel', args.processes)):
+            timed(seconds, name, lambda: run_job(store, lambda _: parse_workflows_coroutine(
+                paths['workflows'], table_id_name_pairs, processes=processes, hql_cache=HqlParseCache())))
+        timed(seconds, 'workflows_job', lambda: run_job(store, workflows_job(paths['workflows'], args.processes)))
+        timed(seconds, 'workflows_job_unchanged', lambda: run_job(
+            store, workflows_job(paths['workflows'], args.processes)))
+
+        rnd: random.Random = random.Random(args.seed)
+        tables: List[Table] = timed(seconds, 'get_tables', lambda: store.get_tables())
+        timed(seconds, 'get_unplugged_tables', lambda: store.get_tables(only_unplugged=True, only_names=True))
+        workflows: List[Workflow] = timed(seconds, 'get_workflows', lambda: store.get_workflows())
+        samples: Dict[str, List[Any]] = {
+            'populate_table_data': rnd.sample(tables, min(args.samples, len(tables))),
+            'populate_workflow_data': rnd.sample(workflows, min(args.samples, len(workflows))),
+        }
+        for name, func in (('populate_table_data', store.populate_table_data),
+                           ('populate_workflow_data', store.populate_workflow_data)):
+            timed(seconds, name, lambda: [func(s) for s in samples[name]])
+            per_call_ms[name] = round(seconds[name] / max(len(samples[name]), 1) * 1000, 3)
+            timed(seconds, f'{name}_cached', lambda: [func(s) for s in samples[name]])
+            per_call_ms[f'{name}_cached'] = round(seconds[f'{name}_cached'] / max(len(samples[name]), 1) * 1000, 3)
+        report: Dict[str, Any] = {
+            'timestamp': datetime.now().isoformat(timespec='seconds'),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'parameters': {'tables': tables_count, 'workflows': workflows_count, 'seed': args.seed,
+                           'processes': args.processes or os.cpu_count(), 'samples': args.samples},
+            'seconds': seconds,
+            'per_call_ms': per_call_ms,
+            'rows': store.get_row_counts(),
+            'cache': store.cache_stats(),
+        }
+        store.close()
+    finally:
+        if args.keep is None:
+            shutil.rmtree(root, ignore_errors=True)
+    if args.output:
+        with open(args.output, 'w') as file:
+            json.dump(report, file, indent=2)
+    else:
+        print(json.dumps(report, indent=2))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
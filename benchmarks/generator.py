@@ -0,0 +1,167 @@
+"""
+Synthetic oozie repository: workflows directories with job.properties, workflow.xml and hive scripts, plus hive and
+impala schema csv files, which describe the same tables
+"""
+import csv
+import os
+import random
+from typing import List, Tuple, Dict
+
+SCHEMAS: List[str] = ['dm', 'rev', 'src', 'srcmgd', 'stg', 'tmp_data_dm', 'ods', 'mart', 'raw', 'sandbox', 'arch']
+WORDS: List[str] = ['account', 'order', 'client', 'event', 'payment', 'session', 'product', 'contact', 'invoice',
+                    'campaign', 'lead', 'churn', 'cohort', 'attribution', 'phone', 'page', 'daily', 'monthly',
+                    'report', 'snapshot', 'value', 'detail', 'summary', 'map', 'history', 'agg', 'click', 'visit']
+# column types with weights close to impala-schema.csv
+COLUMN_TYPES: List[Tuple[str, int]] = [('string', 48), ('int', 24), ('bigint', 11), ('double', 7),
+                                       ('decimal(20,2)', 4), ('tinyint', 1), ('float', 1), ('decimal(38,10)', 1),
+                                       ('timestamp', 1)]
+NAMESPACE: str = 'uri:oozie:workflow:0.5'
+
+# (schema, table, [(column, type)])
+SchemaTable = Tuple[str, str, List[Tuple[str, str]]]
+
+
+def generate_schema(tables_count: int, rnd: random.Random) -> List[SchemaTable]:
+    """
+    Generates tables with unique names and columns
+    :param tables_count: number of tables
+    :param rnd: random generator
+    :return: list of (schema, table, [(column, type)])
+    """
+    types: List[str] = [t for t, w in COLUMN_TYPES for _ in range(w)]
+    tables: List[SchemaTable] = []
+    for i in range(tables_count):
+        schema: str = rnd.choice(SCHEMAS)
+        table: str = '_'.join(rnd.sample(WORDS, rnd.randint(1, 3))) + f'_{i}'
+        columns: List[Tuple[str, str]] = [('id', 'bigint')] + [
+            (f'{rnd.choice(WORDS)}_{j}', rnd.choice(types)) for j in range(rnd.randint(3, 24))
+        ]
+        tables.append((schema, table, columns))
+    return tables
+
+
+def write_hive_schema(path: str, tables: List[SchemaTable]) -> None:
+    with open(path, 'w', newline='') as file:
+        writer = csv.writer(file)
+        writer.writerow(['schema_name', 'table_name'])
+        writer.writerows((t[0], t[1]) for t in tables)
+
+
+def write_impala_schema(path: str, tables: List[SchemaTable]) -> None:
+    with open(path, 'w', newline='') as file:
+        writer = csv.writer(file)
+        writer.writerow(['schema_name', 'table_name', 'field_name', 'field_type'])
+        writer.writerows((t[0], t[1], c[0], c[1]) for t in tables for c in t[2])
+
+
+def table_reference(table: SchemaTable, variables: Dict[str, str]) -> str:
+    """
+    Table name as it is written in script, schema is replaced with job.properties variable if there is one
+    """
+    for name, value in variables.items():
+        if value == table[0]:
+            return f'${{{name}}}.{table[1]}'
+    return f'{table[0]}.{table[1]}'
+
+
+def generate_hql(rnd: random.Random, target: SchemaTable, sources: List[SchemaTable],
+                 variables: Dict[str, str]) -> str:
+    """
+    Generates hive script, which creates target table and fills it from sources with INSERT and WITH ... INSERT
+    """
+    target_name: str = table_reference(target, variables)
+    source_names: List[str] = [table_reference(s, variables) for s in sources]
+    columns: str = ',\n    '.join(f'{c[0]} {c[1]}' for c in target[2][:8])
+    statements: List[str] = [
+        f'-- {target[1]} is built from {len(sources)} tables\n'
+        'set hive.exec.dynamic.partition.mode=nonstrict;\n'
+        'set hive.exec.dynamic.partition=true;',
+        f'CREATE TABLE IF NOT EXISTS {target_name} (\n    {columns}\n)\n'
+        'PARTITIONED BY (dt string)\nSTORED AS ORC;',
+    ]
+    if len(sources) > 1:
+        statements.append(
+            f'INSERT OVERWRITE TABLE {target_name} PARTITION (dt = \'${{date}}\')\n'
+            f'SELECT a.id, b.{sources[1][2][-1][0]}, \'a;b\' AS marker /* not a statement end; */\n'
+            f'FROM {source_names[0]} a\nJOIN {source_names[1]} b ON a.id = b.id\n'
+            f'WHERE a.{sources[0][2][-1][0]} IS NOT NULL;'
+        )
+    statements.append(
+        f'WITH src AS (\n    SELECT id, CASE WHEN id > 0 THEN 1 ELSE 0 END AS flag\n'
+        f'    FROM {source_names[-1]}\n)\n'
+        f'INSERT INTO TABLE {target_name} PARTITION (dt = \'${{date}}\')\nSELECT * FROM src;'
+    )
+    if rnd.random() < 0.3:
+        statements.append(f'ANALYZE TABLE {target_name} COMPUTE STATISTICS;')
+    return '\n\n'.join(statements) + '\n'
+
+
+def generate_repository(root: str, workflows_count: int, tables_count: int, seed: int = 0,
+                        shared_scripts_count: int = 10) -> Dict[str, str]:
+    """
+    Generates synthetic oozie repository, workflows build tables only from tables with lower indexes,
+    so lineage is acyclic and has depth
+    :param root: directory to generate in
+    :param workflows_count: number of workflows
+    :param tables_count: number of tables in schema
+    :param seed: random seed, the same seed gives the same repository
+    :param shared_scripts_count: number of scripts shared by workflows
+    :return: {'workflows': dir, 'hive_schema': path, 'impala_schema': path} dict
+    """
+    rnd: random.Random = random.Random(seed)
+    tables: List[SchemaTable] = generate_schema(tables_count, rnd)
+    paths: Dict[str, str] = {
+        'workflows': os.path.join(root, 'workflows'),
+        'hive_schema': os.path.join(root, 'hive_structure.csv'),
+        'impala_schema': os.path.join(root, 'impala-schema.csv'),
+    }
+    write_hive_schema(paths['hive_schema'], tables)
+    write_impala_schema(paths['impala_schema'], tables)
+
+    def sources_of(target_index: int) -> List[SchemaTable]:
+        return [tables[rnd.randrange(max(target_index, 1))] for _ in range(rnd.randint(1, 4))]
+
+    shared_dir: str = os.path.join(paths['workflows'], 'shared')
+    os.makedirs(shared_dir, exist_ok=True)
+    for i in range(shared_scripts_count):
+        target_index: int = rnd.randrange(tables_count)
+        with open(os.path.join(shared_dir, f'common_{i}.hql'), 'w') as file:
+            file.write(generate_hql(rnd, tables[target_index], sources_of(target_index), {}))
+    for w in range(workflows_count):
+        name: str = f'wf_{"_".join(rnd.sample(WORDS, 2))}_{w}'
+        path: str = os.path.join(paths['workflows'], name)
+        os.makedirs(path, exist_ok=True)
+        variables: Dict[str, str] = {'target_schema': rnd.choice(SCHEMAS), 'source_schema': rnd.choice(SCHEMAS)}
+        with open(os.path.join(path, 'job.properties'), 'w') as file:
+            file.write('# generated\nnameNode=hdfs://nameservice\njobTracker=yarn:8032\ndb=src\n')
+            file.write(''.join(f'{k}={v}\n' for k, v in variables.items()))
+            file.write('oozie.wf.application.path=${nameNode}/apps/' + name + '\n')
+        actions: List[str] = []
+        if w % 4 == 0:
+            sqooped: str = f'{rnd.choice(WORDS)}_sq_{w % 97}'
+            actions.append(
+                '<sqoop xmlns="uri:oozie:sqoop-action:0.2"><job-tracker>${jobTracker}</job-tracker>'
+                '<name-node>${nameNode}</name-node><arg>import</arg><arg>--connect</arg><arg>jdbc:x</arg>'
+                f'<arg>--hive-import</arg><arg>--hive-database</arg><arg>${{db}}</arg>'
+                f'<arg>--hive-table</arg><arg>{sqooped}</arg></sqoop>'
+            )
+        for s in range(rnd.randint(1, 4)):
+            if shared_scripts_count and rnd.random() < 0.1:
+                script: str = f'../shared/common_{rnd.randrange(shared_scripts_count)}.hql'
+            else:
+                script: str = f'script_{s}.hql'
+                target_index: int = rnd.randrange(tables_count)
+                with open(os.path.join(path, script), 'w') as file:
+                    file.write(generate_hql(rnd, tables[target_index], sources_of(target_index), variables))
+            actions.append(
+                '<hive xmlns="uri:oozie:hive-action:0.2"><job-tracker>${jobTracker}</job-tracker>'
+                f'<name-node>${{nameNode}}</name-node><script>{script}</script>'
+                '<param>date=${date}</param></hive>'
+            )
+        with open(os.path.join(path, 'workflow.xml'), 'w') as file:
+            file.write(f'<workflow-app xmlns="{NAMESPACE}" name="{name}">\n<start to="action_0"/>\n')
+            for i, action in enumerate(actions):
+                next_action: str = f'action_{i + 1}' if i + 1 < len(actions) else 'end'
+                file.write(f'<action name="action_{i}">{action}<ok to="{next_action}"/><error to="kill"/></action>\n')
+            file.write('<kill name="kill"><message>failed</message></kill>\n<end name="end"/>\n</workflow-app>\n')
+    return paths
@@ -0,0 +1,128 @@
+"""
+Headless entry point, runs imports and workflows parse into database without Qt:
+
+    python -m cli -d db.sqlite3 hive schema.txt impala impala-schema.csv workflows path/to/workflows
+
+Lineage queries take table or workflow name instead of path and can follow imports:
+
+    python -m cli -d db.sqlite3 upstream dm.table downstream dm.table dependencies workflow dependents workflow
+
+Commands run in the given order, summary of each one is printed to stdout as a json line,
+with --profile time of phases and the slowest workflows and scripts are printed last
+"""
+import argparse
+import json
+import sys
+
+import profiling
+from time import perf_counter
+from typing import List, Tuple, Dict, Any, Union
+
+from jobs import Job, hive_schema_job, impala_schema_job, workflows_job, run_job
+from lineage import LineageGraph
+from parsing_tool import HQL_BACKENDS
+from store import Store, CONNECTION_PROFILES
+
+
+JOB_COMMANDS: Tuple[str, ...] = ('hive', 'impala', 'workflows')
+LINEAGE_COMMANDS: Tuple[str, ...] = ('upstream', 'downstream', 'dependencies', 'dependents')
+
+
+def query_lineage(lineage: LineageGraph, command: str, name: str) -> Dict[str, int]:
+    """
+    :return: {name: depth} dict of tables or workflows found by lineage command
+    """
+    if command == 'upstream':
+        return lineage.upstream(name)
+    if command == 'downstream':
+        return lineage.downstream(name)
+    return lineage.workflow_dependencies(name, max_depth=None, dependents=command == 'dependents')
+
+
+def parse_args(argv: List[str]) -> argparse.Namespace:
+    parser: argparse.ArgumentParser = argparse.ArgumentParser(prog='python -m cli', description=__doc__,
+                                                              formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('-d', '--db', default='db.sqlite3', help='database file, default db.sqlite3')
+    parser.add_argument('-p', '--processes', type=int, default=None,
+                        help='number of workflow parsing processes, default number of cpus')
+    parser.add_argument('--hql-backend', choices=sorted(HQL_BACKENDS), default='fast',
+                        help='hql statements splitter, default fast')
+    parser.add_argument('--bulk-profile', choices=sorted(set(CONNECTION_PROFILES) - {'default'}), default='bulk',
+                        help='sqlite settings of imports and parse runs, safe keeps default ones, default bulk')
+    parser.add_argument('--clear', action='store_true', help='clear database before running commands')
+    parser.add_argument('--profile', action='store_true',
+                        help='print time of parse and store phases with the slowest workflows and scripts')
+    parser.add_argument('--profile-top', type=int, default=10, metavar='N',
+                        help='number of the slowest workflows and scripts in profile, default 10')
+    parser.add_argument('commands', nargs='+', metavar='COMMAND PATH',
+                        help='pairs of hive <schema.txt>, impala <schema.csv>, workflows <directory>, '
+                             'upstream <table>, downstream <table>, dependencies <workflow> or dependents <workflow>')
+    args: argparse.Namespace = parser.parse_args(argv)
+    if len(args.commands) % 2:
+        parser.error('every command needs a path')
+    for command in args.commands[::2]:
+        if command not in JOB_COMMANDS + LINEAGE_COMMANDS:
+            parser.error(f'unknown command {command}')
+    return args
+
+
+def main(argv: List[str] = None) -> int:
+    args: argparse.Namespace = parse_args(sys.argv[1:] if argv is None else argv)
+    if args.profile:
+        profiling.enable(args.profile_top)
+    started: float = perf_counter()
+    store: Store = Store(args.db, args.bulk_profile)
+    if args.clear:
+        store.create_db_tables(force=True)
+    commands: List[Tuple[str, str]] = list(zip(args.commands[::2], args.commands[1::2]))
+    lineage: Union[LineageGraph, None] = None
+    for command, path in commands:
+        if command in LINEAGE_COMMANDS:
+            job_started: float = perf_counter()
+            if lineage is None:
+                lineage = LineageGraph.from_store(store)
+            try:
+                result: Any = query_lineage(lineage, command, path)
+            except KeyError:
+                result: Any = None
+            summary: Dict[str, Any] = {
+                'command': command,
+                'name': path,
+                'seconds': round(perf_counter() - job_started, 3),
+                'result': result,
+            }
+            print(json.dumps(summary), flush=True)
+            continue
+        if command == 'hive':
+            job: Job = hive_schema_job(path)
+        elif command == 'impala':
+            job: Job = impala_schema_job(path)
+        else:
+            job: Job = workflows_job(path, args.processes, args.hql_backend)
+        job_started: float = perf_counter()
+        result: Any = run_job(store, job)
+        if lineage is not None:
+            lineage.refresh(store)
+        summary: Dict[str, Any] = {
+            'command': command,
+            'path': path,
+            'seconds': round(perf_counter() - job_started, 3),
+            'result': result,
+        }
+        print(json.dumps(summary), flush=True)
+    summary: Dict[str, Any] = {
+        'command': 'total',
+        'seconds': round(perf_counter() - started, 3),
+        'status': store.get_db_status(),
+        'rows': store.get_row_counts(),
+    }
+    print(json.dumps(summary), flush=True)
+    profiler: profiling.Profiler = profiling.disable()
+    if profiler is not None:
+        print(json.dumps({'command': 'profile', **profiler.report()}), flush=True)
+    store.close()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
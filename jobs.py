@@ -0,0 +1,67 @@
+from typing import Callable, Generator, Any, List, Tuple
+
+from parsing_tool import parse_workflows_coroutine, read_hive_schema, read_impala_schema, HqlParseCache
+from store import Store
+
+# Job takes Store with own connection, yields progress in percents and returns its result,
+# jobs write under bulk connection profile of the store
+Job = Callable[[Store], Generator[int, None, Any]]
+
+
+def run_job(store: Store, job: Job) -> Any:
+    """
+    Runs job to the end in current thread
+    :param store: store
+    :param job: job
+    :return: job result
+    """
+    gen = job(store)
+    try:
+        while True:
+            next(gen)
+    except StopIteration as e:
+        return e.value
+
+
+def hive_schema_job(schema_filepath: str) -> Job:
+    def job(store: Store) -> Generator[int, None, int]:
+        with store.bulk():
+            return (yield from store.import_tables_coroutine(read_hive_schema(schema_filepath)))
+
+    return job
+
+
+def impala_schema_job(schema_filepath: str) -> Job:
+    def job(store: Store) -> Generator[int, None, int]:
+        with store.bulk():
+            return (yield from store.import_table_columns_coroutine(read_impala_schema(schema_filepath)))
+
+    return job
+
+
+def workflows_job(directory_path: str, processes: int = None, hql_backend: str = 'fast') -> Job:
+    """
+    Parses changed workflows of directory and replaces their relations in the store batch by batch,
+    interrupted job is resumed from the last inserted batch by the next one
+    :param directory_path: directory with workflows
+    :param processes: number of parsing processes, None for number of cpus
+    :param hql_backend: name of hql splitter from HQL_BACKENDS
+    :return: job, which returns number of parsed workflows
+    """
+
+    def job(store: Store) -> Generator[int, None, int]:
+        table_id_name_pairs: List[Tuple[int, str]] = store.get_tables(id_name_pairs=True)
+        hql_cache: HqlParseCache = HqlParseCache(store.get_hql_parse_cache())
+        with store.bulk():
+            _, workflows, _, _, _, _, _, workflows_manifest, _ = yield from parse_workflows_coroutine(
+                directory_path, table_id_name_pairs, processes=processes,
+                manifest=store.get_workflow_manifest(),
+                workflow_id_name_pairs=store.get_workflows(id_name_pairs=True), hql_cache=hql_cache,
+                hql_backend=hql_backend, store=store)
+            store.prune_workflow_manifest(workflows_manifest)
+            store.replace_hql_parse_cache(hql_cache.entries.items())
+            store.refresh_lineage_closure()
+            store.refresh_table_usage()
+            return len(workflows)
+
+    return job
@@ -0,0 +1,233 @@
+"""
+In-memory lineage of tables and workflows: integer nodes with compressed sparse rows adjacency in both directions,
+read from Store in bulk and refreshed only for workflows, which were parsed again
+"""
+from array import array
+from collections import deque
+from typing import List, Tuple, Dict, Set, Iterable, Union
+
+from store import Store
+
+# (based on relations (target_table, base_table), read tables, written tables) of one workflow, by table ids
+WorkflowEdges = Tuple[Tuple[Tuple[int, int], ...], Tuple[int, ...], Tuple[int, ...]]
+
+
+class Csr:
+    """
+    Compressed sparse rows adjacency: neighbours of node n are targets[offsets[n]:offsets[n + 1]]
+    """
+    __slots__ = ('offsets', 'targets')
+
+    def __init__(self, nodes_count: int, edges: List[Tuple[int, int]]):
+        """
+        :param nodes_count: number of nodes
+        :param edges: (source, target) node pairs without duplicates
+        """
+        offsets: array = array('i', bytes(4 * (nodes_count + 1)))
+        for source, _ in edges:
+            offsets[source + 1] += 1
+        for i in range(nodes_count):
+            offsets[i + 1] += offsets[i]
+        targets: array = array('i', bytes(4 * len(edges)))
+        positions: array = offsets[:-1]
+        for source, target in edges:
+            targets[positions[source]] = target
+            positions[source] += 1
+        self.offsets: array = offsets
+        self.targets: array = targets
+
+    def neighbours(self, node: int) -> array:
+        return self.targets[self.offsets[node]:self.offsets[node + 1]]
+
+    def reversed(self) -> 'Csr':
+        return Csr(len(self.offsets) - 1, [(t, s) for s in range(len(self.offsets) - 1) for t in self.neighbours(s)])
+
+
+def bfs(csr: Csr, starts: Iterable[int], max_depth: int = None) -> Dict[int, int]:
+    """
+    :return: {node: depth} dict of nodes reachable from starts with the smallest depth,
+    starts are included only if they are reachable through a cycle
+    """
+    depths: Dict[int, int] = {}
+    queue: deque = deque((s, 0) for s in starts)
+    while queue:
+        node, depth = queue.popleft()
+        if max_depth is not None and depth >= max_depth:
+            continue
+        for neighbour in csr.neighbours(node):
+            if neighbour not in depths:
+                depths[neighbour] = depth + 1
+                queue.append((neighbour, depth + 1))
+    return depths
+
+
+class LineageGraph:
+    """
+    Tables and workflows are numbered nodes, based on relations between tables and reads and writes of workflows
+    are kept as forward and reverse Csr adjacency. Queries take and return names
+    """
+
+    def __init__(self):
+        self.table_ids: array = array('q')
+        self.table_names: List[str] = []
+        self.table_nodes: Dict[str, int] = {}
+        self.workflow_ids: array = array('q')
+        self.workflow_names: List[str] = []
+        self.workflow_nodes: Dict[str, int] = {}
+        # {workflow_id: (manifest entries, edges)}, edges are kept by ids to survive renumbering of nodes
+        self.workflow_edges: Dict[int, Tuple[Tuple, WorkflowEdges]] = {}
+        self.based_on: Csr = Csr(0, [])
+        self.derived: Csr = Csr(0, [])
+        self.reads: Csr = Csr(0, [])
+        self.readers: Csr = Csr(0, [])
+        self.writes: Csr = Csr(0, [])
+        self.writers: Csr = Csr(0, [])
+
+    @staticmethod
+    def from_store(store: Store) -> 'LineageGraph':
+        graph: LineageGraph = LineageGraph()
+        graph.refresh(store)
+        return graph
+
+    def refresh(self, store: Store) -> Set[int]:
+        """
+        Rereads tables and workflows, relations are reread only for workflows with changed manifest
+        :param store: store
+        :return: ids of workflows, whose relations were reread or dropped
+        """
+        manifests: Dict[int, List[Tuple[str, str, str]]] = {}
+        for path, (workflow_id, digests) in store.get_workflow_manifest().items():
+            manifests.setdefault(workflow_id, []).extend((path, f_p, d) for f_p, d in digests.items())
+        workflow_id_name_pairs: List[Tuple[int, str]] = store.get_workflows(id_name_pairs=True)
+        entries: Dict[int, Tuple] = {w_i: tuple(sorted(manifests.get(w_i, ()))) for w_i, _ in workflow_id_name_pairs}
+        changed: Set[int] = {w_i for w_i, e in entries.items()
+                             if w_i not in self.workflow_edges or self.workflow_edges[w_i][0] != e}
+        dropped: Set[int] = set(self.workflow_edges) - set(entries)
+        for workflow_id in dropped:
+            del self.workflow_edges[workflow_id]
+        if len(changed):
+            relations: Dict[int, Tuple[List, List, List]] = {w_i: ([], [], []) for w_i in changed}
+            based_on_in, writes, reads = store.get_workflows_relations(changed)
+            for target_table, base_table, workflow_id in based_on_in:
+                relations[workflow_id][0].append((target_table, base_table))
+            for table_id, workflow_id in reads:
+                relations[workflow_id][1].append(table_id)
+            for table_id, workflow_id in writes:
+                relations[workflow_id][2].append(table_id)
+            for workflow_id, (b_o, r, w) in relations.items():
+                self.workflow_edges[workflow_id] = (entries[workflow_id], (tuple(b_o), tuple(r), tuple(w)))
+        self.build(store.get_tables(id_name_pairs=True), workflow_id_name_pairs)
+        return changed | dropped
+
+    def build(self, table_id_name_pairs: List[Tuple[int, str]], workflow_id_name_pairs: List[Tuple[int, str]]):
+        """
+        Numbers tables and workflows and builds adjacency from kept workflow edges,
+        edges of unknown tables are skipped
+        """
+        self.table_ids = array('q', (t[0] for t in table_id_name_pairs))
+        self.table_names = [t[1] for t in table_id_name_pairs]
+        self.table_nodes = {name: node for node, name in enumerate(self.table_names)}
+        self.workflow_ids = array('q', (w[0] for w in workflow_id_name_pairs))
+        self.workflow_names = [w[1] for w in workflow_id_name_pairs]
+        self.workflow_nodes = {name: node for node, name in enumerate(self.workflow_names)}
+        table_nodes: Dict[int, int] = {t_i: node for node, t_i in enumerate(self.table_ids)}
+        based_on: Set[Tuple[int, int]] = set()
+        reads: Set[Tuple[int, int]] = set()
+        writes: Set[Tuple[int, int]] = set()
+        for workflow_node, workflow_id in enumerate(self.workflow_ids):
+            _, (b_o, r, w) = self.workflow_edges.get(workflow_id, ((), ((), (), ())))
+            based_on.update((table_nodes[t], table_nodes[b]) for t, b in b_o if t in table_nodes and b in table_nodes)
+            reads.update((workflow_node, table_nodes[t]) for t in r if t in table_nodes)
+            writes.update((workflow_node, table_nodes[t]) for t in w if t in table_nodes)
+        self.based_on = Csr(len(self.table_ids), sorted(based_on))
+        self.derived = self.based_on.reversed()
+        self.reads = Csr(len(self.workflow_ids), sorted(reads))
+        self.readers = Csr(len(self.table_ids), sorted((t, w) for w, t in reads))
+        self.writes = Csr(len(self.workflow_ids), sorted(writes))
+        self.writers = Csr(len(self.table_ids), sorted((t, w) for w, t in writes))
+
+    def upstream(self, table_name: str, max_depth: int = None) -> Dict[str, int]:
+        """
+        :return: {table_name: depth} dict of tables, which table is based on, directly or through other tables
+        """
+        return {self.table_names[n]: d for n, d in bfs(self.based_on, [self.table_nodes[table_name]],
+                                                        max_depth).items()}
+
+    def downstream(self, table_name: str, max_depth: int = None) -> Dict[str, int]:
+        """
+        :return: {table_name: depth} dict of tables based on table, directly or through other tables
+        """
+        return {self.table_names[n]: d for n, d in bfs(self.derived, [self.table_nodes[table_name]],
+                                                        max_depth).items()}
+
+    def neighborhood(self, table_name: str, depth: int = 1) -> Set[str]:
+        """
+        :return: tables not farther than depth based on relations from table in any direction
+        """
+        start: int = self.table_nodes[table_name]
+        nodes: Set[int] = {start}
+        level: Set[int] = {start}
+        for _ in range(depth):
+            level = {n for node in level for csr in (self.based_on, self.derived) for n in csr.neighbours(node)} - nodes
+            nodes |= level
+        nodes.discard(start)
+        return {self.table_names[n] for n in nodes}
+
+    def shortest_path(self, base_table_name: str, target_table_name: str) -> List[str]:
+        """
+        :return: tables from base table to target table, every next one is based on previous one,
+        or empty list, if target table is not based on base table
+        """
+        start: int = self.table_nodes[base_table_name]
+        goal: int = self.table_nodes[target_table_name]
+        parents: Dict[int, Union[int, None]] = {start: None}
+        queue: deque = deque([start])
+        while queue and goal not in parents:
+            node: int = queue.popleft()
+            for neighbour in self.derived.neighbours(node):
+                if neighbour not in parents:
+                    parents[neighbour] = node
+                    queue.append(neighbour)
+        if goal not in parents:
+            return []
+        path: List[str] = []
+        node: Union[int, None] = goal
+        while node is not None:
+            path.append(self.table_names[node])
+            node = parents[node]
+        return path[::-1]
+
+    def workflow_dependencies(self, workflow_name: str, max_depth: int = 1,
+                              dependents: bool = False) -> Dict[str, int]:
+        """
+        Finds workflows, which write tables read by workflow, through max_depth such steps
+        :param workflow_name: workflow name
+        :param max_depth: number of steps, None for all
+        :param dependents: find workflows, which read tables written by workflow, instead
+        :return: {workflow_name: depth} dict
+        """
+        first, second = (self.writes, self.readers) if dependents else (self.reads, self.writers)
+        start: int = self.workflow_nodes[workflow_name]
+        depths: Dict[int, int] = {start: 0}
+        level: List[int] = [start]
+        depth: int = 0
+        while len(level) and (max_depth is None or depth < max_depth):
+            depth += 1
+            next_level: List[int] = []
+            for node in level:
+                for table in first.neighbours(node):
+                    for workflow in second.neighbours(table):
+                        if workflow not in depths:
+                            depths[workflow] = depth
+                            next_level.append(workflow)
+            level = next_level
+        del depths[start]
+        return {self.workflow_names[n]: d for n, d in depths.items()}
+
+    def related_tables(self, target_workflow_name: str, base_workflow_name: str) -> List[str]:
+        """
+        :return: tables written by base workflow and read by target workflow
+        """
+        read: Set[int] = set(self.reads.neighbours(self.workflow_nodes[target_workflow_name]))
+        return [self.table_names[t] for t in self.writes.neighbours(self.workflow_nodes[base_workflow_name])
+                if t in read]
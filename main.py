@@ -1,48 +1,142 @@
 #!/usr/bin/env python
+import multiprocessing
 import sys
-from typing import List, Tuple, Dict
+from array import array
+from typing import List, Tuple, Dict, Callable, Generator, Any
 
 from PyQt5 import QtWidgets
-from PyQt5.QtCore import Qt, QModelIndex
+from PyQt5.QtCore import Qt, QModelIndex, QThread, QObject, pyqtSignal, QAbstractItemModel, QAbstractListModel, \
+    QTimer
 from PyQt5.QtGui import QStandardItemModel, QStandardItem, QBrush, QColor, QFont
-from PyQt5.QtCore import QSortFilterProxyModel
-from PyQt5.QtWidgets import QFileDialog, QApplication, QLineEdit, QMenu, QAction, QListView, QDialog, QAbstractItemView, \
-    QHBoxLayout, QVBoxLayout, QPushButton
+from PyQt5.QtWidgets import QFileDialog, QApplication, QMenu, QAction, QListView, QDialog, QAbstractItemView, \
+    QHBoxLayout, QVBoxLayout, QPushButton, QMessageBox
 
 import design
-from store import Store, Table, Workflow, Color
-from parsing_tool import parse_workflows_coroutine
+import profiling
+from store import Store, Table, Workflow, Color, COLOR_ORDER
+from jobs import Job, hive_schema_job, impala_schema_job, workflows_job
+from lineage import LineageGraph
 
 
-def copy_model_to_clipboard(model: QStandardItemModel):
+def copy_model_to_clipboard(model: QAbstractItemModel):
     db_list: str = '\n'.join(
-        [model.item(r_i, 0).text() for r_i in range(model.rowCount())])
+        [model.index(r_i, 0).data(Qt.DisplayRole) for r_i in range(model.rowCount())])
     QApplication.clipboard().setText(db_list)
 
 
-def change_item_color(model: QStandardItemModel, item_text: str, color: Color):
-    for i in range(model.rowCount()):
-        item: QStandardItem = model.item(i, 0)
-        if item_text == item.text():
-            color: QColor = QColor(Color.to_q_color(color))
-            brush: QBrush = QBrush(color)
-            item.setForeground(brush)
-
-
-def less_than_name_color(proxy_model: QSortFilterProxyModel):
-    def func(left: QModelIndex, right: QModelIndex) -> bool:
-        model: QStandardItemModel = proxy_model.sourceModel()
-        left_item: QStandardItem = model.item(left.row())
-        right_item: QStandardItem = model.item(right.row())
-        left_text: str = left_item.text()
-        right_text: str = right_item.text()
-        left_color: Color = Color.from_q_color(left_item.foreground().color())
-        right_color: Color = Color.from_q_color(right_item.foreground().color())
-        if left_color != right_color:
-            return left_color < right_color
-        return left_text < right_text
-
-    return func
+def to_q_color(color: Color) -> QColor:
+    if color is None:
+        return QColor('black')
+    else:
+        return QColor(color.value)
+
+
+# search boxes refresh lists after that pause in typing
+SEARCH_DEBOUNCE_MS: int = 200
+
+
+def debounced(parent: QObject, slot: Callable[[], None]) -> QTimer:
+    """
+    :return: single shot timer, which calls slot after SEARCH_DEBOUNCE_MS since it was started last time
+    """
+    timer: QTimer = QTimer(parent)
+    timer.setSingleShot(True)
+    timer.setInterval(SEARCH_DEBOUNCE_MS)
+    timer.timeout.connect(slot)
+    return timer
+
+
+class StoreListModel(QAbstractListModel):
+    """
+    Read only list of tables or workflows, which keeps only ids of rows in list order,
+    names and colors are fetched from Store by pages, when view shows them
+    """
+    PAGE_SIZE: int = 256
+
+    def __init__(self, get_ids: Callable[[], array], get_rows: Callable[[List[int]], Dict[int, Tuple[str, int]]],
+                 parent: QObject = None):
+        """
+        :param get_ids: returns filtered ids of rows in list order
+        :param get_rows: returns {id: (name, color sort key)} dict of given ids
+        """
+        super().__init__(parent)
+        self.get_ids: Callable[[], array] = get_ids
+        self.get_rows: Callable[[List[int]], Dict[int, Tuple[str, int]]] = get_rows
+        self.ids: array = array('q')
+        self.pages: Dict[int, List[Tuple[str, int]]] = {}
+        # brushes by color sort key
+        self.brushes: List[QBrush] = [QBrush(to_q_color(c)) for c in COLOR_ORDER]
+
+    def refresh(self) -> None:
+        """
+        Refetches ids of rows, pages are fetched again on demand
+        """
+        self.beginResetModel()
+        self.ids = self.get_ids()
+        self.pages.clear()
+        self.endResetModel()
+
+    def rowCount(self, parent: QModelIndex = QModelIndex()) -> int:
+        return 0 if parent.isValid() else len(self.ids)
+
+    def row_data(self, row: int) -> Tuple[str, int]:
+        page_index: int = row // self.PAGE_SIZE
+        page: List[Tuple[str, int]] = self.pages.get(page_index)
+        if page is None:
+            page_ids: array = self.ids[page_index * self.PAGE_SIZE:(page_index + 1) * self.PAGE_SIZE]
+            rows: Dict[int, Tuple[str, int]] = self.get_rows(page_ids.tolist())
+            page = self.pages[page_index] = [rows.get(i, ('', Color.NONE.sort_key)) for i in page_ids]
+        return page[row % self.PAGE_SIZE]
+
+    def data(self, index: QModelIndex, role: int = Qt.DisplayRole) -> Any:
+        if not index.isValid() or index.row() >= len(self.ids):
+            return None
+        if role == Qt.DisplayRole:
+            return self.row_data(index.row())[0]
+        if role == Qt.ForegroundRole:
+            return self.brushes[self.row_data(index.row())[1]]
+        return None
+
+    def row_of(self, row_id: int) -> int:
+        """
+        :return: row of id or -1, if it is filtered out
+        """
+        try:
+            return self.ids.index(row_id)
+        except ValueError:
+            return -1
+
+
+class GeneratorWorker(QThread):
+    """
+    Drives progress generator in background thread, job gets Store with its own connection
+    """
+    progress = pyqtSignal(int)
+    done = pyqtSignal(object)
+    failed = pyqtSignal(str)
+
+    def __init__(self, db_name: str, job: Job, parent: QObject = None):
+        super().__init__(parent)
+        self.db_name: str = db_name
+        self.job: Job = job
+
+    def run(self) -> None:
+        store: Store = Store(self.db_name)
+        try:
+            gen: Generator[int, None, Any] = self.job(store)
+            while True:
+                if self.isInterruptionRequested():
+                    gen.close()
+                    store.connection.rollback()
+                    return
+                self.progress.emit(next(gen))
+        except StopIteration as ret:
+            self.done.emit(ret.value)
+        except Exception as e:
+            store.connection.rollback()
+            self.failed.emit(str(e))
+        finally:
+            store.close()
 
 
 class MainApp(QtWidgets.QMainWindow, design.Ui_MainWindow):
@@ -99,7 +193,7 @@ class MainApp(QtWidgets.QMainWindow, design.Ui_MainWindow):
             if reverse_target:
                 target_wf = base_wf
                 base_wf = self.current_workflow.name
-            related_tables: List[str] = self.store.get_related_tables(target_wf, base_wf)
+            related_tables: List[str] = self.lineage.related_tables(target_wf, base_wf)
             dialog, list_view_model = self.create_list_view_dialog()
             for s in related_tables:
                 item: QStandardItem = QStandardItem(s)
@@ -109,166 +203,99 @@ class MainApp(QtWidgets.QMainWindow, design.Ui_MainWindow):
 
         return func
 
-    def sort_by_text_and_color(self, search_box: QLineEdit, color_filter: List[Color],
-                               proxy_model: QSortFilterProxyModel, watch_unplugged: bool = False):
-        unplugged_tables: List[str] = []
-        if watch_unplugged:
-            unplugged_tables: List[str] = self.store.get_tables('', only_unplugged=True, only_names=True)
-
-        def func(row: int, _) -> bool:
-            model: QStandardItemModel = proxy_model.sourceModel()
-            search_text: str = search_box.text()
-            item: QStandardItem = model.item(row)
-            text: str = item.text()
-            if watch_unplugged and self.only_unplugged['value']:
-                if text not in unplugged_tables:
-                    return False
-            color = Color.from_q_color(item.foreground().color())
-            return search_text in text and (not len(color_filter) or color in color_filter)
-
-        return func
+    def run_in_background(self, job: Job, on_done: Callable[[Any], None] = None) -> None:
+        """
+        Runs job in background thread, showing its progress on loading page
+        :param job: function, which takes Store with own connection and returns progress generator
+        :param on_done: called with job return value, if job was not cancelled
+        """
+        self.loading_progress.setValue(0)
+        self.stackedWidget.setCurrentIndex(1)
+        self.menuBar.setEnabled(False)
+        if self.action_profile_jobs.isChecked():
+            profiling.enable()
+        self.worker_on_done = on_done
+        self.worker = GeneratorWorker(self.db_name, job, self)
+        self.worker.progress.connect(self.loading_progress.setValue)
+        self.worker.done.connect(self.background_job_done)
+        self.worker.failed.connect(self.background_job_failed)
+        self.worker.finished.connect(self.background_job_finished)
+        self.worker.start()
+
+    def cancel_background_job(self) -> None:
+        if self.worker is not None:
+            self.worker.requestInterruption()
+
+    def background_job_done(self, value: Any) -> None:
+        if self.worker_on_done is not None:
+            self.worker_on_done(value)
+
+    def background_job_failed(self, message: str) -> None:
+        QMessageBox.warning(self, 'Error', message)
+
+    def background_job_finished(self) -> None:
+        self.worker = None
+        self.worker_on_done = None
+        self.stackedWidget.setCurrentIndex(0)
+        self.menuBar.setEnabled(True)
+        self.set_menu_state()
+        self.lineage.refresh(self.store)
+        profiler: profiling.Profiler = profiling.disable()
+        if profiler is not None:
+            self.show_profile(profiler)
+
+    def show_profile(self, profiler: profiling.Profiler) -> None:
+        report: Dict[str, Any] = profiler.report()
+        lines: List[str] = [f'{phase}: {t["seconds"]}s, {t["calls"]} calls, {t["bytes"]} bytes'
+                            for phase, t in report['phases'].items()]
+        for kind, items in report['slowest'].items():
+            lines.append(f'slowest {kind}s:')
+            lines.extend(f'    {item["seconds"]}s {item["item"]}' for item in items)
+        self.statusBar().showMessage(profiler.summary())
+        self.statusBar().setToolTip('\n'.join(lines))
 
     def select_workflows_directory(self) -> None:
         dialog: QFileDialog = QFileDialog(self, caption='Select workflows directory')
         self.directory_path = str(dialog.getExistingDirectory(dialog, 'Select workflows directory'))
         dialog.close()
         if self.directory_path:
-            try:
-                self.loading_progress.setValue(0)
-                self.stackedWidget.setCurrentIndex(1)
-                table_id_name_pairs: List[Tuple[int, str]] = self.store.get_tables(id_name_pairs=True)
-                gen = parse_workflows_coroutine(self.directory_path, table_id_name_pairs)
-                while True:
-                    progress: int = next(gen)
-                    self.loading_progress.setValue(progress)
-            except StopIteration as ret:
-                sqooped_tables, workflows, table_based_on, table_created_in, table_partitions, table_updated_in, table_used_in = ret.value
-                workflows = [Workflow(*w_n) for w_n in workflows]
-                self.store.insert_sqooped_tables(sqooped_tables)
-                self.store.insert_workflows(workflows)
-                self.store.insert_table_based_on(table_based_on)
-                self.store.insert_table_created_in(table_created_in)
-                self.store.insert_table_used_in(table_used_in)
-                self.store.insert_table_updated_in(table_updated_in)
-                self.store.insert_table_partitions(table_partitions)
-            finally:
-                self.stackedWidget.setCurrentIndex(0)
-            self.wf_filter_workflows()
-            self.set_menu_state()
-
-    def insert_tables_from_schema_coroutine(self, tables_list: List[str]) -> bool:
-        progress: int = 0
-        length: int = len(tables_list)
-        self.store.delete_tables()
-        for table_name in tables_list:
-            without_schema: str = table_name.split('.')[1]
-            tables: List[Table] = self.store.get_tables_by_names([table_name, without_schema])
-            if len(tables) != 0:
-                for table in tables:
-                    table.name = table_name
-                    self.store.update_table(table)
-            else:
-                self.store.insert_new_table(table_name)
-            progress += 1
-            yield int((progress / length * 100) + 1)
-        return True
-
-    def update_tables_columns_from_schema_coroutine(self, tables_dict: Dict[str, List[Tuple[str, str]]]) -> bool:
-        progress: int = 0
-        length: int = len(list(tables_dict.keys()))
-        tables: List[Table] = self.store.get_tables_by_names(list(tables_dict.keys()))
-        for table in tables:
-            if table.name in tables_dict:
-                self.store.insert_table_columns([(table.index, t[0], t[1]) for t in tables_dict[table.name]])
-                # del tables_dict[table.name]
-                progress += 1
-                yield int((progress / length * 100) + 1)
-        # for table_name in tables_dict:
-        #     table: Table = self.store.insert_new_table(table_name)
-        #     self.store.insert_table_columns([(table.index, t[0], t[1]) for t in tables_dict[table.name]])
-        #     progress += 1
-        #     yield int((progress / length * 100) + 1)
-        return True
+            directory_path: str = self.directory_path
+
+            def on_done(_) -> None:
+                self.wf_fill_workflows()
+                self.wf_filter_workflows()
+
+            self.run_in_background(workflows_job(directory_path), on_done)
 
     def extract_hive_schema(self) -> None:
         dialog: QFileDialog = QFileDialog(self, caption='Select hive schema file')
         schema_filepath: str = str(dialog.getOpenFileName(dialog, 'Select hive schema file')[0])
         dialog.close()
         if schema_filepath:
-            tables_list: List[str] = []
-            with open(schema_filepath, 'r') as file:
-                for line in file.readlines():
-                    if 'schema_name,table_name' in line:
-                        continue
-                    else:
-                        table_name: str = line.replace(' ', '').replace(',', '.').strip()
-                        tables_list.append(table_name)
-            try:
-                self.loading_progress.setValue(0)
-                self.stackedWidget.setCurrentIndex(1)
-                gen = self.insert_tables_from_schema_coroutine(tables_list)
-                while True:
-                    progress: int = next(gen)
-                    self.loading_progress.setValue(progress)
-            except StopIteration as ret:
-                pass
-            finally:
-                self.stackedWidget.setCurrentIndex(0)
-            self.db_filter_tables()
-            self.set_menu_state()
+            self.run_in_background(hive_schema_job(schema_filepath), lambda _: self.db_filter_tables())
 
     def extract_impala_schema(self) -> None:
         schema_filepath: str = str(QFileDialog.getOpenFileName(None, 'Select impala schema file')[0])
         if schema_filepath:
-            tables_dict: Dict[str, List[Tuple[str, str]]] = {}
-            with open(schema_filepath, 'r') as file:
-                for line in file.readlines():
-                    if 'schema_name,table_name,field_name,field_type' in line:
-                        continue
-                    else:
-                        table: List[str] = line.split(',')
-                        table_name: str = table[0].strip() + '.' + table[1].strip()
-                        if table_name not in tables_dict:
-                            tables_dict[table_name] = [(table[2].strip(), table[3].strip().strip('"'))]
-                        else:
-                            tables_dict[table_name].append((table[2].strip(), table[3].strip().strip('"')))
-            try:
-                self.loading_progress.setValue(0)
-                self.stackedWidget.setCurrentIndex(1)
-                gen = self.update_tables_columns_from_schema_coroutine(tables_dict)
-                while True:
-                    progress: int = next(gen)
-                    self.loading_progress.setValue(progress)
-            except StopIteration as ret:
-                pass
-            finally:
-                self.stackedWidget.setCurrentIndex(0)
-            self.db_filter_tables()
-            self.set_menu_state()
+            self.run_in_background(impala_schema_job(schema_filepath), lambda _: self.db_filter_tables())
 
     def clear_database(self) -> None:
         self.store.create_db_tables(force=True)
+        self.lineage.refresh(self.store)
         self.set_menu_state()
         self.db_filter_tables()
         self.wf_filter_workflows()
 
     def wf_fill_workflows(self) -> None:
-        for workflow in self.store.get_workflows():
-            color: QColor = QColor(Color.to_q_color(workflow.color))
-            brush: QBrush = QBrush(color)
-            item = QStandardItem(workflow.name)
-            item.setForeground(brush)
-            item.setEditable(False)
-            self.wf_workflow_list_model.appendRow(item)
+        self.wf_workflow_list_model.refresh()
 
     def wf_filter_workflows(self) -> None:
-        self.wf_workflow_proxy_model.invalidateFilter()
-        self.wf_workflow_proxy_model.sort(0)
+        self.wf_workflow_list_model.refresh()
 
     def wf_select_workflows(self) -> None:
         try:
             workflow_name: str = self.wf_workflow_list.selectionModel().selectedIndexes()[0].data(Qt.DisplayRole)
-            workflow: Workflow = self.store.get_workflows(workflow_name)[0]
+            workflow: Workflow = self.store.get_workflows_by_names([workflow_name])[0]
             self.store.populate_workflow_data(workflow)
             self.current_workflow = workflow
             self.fill_wf_fields()
@@ -303,21 +330,26 @@ class MainApp(QtWidgets.QMainWindow, design.Ui_MainWindow):
         if self.current_workflow:
             self.current_workflow.color = self.wf_get_color()
             self.store.update_workflow(self.current_workflow)
-            change_item_color(self.wf_workflow_list_model, self.current_workflow.name, self.current_workflow.color)
+            self.wf_filter_workflows()
+            self.select_row(self.wf_workflow_list, self.current_workflow.index)
 
     def db_fill_tables(self) -> None:
-        self.db_table_list_model.clear()
-        for table in self.store.get_tables():
-            color: QColor = QColor(Color.to_q_color(table.color))
-            brush: QBrush = QBrush(color)
-            item = QStandardItem(table.name)
-            item.setEditable(False)
-            item.setForeground(brush)
-            self.db_table_list_model.appendRow(item)
+        self.db_table_list_model.refresh()
 
     def db_filter_tables(self) -> None:
-        self.db_table_proxy_model.invalidateFilter()
-        self.db_table_proxy_model.sort(0)
+        self.db_table_list_model.refresh()
+
+    @staticmethod
+    def select_row(view: QListView, row_id: int) -> None:
+        """
+        Selects row of id in list view without reloading its fields
+        """
+        row: int = view.model().row_of(row_id)
+        if row >= 0:
+            view.selectionModel().blockSignals(True)
+            view.setCurrentIndex(view.model().index(row, 0))
+            view.selectionModel().blockSignals(False)
+            view.scrollTo(view.currentIndex())
 
     def fill_db_fields(self) -> None:
         if self.current_table:
@@ -369,7 +401,8 @@ class MainApp(QtWidgets.QMainWindow, design.Ui_MainWindow):
             self.current_table.authors = self.db_authors_input.toPlainText()
             self.current_table.color = self.db_get_color()
             self.store.update_table(self.current_table)
-            change_item_color(self.db_table_list_model, self.current_table.name, self.current_table.color)
+            self.db_filter_tables()
+            self.select_row(self.db_table_list, self.current_table.index)
 
     def db_set_color(self, color: Color):
         if color is Color.RED:
@@ -462,7 +495,7 @@ class MainApp(QtWidgets.QMainWindow, design.Ui_MainWindow):
     def db_select_tables(self) -> None:
         try:
             table_name: str = self.db_table_list.selectionModel().selectedIndexes()[0].data(Qt.DisplayRole)
-            table: Table = self.store.get_tables(table_name)[0]
+            table: Table = self.store.get_tables_by_names([table_name])[0]
             self.current_table = table
             self.fill_db_fields()
         except IndexError:
@@ -515,7 +548,7 @@ class MainApp(QtWidgets.QMainWindow, design.Ui_MainWindow):
         else:
             self.action_extract_hive.setEnabled(False)
             self.action_exctract_impala.setEnabled(False)
-            self.action_open_workflows.setEnabled(False)
+            self.action_open_workflows.setEnabled(True)
 
     def export_list(self):
         tab_id: int = self.tabWidget.currentIndex()
@@ -524,9 +557,19 @@ class MainApp(QtWidgets.QMainWindow, design.Ui_MainWindow):
         elif tab_id == 1:
             copy_model_to_clipboard(self.wf_workflow_list_model)
 
+    def closeEvent(self, event) -> None:
+        if self.worker is not None:
+            self.worker.requestInterruption()
+            self.worker.wait()
+        super().closeEvent(event)
+
     def __init__(self):
         super().__init__()
-        self.store: Store = Store('db.sqlite3')
+        self.db_name: str = 'db.sqlite3'
+        self.store: Store = Store(self.db_name)
+        self.lineage: LineageGraph = LineageGraph.from_store(self.store)
+        self.worker: GeneratorWorker = None
+        self.worker_on_done: Callable[[Any], None] = None
         self.directory_path: str = None
         self.current_table: Table = None
         self.current_workflow: Workflow = None
@@ -535,18 +578,16 @@ class MainApp(QtWidgets.QMainWindow, design.Ui_MainWindow):
         self.wf_color_filter: List[Color] = []
         self.setupUi(self)
         self.set_menu_state()
-
-        self.wf_workflow_list_model = QStandardItemModel(self)
-        self.wf_workflow_proxy_model = QSortFilterProxyModel(self)
-        self.wf_workflow_proxy_model.setSourceModel(self.wf_workflow_list_model)
-        self.wf_workflow_list.setModel(self.wf_workflow_proxy_model)
-        self.wf_workflow_proxy_model.filterAcceptsRow = self.sort_by_text_and_color(self.wf_workflow_search,
-                                                                                    self.wf_color_filter,
-                                                                                    self.wf_workflow_proxy_model
-                                                                                    )
-        self.wf_workflow_proxy_model.lessThan = less_than_name_color(self.wf_workflow_proxy_model)
+        self.loading_cancel_button: QPushButton = QPushButton('Cancel', self.loading)
+        self.loading_cancel_button.clicked.connect(self.cancel_background_job)
+        self.verticalLayout_2.addWidget(self.loading_cancel_button)
+
+        self.wf_workflow_list_model = StoreListModel(
+            lambda: self.store.get_workflow_list_ids(self.wf_workflow_search.text(), self.wf_color_filter),
+            lambda ids: self.store.get_list_rows('WORKFLOWS', ids), self)
+        self.wf_workflow_list.setModel(self.wf_workflow_list_model)
+        self.wf_workflow_list.setUniformItemSizes(True)
         self.wf_fill_workflows()
-        self.wf_workflow_proxy_model.sort(0)
 
         self.wf_save_button.clicked.connect(self.save_wf_fields)
         self.wf_source_list_model = QStandardItemModel(self.wf_source_list)
@@ -569,8 +610,11 @@ class MainApp(QtWidgets.QMainWindow, design.Ui_MainWindow):
         self.action_exctract_impala.triggered.connect(self.extract_impala_schema)
         self.action_clear_database.triggered.connect(self.clear_database)
         self.action_copy_list_to_clipboard.triggered.connect(self.export_list)
+        self.action_profile_jobs: QAction = self.menuFile.addAction('Profile background jobs')
+        self.action_profile_jobs.setCheckable(True)
 
-        self.wf_workflow_search.textChanged.connect(self.wf_filter_workflows)
+        self.wf_search_timer: QTimer = debounced(self, self.wf_filter_workflows)
+        self.wf_workflow_search.textChanged.connect(self.wf_search_timer.start)
         self.wf_workflow_list.selectionModel().selectionChanged.connect(self.wf_select_workflows)
         self.wf_blue_color_filter.stateChanged.connect(self.wf_toggle_color_filter(Color.BLUE))
         self.wf_green_color_filter.stateChanged.connect(self.wf_toggle_color_filter(Color.GREEN))
@@ -578,17 +622,13 @@ class MainApp(QtWidgets.QMainWindow, design.Ui_MainWindow):
         self.wf_magenta_color_filter.stateChanged.connect(self.wf_toggle_color_filter(Color.MAGENTA))
         self.wf_none_color_filter.stateChanged.connect(self.wf_toggle_color_filter(Color.NONE))
 
-        self.db_table_list_model = QStandardItemModel(self)
-        self.db_table_proxy_model = QSortFilterProxyModel(self)
-        self.db_table_proxy_model.setSourceModel(self.db_table_list_model)
-        self.db_table_list.setModel(self.db_table_proxy_model)
-        self.db_table_proxy_model.filterAcceptsRow = self.sort_by_text_and_color(self.db_table_search,
-                                                                                 self.db_color_filter,
-                                                                                 self.db_table_proxy_model,
-                                                                                 watch_unplugged=True)
-        self.db_table_proxy_model.lessThan = less_than_name_color(self.db_table_proxy_model)
+        self.db_table_list_model = StoreListModel(
+            lambda: self.store.get_table_list_ids(self.db_table_search.text(), self.db_color_filter,
+                                                  self.only_unplugged['value']),
+            lambda ids: self.store.get_list_rows('TABLES', ids), self)
+        self.db_table_list.setModel(self.db_table_list_model)
+        self.db_table_list.setUniformItemSizes(True)
         self.db_fill_tables()
-        self.db_table_proxy_model.sort(0)
 
         self.db_created_at_list_model = QStandardItemModel(self.db_created_at_list)
         self.db_created_at_list.setModel(self.db_created_at_list_model)
@@ -603,7 +643,8 @@ class MainApp(QtWidgets.QMainWindow, design.Ui_MainWindow):
         self.db_columns_list_model = QStandardItemModel(self.db_columns_list)
         self.db_columns_list.setModel(self.db_columns_list_model)
 
-        self.db_table_search.textChanged.connect(self.db_filter_tables)
+        self.db_search_timer: QTimer = debounced(self, self.db_filter_tables)
+        self.db_table_search.textChanged.connect(self.db_search_timer.start)
         self.db_table_list.selectionModel().selectionChanged.connect(self.db_select_tables)
         self.db_save_button.clicked.connect(self.save_db_fields)
         self.db_show_only_unplugged.stateChanged.connect(self.db_change_tables_filter)
@@ -624,4 +665,5 @@ def main():
 
 
 if __name__ == '__main__':
+    multiprocessing.freeze_support()
     main()
@@ -1,13 +1,18 @@
+import csv
 import json
 import os
 import re
 import glob
+import hashlib
+import sys
+from collections import OrderedDict, ChainMap
+from multiprocessing import Pool
 from operator import itemgetter
-from time import time
 import sqlparse
-from typing import List, Dict, Generator, Any, Set, Union, Tuple
-from xml.etree.ElementTree import ElementTree, Element
+from typing import List, Dict, Generator, Any, Set, Union, Tuple, Iterable, Callable, Mapping
+from xml.etree.ElementTree import ElementTree, Element, ParseError, iterparse
 
+import profiling
 from store import Store
 
 
@@ -23,291 +28,1252 @@ def index_generator(start: int) -> int:
         i += 1
 
 
-def resolve_global(path_to_workflow: str):
+def read_properties(path: str) -> Dict[str, str]:
     """
-    Coroutine, opens job.properties file and generates dict to resolve global variables
-    :param path_to_workflow: path to workflow
-    :return:
+    Reads java properties file
+    :param path: path to .properties file
+    :return: {name: value} dict
+    """
+    properties: Dict[str, str] = {}
+    with open(path, 'r') as file:
+        logical_line: str = ''
+        for line in file:
+            line = line.strip()
+            if not logical_line and (not line or line[0] in '#!'):
+                continue
+            if line.endswith('\\') and not line.endswith('\\\\'):
+                logical_line += line[:-1]
+                continue
+            logical_line += line
+            m = re.match(r'([^=:\s]+)\s*[=:\s]\s*(.*)$', logical_line)
+            if m:
+                properties[m.group(1)] = m.group(2)
+            logical_line = ''
+    return properties
+
+
+def read_xml_properties(path: str) -> Dict[str, str]:
     """
-    path_to_job_properties: str = os.path.join(path_to_workflow, 'job.properties')
-    dictionary: Dict[str, str] = {}
+    Reads <property><name/><value/></property> elements of hadoop configuration, oozie coordinator or bundle
+    :param path: path to xml file
+    :return: {name: value} dict
+    """
+    properties: Dict[str, str] = {}
     try:
-        with open(path_to_job_properties, 'r') as file:
-            for line in file:
-                if '=' in line:
-                    temp = line.split('=')
-                    key = temp[0]
-                    value = '='.join(temp[1:])
-                    dictionary[key] = value
-    except FileNotFoundError:
-        pass
-    while True:
-        key = yield
-        if key in dictionary:
-            yield dictionary[key].strip('\n')
-        else:
-            yield key
+        root = ElementTree(file=path).getroot()
+    except ParseError:
+        return properties
+    for el in root.iter():
+        if isinstance(el.tag, str) and el.tag.endswith('property'):
+            name: Union[str, None] = None
+            value: str = ''
+            for el_ in el:
+                if el_.tag.endswith('name'):
+                    name = (el_.text or '').strip()
+                elif el_.tag.endswith('value'):
+                    value = (el_.text or '').strip()
+            if name:
+                properties[name] = value
+    return properties
 
 
-def replace_global(string: str, resolver: Generator) -> str:
+class PropertyResolver:
     """
-    Replaces all global variables in string, using resolver
-    :param string: string to replace
-    :param resolver: aimed resolve_global generator
-    :return: string without globals
+    Replaces ${name} placeholders with workflow properties, sources are layered like in oozie:
+    config-default.xml < coordinator.xml < job.properties
     """
-    for gl in re.findall(r'\${[^${}]+}', string):
-        repl = resolver.send(gl[2:-1])
-        next(resolver)
-        string = string.replace(gl, repl)
-    return string
+    PLACEHOLDER_RE = re.compile(r'\$\{([^${}]+)}')
+    # sources in workflow directory from the lowest to the highest priority
+    SOURCES: List[Tuple[str, Callable[[str], Dict[str, str]]]] = [
+        ('config-default.xml', read_xml_properties),
+        ('coordinator.xml', read_xml_properties),
+        ('job.properties', read_properties),
+    ]
+    # nested and referencing each other placeholders are resolved in several passes
+    MAX_PASSES: int = 10
+    # {path_to_workflow: (sources mtimes, resolver)} dict
+    _cache: Dict[str, Tuple[Tuple[float, ...], 'PropertyResolver']] = {}
+
+    def __init__(self, properties: Dict[str, str]):
+        self.properties: Dict[str, str] = properties
 
+    @classmethod
+    def source_paths(cls, path_to_workflow: str) -> List[str]:
+        return [os.path.join(path_to_workflow, s[0]) for s in cls.SOURCES]
+
+    @classmethod
+    @profiling.profiled()
+    def for_workflow(cls, path_to_workflow: str, overrides: Dict[str, str] = None) -> 'PropertyResolver':
+        """
+        Reads properties of workflow, resolver is cached until its sources are modified
+        :param path_to_workflow: path to workflow
+        :param overrides: properties passed by parent workflow, coordinator or bundle, they have the highest priority
+        :return: resolver
+        """
+        resolver: PropertyResolver = cls._for_directory(path_to_workflow)
+        if overrides:
+            return cls({**resolver.properties, **overrides})
+        return resolver
+
+    @classmethod
+    def _for_directory(cls, path_to_workflow: str) -> 'PropertyResolver':
+        mtimes: List[float] = []
+        for path in cls.source_paths(path_to_workflow):
+            try:
+                mtimes.append(os.stat(path).st_mtime)
+            except OSError:
+                mtimes.append(-1)
+        cached: Union[Tuple[Tuple[float, ...], PropertyResolver], None] = cls._cache.get(path_to_workflow)
+        if cached is not None and cached[0] == tuple(mtimes):
+            return cached[1]
+        properties: Dict[str, str] = {}
+        for (source, reader), mtime in zip(cls.SOURCES, mtimes):
+            if mtime != -1:
+                properties.update(reader(os.path.join(path_to_workflow, source)))
+        resolver: PropertyResolver = cls(properties)
+        cls._cache[path_to_workflow] = (tuple(mtimes), resolver)
+        return resolver
 
-def parse_sqoop(el: Element) -> str:
+    def _lookup(self, m) -> str:
+        return self.properties.get(m.group(1), m.group(1))
+
+    @profiling.profiled(size=lambda self, string: len(string))
+    def replace(self, string: str) -> str:
+        """
+        Replaces all placeholders in string, unknown ones are replaced with their names
+        :param string: string to replace
+        :return: string without placeholders
+        """
+        for _ in range(self.MAX_PASSES):
+            string, replaced = self.PLACEHOLDER_RE.subn(self._lookup, string)
+            if not replaced:
+                break
+        return string
+
+
+def parse_sqoop(el: Element) -> Union[str, None]:
     """
     Parse sqoop action xml element, extract table from it
     :param el: sqoop action xml element
-    :return: sqoop table name
-    """
-    db_arg_i: int = None
-    table_arg_i: int = None
-    for arg_i in range(len(list(el))):
-        if el[arg_i].text == '--hive-database':
-            db_arg_i = arg_i + 1
-        if el[arg_i].text == '--hive-table':
-            table_arg_i = arg_i + 1
-        if db_arg_i and table_arg_i:
-            break
-    if db_arg_i:
-        return f'{el[db_arg_i].text}.{el[table_arg_i].text}'
-    else:
-        return el[table_arg_i].text
+    :return: sqoop table name, None if sqoop does not import into hive table
+    """
+    args: List[str] = []
+    for el_ in el:
+        name: str = local_name(el_.tag)
+        if name == 'arg':
+            args.append((el_.text or '').strip())
+        elif name == 'command':
+            args.extend((el_.text or '').split())
+    database: Union[str, None] = None
+    table: Union[str, None] = None
+    for arg, value in zip(args, args[1:]):
+        if arg == '--hive-database':
+            database = value
+        elif arg == '--hive-table':
+            table = value
+    if table is None:
+        return None
+    return f'{database}.{table}' if database else table
 
 
-def get_hive_script(path_to_workflow: str, el: Element) -> str:
+def get_hive_script_path(path_to_workflow: str, el: Element) -> str:
     """
-    Find path to script file in workflow.xml action and read it's content
+    Find path to script file in workflow.xml action
     :param path_to_workflow: path to workflow
     :param el: workflow action
-    :return: script text
+    :return: script path
     """
     script_path: str = path_to_workflow
     for el_ in el:
-        if 'script' in el_.tag:
-            script_path = os.path.join(script_path, el_.text)
-    script_text: str = ''
+        if local_name(el_.tag) == 'script':
+            script_path = os.path.join(script_path, (el_.text or '').strip())
+    return script_path
+
+
+def read_hive_script(script_path: str) -> str:
+    """
+    :param script_path: path to script file
+    :return: script text, empty string if file does not exist
+    """
     try:
         with open(script_path, 'r') as file:
-            script_text += ''.join(file.readlines())
+            return file.read()
     except FileNotFoundError:
         return ''
-    return script_text
 
 
-def extract_tables(statement: str, table_names: Set[str]) -> List[str]:
+def file_digest(path: str) -> str:
+    """
+    Calculates hash of file content
+    :param path: path to file
+    :return: sha1 hex digest, empty string if file does not exist
+    """
+    digest = hashlib.sha1()
+    try:
+        with open(path, 'rb') as file:
+            for chunk in iter(lambda: file.read(65536), b''):
+                digest.update(chunk)
+    except (FileNotFoundError, IsADirectoryError):
+        return ''
+    return digest.hexdigest()
+
+
+def local_name(tag: str) -> str:
+    """
+    :return: xml tag without namespace
+    """
+    return tag.rsplit('}', 1)[-1] if isinstance(tag, str) else ''
+
+
+def read_configuration(el: Element) -> Dict[str, str]:
+    """
+    Reads <configuration><property><name/><value/></property></configuration> child of oozie action or application
+    :param el: element with configuration child
+    :return: {name: value} dict
+    """
+    properties: Dict[str, str] = {}
+    for el_ in el:
+        if local_name(el_.tag) == 'configuration':
+            for property_el in el_:
+                name: str = ''
+                value: str = ''
+                for el__ in property_el:
+                    if local_name(el__.tag) == 'name':
+                        name = (el__.text or '').strip()
+                    elif local_name(el__.tag) == 'value':
+                        value = (el__.text or '').strip()
+                if name:
+                    properties[name] = value
+    return properties
+
+
+# (app path as written, configuration as written, propagate-configuration) of sub-workflow action,
+# coordinator workflow or bundle coordinator
+AppReference = Tuple[str, Dict[str, str], bool]
+
+
+def read_app_reference(el: Element) -> Union[AppReference, None]:
+    """
+    :param el: sub-workflow action, coordinator action workflow or bundle coordinator element
+    :return: reference or None, if element has no app-path
+    """
+    app_path: Union[str, None] = None
+    propagate: bool = False
+    for el_ in el:
+        name: str = local_name(el_.tag)
+        if name == 'app-path':
+            app_path = (el_.text or '').strip()
+        elif name == 'propagate-configuration':
+            propagate = True
+    return (app_path, read_configuration(el), propagate) if app_path else None
+
+
+def read_app_references(root: Element, tag: str) -> List[AppReference]:
+    """
+    Finds applications referenced by oozie definition
+    :param root: root of coordinator.xml or bundle.xml
+    :param tag: workflow or coordinator
+    :return: references in document order
+    """
+    references: List[AppReference] = []
+    for el in root.iter():
+        if local_name(el.tag) == tag:
+            reference: Union[AppReference, None] = read_app_reference(el)
+            if reference is not None:
+                references.append(reference)
+    return references
+
+
+class WorkflowXml:
+    """
+    Actions of workflow.xml as they are written, before properties are resolved. Sqooped tables are kept apart
+    from hive scripts, so new tables get their ids before any script is parsed, wherever sqoop action is
+    """
+    __slots__ = ('path_to_workflow', 'size', 'sqooped_tables', 'hive_script_paths', 'sub_workflows')
+
+    def __init__(self, path_to_workflow: str):
+        self.path_to_workflow: str = path_to_workflow
+        # bytes read
+        self.size: int = 0
+        self.sqooped_tables: List[str] = []
+        self.hive_script_paths: List[str] = []
+        self.sub_workflows: List[AppReference] = []
+
+
+def _sqoop_action(el: Element, workflow_xml: WorkflowXml) -> None:
+    table_name: Union[str, None] = parse_sqoop(el)
+    if table_name is not None:
+        workflow_xml.sqooped_tables.append(table_name)
+
+
+def _hive_action(el: Element, workflow_xml: WorkflowXml) -> None:
+    workflow_xml.hive_script_paths.append(get_hive_script_path(workflow_xml.path_to_workflow, el))
+
+
+def _sub_workflow_action(el: Element, workflow_xml: WorkflowXml) -> None:
+    reference: Union[AppReference, None] = read_app_reference(el)
+    if reference is not None:
+        workflow_xml.sub_workflows.append(reference)
+
+
+# handlers of workflow actions by local name of action element,
+# spark and shell actions are known, but their lineage can not be read from workflow.xml
+ACTION_HANDLERS: Dict[str, Union[Callable[[Element, WorkflowXml], None], None]] = {
+    'hive': _hive_action,
+    'hive2': _hive_action,
+    'sqoop': _sqoop_action,
+    'sub-workflow': _sub_workflow_action,
+    'spark': None,
+    'shell': None,
+}
+
+
+def is_oozie_tag(tag: str) -> bool:
+    """
+    :return: True if xml tag has no namespace or one of oozie namespaces, like uri:oozie:hive-action:0.2
+    """
+    return not tag.startswith('{') or tag.startswith('{uri:oozie:')
+
+
+def scan_workflow_xml(path_to_workflow_xml: str) -> WorkflowXml:
+    """
+    Reads workflow.xml in one pass, elements are dispatched to ACTION_HANDLERS as soon as their action ends
+    and are dropped right after that, so memory does not grow with document
+    :param path_to_workflow_xml: path to workflow.xml
+    :return: actions in document order
+    """
+    workflow_xml: WorkflowXml = WorkflowXml(os.path.dirname(path_to_workflow_xml))
+    with open(path_to_workflow_xml, 'rb') as file:
+        root: Union[Element, None] = None
+        depth: int = 0
+        for event, el in iterparse(file, events=('start', 'end')):
+            if event == 'start':
+                if root is None:
+                    root = el
+                depth += 1
+                continue
+            depth -= 1
+            if depth != 1:
+                continue
+            if local_name(el.tag) == 'action' and is_oozie_tag(el.tag):
+                for action_el in el:
+                    if is_oozie_tag(action_el.tag):
+                        handler = ACTION_HANDLERS.get(local_name(action_el.tag))
+                        if handler is not None:
+                            handler(action_el, workflow_xml)
+            root.clear()
+        workflow_xml.size = file.tell()
+    return workflow_xml
+
+
+def workflow_files(path_to_workflow_xml: str) -> Tuple[Set[str], List[AppReference]]:
+    """
+    Reads workflow.xml for files, which affect workflow parsing result, and sub-workflows
+    :param path_to_workflow_xml: path to workflow.xml
+    :return: paths of workflow.xml, properties sources and hive scripts, sub-workflows references
+    """
+    path_to_workflow = os.path.sep.join(path_to_workflow_xml.split(os.path.sep)[:-1])
+    paths: Set[str] = {path_to_workflow_xml, *PropertyResolver.source_paths(path_to_workflow)}
+    try:
+        workflow_xml: WorkflowXml = scan_workflow_xml(path_to_workflow_xml)
+    except (ParseError, FileNotFoundError):
+        return paths, []
+    paths.update(workflow_xml.hive_script_paths)
+    return paths, workflow_xml.sub_workflows
+
+
+def workflow_digests(path_to_workflow_xml: str) -> Dict[str, str]:
+    """
+    Calculates hashes of workflow.xml, properties sources and hive scripts, which affect workflow parsing result
+    :param path_to_workflow_xml: path to workflow.xml
+    :return: {file_path: digest} dict
+    """
+    return {path: file_digest(path) for path in workflow_files(path_to_workflow_xml)[0]}
+
+
+class AppPathIndex:
+    """
+    Resolves oozie application paths to repository files: hdfs urls and absolute paths of deployed applications
+    are matched to application directory with the longest common path suffix, relative paths to directory of referrer
+    """
+    SCHEME_RE = re.compile(r'^[A-Za-z][\w+.-]*://[^/]*')
+
+    def __init__(self, working_dir: str, app_dirs: Iterable[str]):
+        """
+        :param working_dir: repository directory
+        :param app_dirs: directories with workflow.xml or coordinator.xml
+        """
+        self.working_dir: str = working_dir
+        # {last path component: [path components relative to working_dir]}
+        self.dirs: Dict[str, List[List[str]]] = {}
+        for app_dir in sorted(set(app_dirs)):
+            parts: List[str] = os.path.relpath(app_dir, working_dir).split(os.path.sep)
+            self.dirs.setdefault(parts[-1], []).append(parts)
+
+    def resolve(self, app_path: str, base_dir: str, file_name: str = 'workflow.xml') -> Union[str, None]:
+        """
+        :param app_path: application path with resolved properties, directory or xml file
+        :param base_dir: directory of referring definition
+        :param file_name: definition file name, if app_path is a directory
+        :return: path to definition file or None, if it is not in repository
+        """
+        path: str = app_path.strip().rstrip('/')
+        relative: bool = not self.SCHEME_RE.match(path) and not path.startswith('/')
+        path = self.SCHEME_RE.sub('', path)
+        if path.endswith('.xml'):
+            path, file_name = path.rsplit('/', 1) if '/' in path else ('', path)
+        if relative:
+            candidate: str = os.path.normpath(os.path.join(base_dir, *path.split('/'), file_name))
+            if os.path.isfile(candidate):
+                return candidate
+        # relative path may be an absolute one with unresolved ${nameNode}
+        parts: List[str] = [p for p in path.split('/') if p]
+        best: Union[List[str], None] = None
+        best_length: int = 0
+        for dir_parts in self.dirs.get(parts[-1] if parts else '', []):
+            length: int = 0
+            while length < min(len(parts), len(dir_parts)) and parts[-1 - length] == dir_parts[-1 - length]:
+                length += 1
+            if length > best_length and os.path.isfile(os.path.join(self.working_dir, *dir_parts, file_name)):
+                best, best_length = dir_parts, length
+        return os.path.join(self.working_dir, *best, file_name) if best is not None else None
+
+
+class WorkflowRepository:
+    """
+    Oozie applications of repository directory. Workflows, which are run only as sub-workflows of other workflows,
+    are not roots: they are parsed as parts of their parents. Coordinators and bundles pass their configuration
+    to workflows they run
+    """
+
+    def __init__(self, working_dir: str):
+        """
+        :param working_dir: dir with workflows, coordinators and bundles directories
+        """
+        self.workflow_xml_paths: List[str] = glob.glob(f'{working_dir}/**/workflow.xml', recursive=True)
+        coordinator_paths: List[str] = sorted(glob.glob(f'{working_dir}/**/coordinator.xml', recursive=True))
+        bundle_paths: List[str] = sorted(glob.glob(f'{working_dir}/**/bundle.xml', recursive=True))
+        self.app_paths: AppPathIndex = AppPathIndex(working_dir, [
+            os.path.dirname(p) for p in self.workflow_xml_paths + coordinator_paths
+        ])
+        # {workflow_xml_path: files}, {workflow_xml_path: sub-workflow xml paths}, {file_path: digest}
+        self.files: Dict[str, Set[str]] = {}
+        self.sub_workflows: Dict[str, List[str]] = {}
+        self._digests: Dict[str, str] = {}
+        unread: List[str] = list(self.workflow_xml_paths)
+        while unread:
+            path: str = unread.pop()
+            if path not in self.files:
+                self._read_workflow(path)
+                unread.extend(self.sub_workflows[path])
+        # {workflow_xml_path: overrides}, {workflow_xml_path: coordinator and bundle files}
+        self.overrides: Dict[str, Dict[str, str]] = {}
+        self.app_files: Dict[str, Set[str]] = {}
+        coordinator_overrides: Dict[str, Dict[str, str]] = {}
+        coordinator_files: Dict[str, Set[str]] = {}
+        for bundle_path in bundle_paths:
+            for coordinator_path, overrides in self._read_references(bundle_path, 'coordinator', 'coordinator.xml'):
+                coordinator_overrides.setdefault(coordinator_path, {}).update(overrides)
+                coordinator_files.setdefault(coordinator_path, set()).add(bundle_path)
+        for coordinator_path in coordinator_paths:
+            bundle_overrides: Dict[str, str] = coordinator_overrides.get(coordinator_path, {})
+            for path, overrides in self._read_references(coordinator_path, 'workflow', 'workflow.xml',
+                                                         bundle_overrides):
+                if os.path.dirname(path) == os.path.dirname(coordinator_path):
+                    # coordinator.xml of workflow directory is a properties source of workflow already
+                    overrides = bundle_overrides
+                self.overrides.setdefault(path, {}).update({**bundle_overrides, **overrides})
+                self.app_files.setdefault(path, set()).update({coordinator_path,
+                                                               *coordinator_files.get(coordinator_path, ())})
+        referenced: Set[str] = {s_p for p, sub_paths in self.sub_workflows.items() for s_p in sub_paths if s_p != p}
+        self.roots: List[str] = [p for p in self.workflow_xml_paths if p not in referenced or p in self.app_files]
+
+    def _read_workflow(self, path_to_workflow_xml: str) -> None:
+        files, references = workflow_files(path_to_workflow_xml)
+        path_to_workflow: str = os.path.dirname(path_to_workflow_xml)
+        resolver: PropertyResolver = PropertyResolver.for_workflow(path_to_workflow)
+        self.files[path_to_workflow_xml] = files
+        self.sub_workflows[path_to_workflow_xml] = [
+            p for p in (self.app_paths.resolve(resolver.replace(r[0]), path_to_workflow) for r in references)
+            if p is not None
+        ]
+
+    def _read_references(self, path: str, tag: str, file_name: str,
+                         overrides: Dict[str, str] = None) -> List[Tuple[str, Dict[str, str]]]:
+        """
+        :return: (definition path, resolved configuration) pairs of applications, referenced by coordinator or bundle
+        """
+        try:
+            root: Element = ElementTree(file=path).getroot()
+        except ParseError:
+            return []
+        resolver: PropertyResolver = PropertyResolver.for_workflow(os.path.dirname(path), overrides)
+        references: List[Tuple[str, Dict[str, str]]] = []
+        for app_path, configuration, _ in read_app_references(root, tag):
+            app_xml_path: Union[str, None] = self.app_paths.resolve(resolver.replace(app_path), os.path.dirname(path),
+                                                                    file_name)
+            if app_xml_path is not None:
+                references.append((app_xml_path, {k: resolver.replace(v) for k, v in configuration.items()}))
+        return references
+
+    def digests(self, path_to_workflow_xml: str) -> Dict[str, str]:
+        """
+        :return: {file_path: digest} dict of files of workflow, its sub-workflows and coordinators and bundles,
+        which run it
+        """
+        paths: Set[str] = set(self.app_files.get(path_to_workflow_xml, ()))
+        visited: Set[str] = set()
+        stack: List[str] = [path_to_workflow_xml]
+        while stack:
+            path: str = stack.pop()
+            if path in visited:
+                continue
+            visited.add(path)
+            paths.update(self.files.get(path, ()))
+            stack.extend(self.sub_workflows.get(path, ()))
+        for path in paths - self._digests.keys():
+            self._digests[path] = file_digest(path)
+        return {path: self._digests[path] for path in paths}
+
+
+def read_hive_schema(schema_filepath: str) -> List[str]:
+    """
+    Reads table names from hive schema csv file
+    :param schema_filepath: path to schema_name,table_name csv file
+    :return: table names in schema.table form, blank lines and lines without schema or table are skipped
+    """
+    tables_list: List[str] = []
+    with open(schema_filepath, 'r') as file:
+        for line in file:
+            if 'schema_name,table_name' in line:
+                continue
+            else:
+                table_name: str = line.replace(' ', '').replace(',', '.').strip()
+                schema_name, _, only_name = table_name.partition('.')
+                if schema_name and only_name:
+                    tables_list.append(table_name)
+    return tables_list
+
+
+def read_impala_schema(schema_filepath: str, chunk_size: int = 10000) -> Generator[
+        Tuple[int, List[Tuple[str, str, str]]], None, None]:
+    """
+    Reads impala schema csv file chunk by chunk
+    :param schema_filepath: path to schema_name,table_name,field_name,field_type csv file
+    :param chunk_size: number of columns in chunk
+    :return: (progress, [(table_name, column_name, column_type)]) chunks
+    """
+    size: int = max(os.path.getsize(schema_filepath), 1)
+    read: int = 0
+
+    def lines(file) -> Generator[str, None, None]:
+        nonlocal read
+        for line in file:
+            read += len(line)
+            yield line
+
+    with open(schema_filepath, 'r', newline='') as file:
+        chunk: List[Tuple[str, str, str]] = []
+        for row in csv.reader(lines(file)):
+            if len(row) < 4 or row[:4] == ['schema_name', 'table_name', 'field_name', 'field_type']:
+                continue
+            chunk.append((row[0].strip() + '.' + row[1].strip(), row[2].strip(), row[3].strip()))
+            if len(chunk) >= chunk_size:
+                yield min(int(read / size * 100), 100), chunk
+                chunk = []
+        yield 100, chunk
+
+
+class TableNameMatcher:
+    """
+    Token index over known table names, finds all of them in hql statement in one pass
+    """
+    TOKEN_RE = re.compile(r'[^ ]+')
+
+    def __init__(self, table_names: Iterable[str], parent: 'TableNameMatcher' = None):
+        """
+        :param table_names: known table names, names without schema are skipped
+        :param parent: matcher, whose names are matched too
+        """
+        self.parent: TableNameMatcher = parent
+        self._digest: Union[str, None] = None
+        self.full_names: Dict[str, List[str]] = {}
+        self.only_names: Dict[str, List[str]] = {}
+        for table_name in table_names:
+            self.add(table_name)
+
+    def add(self, table_name: str) -> None:
+        """
+        Adds table name to index, both as schema.table and as bare table
+        :param table_name: table name
+        """
+        if not re.match(r'^\S+\.\S+$', table_name):
+            return
+        self._digest = None
+        self.full_names.setdefault(table_name, []).append(table_name)
+        self.only_names.setdefault(table_name.split('.')[1].lower(), []).append(table_name)
+
+    def extend(self, table_names: Iterable[str]) -> 'TableNameMatcher':
+        """
+        Creates matcher with additional table names, which shares index with this one
+        :param table_names: additional table names
+        :return: new matcher
+        """
+        return TableNameMatcher(table_names, parent=self)
+
+    @property
+    def digest(self) -> str:
+        """
+        Hash of indexed table names in index order, matchers with equal digests give equal matches
+        """
+        if self._digest is None:
+            digest = hashlib.sha1(self.parent.digest.encode() if self.parent is not None else b'')
+            for table_name in self.full_names:
+                digest.update(table_name.encode() + b'\n')
+            self._digest = digest.hexdigest()
+        return self._digest
+
+    def _lookup(self, token: str) -> Tuple[List[str], List[str]]:
+        full_names: List[str] = self.full_names.get(token, [])
+        only_names: List[str] = self.only_names.get(token, [])
+        if self.parent is not None:
+            parent_full_names, parent_only_names = self.parent._lookup(token)
+            full_names = parent_full_names + full_names
+            only_names = parent_only_names + only_names
+        return full_names, only_names
+
+    def match(self, hql_script: str) -> List[Tuple[str, int]]:
+        """
+        Finds known tables in space separated hql script, name with schema has priority over bare name
+        :param hql_script: lowered and stripped hql script
+        :return: list of (table_name, position) pairs
+        """
+        tokens: List[Tuple[str, int]] = [(m.group(0), m.start()) for m in self.TOKEN_RE.finditer(hql_script)]
+        full_matches: Dict[str, int] = {}
+        only_matches: Dict[str, int] = {}
+        seen: Set[str] = set()
+        # first and last tokens are not surrounded by spaces, so they are never table names
+        for token, position in tokens[1:-1]:
+            if token in seen:
+                continue
+            seen.add(token)
+            full_names, only_names = self._lookup(token)
+            for table_name in full_names:
+                full_matches.setdefault(table_name, position)
+            for table_name in only_names:
+                only_matches.setdefault(table_name, position)
+        only_matches.update(full_matches)
+        return list(only_matches.items())
+
+
+class TableIndex:
+    """
+    Read only name resolution index of known tables, built once per parse run and shared by all workflows
+    and worker processes: interned names, their ids and matcher with bare name aliases of valid names
+    """
+
+    def __init__(self, table_id_name_pairs: Iterable[Tuple[int, str]]):
+        """
+        :param table_id_name_pairs: pairs (table_id, table_name) from hive/impala schema
+        """
+        self.name_ids: Dict[str, int] = {sys.intern(t[1]): t[0] for t in table_id_name_pairs}
+        self.max_id: int = max(self.name_ids.values(), default=0)
+        self.matcher: TableNameMatcher = TableNameMatcher(self.name_ids)
+
+
+@profiling.profiled(size=lambda statement, matcher: len(statement))
+def extract_tables(statement: str, matcher: TableNameMatcher) -> List[str]:
     """
     Extracts table names used in hql statement
     :param statement: hql statement
-    :param table_names: set of known table names
-    :return: set of used table names
+    :param matcher: matcher of known table names
+    :return: used table names, ordered from the last one to the first one in statement
     """
-    used_table_names: List[Tuple[str, int]] = []
     hql_script: str = statement.lower().replace('\n', ' ').strip()
-    # for word in hql_script.split(' '):
-    #     if word == '':
-    #         continue
-    #     name = sqlparse.parse(word)[0].token_first()
-    #     if not name:
-    #         continue
-    #     if not isinstance(name, sqlparse.sql.Identifier) and name.ttype != sqlparse.tokens.Name:
-    #         continue
-    #     for table_name in table_names:
-    #         valid_name = re.match(r'^\S+\.\S+$', table_name)
-    #         if not valid_name:
-    #             continue
-    #         only_name: str = table_name.split('.')[1].lower()
-    #         if word == table_name or word == only_name:
-    #             used_table_names.append(table_name)
-    #             break
-    for table_name in table_names:
-        valid_name = re.match(r'^\S+\.\S+$', table_name)
-        if not valid_name:
-            continue
-        try:
-            table_name_index: int = hql_script.index(f' {table_name} ')
-            used_table_names.append((table_name, table_name_index))
-            continue
-        except ValueError:
-            try:
-                only_name: str = table_name.split('.')[1].lower()
-                only_name_index: int = hql_script.index(f' {only_name} ')
-                used_table_names.append((table_name, only_name_index))
-            except ValueError:
-                continue
-    used_table_names: List[str] = [t[0] for t in sorted(used_table_names, key=lambda x: -x[1])]
-    return used_table_names
+    used_table_names: List[Tuple[str, int]] = matcher.match(hql_script)
+    return [t[0] for t in sorted(used_table_names, key=lambda x: -x[1])]
 
 
-def extract_partitions(statement) -> Set[str]:
+def extract_partitions(statement: str) -> Set[str]:
     """
     Extract table partitions from hql create statement
     :param statement: hql create statement
     :return: set of column names partitioned by
     """
-    partitions = re.search(r'partitioned by \([\s\w]+\)', statement.normalized, re.IGNORECASE)
+    partitions = re.search(r'partitioned by \([\s\w]+\)', statement, re.IGNORECASE)
     if partitions:
         word_list = partitions.group(0).lower().replace('partitioned by (', '').replace(')', '').split(' ')
         return {word_list[i] for i in range(len(word_list)) if i % 2 == 0}
     return set()
 
 
-def parse_hql(script_text: str, workflow_id: int, tables_name_id_dict: Dict[str, int]):
+# Statements, whose relations are extracted by parse_hql_names
+HQL_COMMANDS: Set[str] = {'CREATE', 'INSERT', 'WITH'}
+
+# Lexer of split_hql, alternatives are tried in order, like sqlparse lexer does, so statements are split at the same
+# places, tokens which do not affect splitting are not told apart, so identifiers are not recognized either
+HQL_TOKEN_RE = re.compile('|'.join([
+    r'(?P<hint>(?:--|# )\+.*?(?:\r\n|\r|\n|$)|/\*\+[\s\S]*?\*/)',
+    r'(?P<line_comment>(?:--|# ).*?(?:\r\n|\r|\n|$))',
+    r'(?P<comment>/\*[\s\S]*?\*/)',
+    r'(?P<newline>\r\n|\r|\n)',
+    r'(?P<space>[^\S\r\n]+)',
+    r'(?P<quoted>:=|::|\*|`(?:``|[^`])*`|´(?:´´|[^´])*´|(?<!\S)(?P<tag>\$(?:[_A-ZÀ-Ü]\w*)?\$)[\s\S]*?(?P=tag))',
+    r'(?P<placeholder>\?|%(?:\(\w+\))?s|(?<!\w)[$:?]\w+|\\\w+)',
+    r'(?P<name>(?:CASE|IN|VALUES|USING|FROM|AS)\b|(?:@|##|#)[A-ZÀ-Ü]\w+|[A-ZÀ-Ü]\w*(?=\s*\.)|(?<=\.)[A-ZÀ-Ü]\w*'
+    r'|[A-ZÀ-Ü]\w*(?=\())',
+    r'(?P<number>-?0x[\dA-F]+|-?\d*(?:\.\d+)?E-?\d+|(?![_A-ZÀ-Ü])-?(?:\d+(?:\.\d*)|\.\d+)(?![_A-ZÀ-Ü])'
+    r'|(?![_A-ZÀ-Ü])-?\d+(?![_A-ZÀ-Ü]))',
+    r"""(?P<string>'(?:''|\\\\|\\'|[^'])*'|"(?:""|\\\\|\\"|[^"])*"|""|".*?[^\\]"|(?<![\w\])])\[[^\]]+\])""",
+    r'(?P<end>END(?:\s+IF|\s+LOOP|\s+WHILE)?\b)',
+    r'(?P<create>CREATE(?:\s+OR\s+REPLACE)?\b)',
+    r'(?P<keyword>(?:(?:LEFT\s+|RIGHT\s+|FULL\s+)?(?:INNER\s+|OUTER\s+|STRAIGHT\s+)?|(?:CROSS\s+|NATURAL\s+)?)?JOIN\b'
+    r'|NOT\s+NULL\b|NULLS\s+(?:FIRST|LAST)\b|UNION\s+ALL\b|DOUBLE\s+PRECISION\b|GROUP\s+BY\b|ORDER\s+BY\b'
+    r"|LATERAL\s+VIEW\s+(?:EXPLODE|INLINE|PARSE_URL_TUPLE|POSEXPLODE|STACK)\b|(?:AT|WITH')\s+TIME\s+ZONE\s+'[^']+'"
+    r'|(?:NOT\s+)?(?:LIKE|ILIKE)\b)',
+    r'(?P<word>[0-9_A-ZÀ-Ü][_$#\w]*)',
+    r'(?P<punctuation>[;:()\[\],.])',
+    r'(?P<operator>[<>=~!]+|[+/@#%^&|`?^-]+|[\s\S])',
+]), re.IGNORECASE)
+
+# whitespace and comments, which are not a statement first token
+HQL_SKIPPED_TOKENS: Set[str] = {'hint', 'line_comment', 'comment', 'newline', 'space'}
+
+
+def split_hql(script_text: str) -> Generator[Tuple[str, str], None, None]:
     """
-    Parses hql query and extracts relations between tables and workflows
-    :param script_text: text of hql query
-    :param workflow_id: workflow id
-    :param tables_name_id_dict: {table_name: table_id} dict
-    :return: table_based_on, table_created_in, table_partitions, table_updated_in, table_used_in
+    Splits hql script into statements on semicolons outside of strings, comments and parentheses,
+    like split_hql_sqlparse does. Table names are not taken from its tokens, they are matched in statement text
+    :param script_text: text of hql script
+    :return: (command, statement) pairs of statements, which start with one of HQL_COMMANDS
+    """
+    start: int = 0
+    command: Union[str, None] = None
+    level: int = 0
+    is_create: bool = False
+    begin_depth: int = 0
+    statement_end: bool = False
+    for m in HQL_TOKEN_RE.finditer(script_text):
+        kind: str = m.lastgroup
+        if statement_end and kind not in ('space', 'line_comment'):
+            if command in HQL_COMMANDS:
+                yield command, script_text[start:m.start()]
+            start, command, level, is_create, begin_depth, statement_end = m.start(), None, 0, False, 0, False
+        if command is None and kind not in HQL_SKIPPED_TOKENS:
+            command = m.group().upper() if kind in ('create', 'word') else ''
+        if kind == 'punctuation':
+            value: str = m.group()
+            if value == '(':
+                level += 1
+            elif value == ')':
+                level -= 1
+            elif value == ';' and level <= 0:
+                statement_end = True
+        elif kind == 'create':
+            is_create = True
+        elif kind == 'end':
+            value: str = m.group().upper()
+            if value == 'END':
+                begin_depth = max(0, begin_depth - 1)
+                level -= 1
+            elif value in ('END IF', 'END WHILE'):
+                level -= 1
+        elif kind == 'word':
+            value: str = m.group().upper()
+            if value == 'BEGIN':
+                begin_depth += 1
+                if is_create:
+                    level += 1
+            elif value == 'DECLARE' and is_create and begin_depth == 0:
+                level += 1
+            elif value in ('IF', 'FOR', 'WHILE') and is_create and begin_depth > 0:
+                level += 1
+    if command in HQL_COMMANDS:
+        yield command, script_text[start:]
+
+
+def split_hql_sqlparse(script_text: str) -> Generator[Tuple[str, str], None, None]:
+    """
+    Splits hql script into statements with sqlparse
+    :param script_text: text of hql script
+    :return: (command, statement) pairs of statements, which start with one of HQL_COMMANDS
     """
-    if script_text == '':
-        return set(), set(), set(), set(), set()
-    all_table_names = set(tables_name_id_dict.keys())
-    table_based_on: Set[Tuple[int, int]] = set()
-    table_created_in: Set[Tuple[int, int]] = set()
-    table_partitions: Set[Tuple[int, str]] = set()
-    table_updated_in: Set[Tuple[int, int]] = set()
-    table_used_in: Set[Tuple[int, int]] = set()
     for statement in sqlparse.parse(script_text):
         command = statement.token_first(True, True)
-        lower_statement: str = statement.normalized.lower().replace('\n', ' ')
-        if not command:
-            continue
-        if command.normalized == 'CREATE':
+        if command and command.normalized in HQL_COMMANDS:
+            yield command.normalized, statement.normalized
+
+
+# hql splitters, which can be used by parse_hql, with any of them table names are found by TableNameMatcher
+HQL_BACKENDS: Dict[str, Callable[[str], Iterable[Tuple[str, str]]]] = {
+    'fast': split_hql,
+    'sqlparse': split_hql_sqlparse,
+}
+
+
+# based_on (target_name, base_name) pairs, created names, partitions (table_name, column) pairs, updated names, used names
+HqlNames = Tuple[Set[Tuple[str, str]], Set[str], Set[Tuple[str, str]], Set[str], Set[str]]
+
+
+class HqlParseCache:
+    """
+    LRU cache of parse_hql_names results, keyed by hash of matcher table names and resolved script text
+    """
+
+    def __init__(self, entries: Iterable[Tuple[str, str]] = (), max_size: int = 10000):
+        """
+        :param entries: (key, json result) pairs from the least to the most recently used
+        :param max_size: max number of entries, the least recently used ones are evicted
+        """
+        self.max_size: int = max_size
+        self.entries: OrderedDict = OrderedDict(entries)
+        self.added: Dict[str, str] = {}
+        self.evict()
+
+    @staticmethod
+    def key(script_text: str, matcher: TableNameMatcher, backend: str = 'fast') -> str:
+        digest = hashlib.sha1((backend + matcher.digest).encode())
+        digest.update(script_text.encode())
+        return digest.hexdigest()
+
+    def get(self, key: str) -> Union[HqlNames, None]:
+        result: Union[str, None] = self.entries.get(key)
+        if result is None:
+            return None
+        self.entries.move_to_end(key)
+        based_on, created, partitions, updated, used = json.loads(result)
+        return ({tuple(p) for p in based_on}, set(created), {tuple(p) for p in partitions}, set(updated),
+                set(used))
+
+    def put(self, key: str, names: HqlNames) -> None:
+        result: str = json.dumps([sorted(n) for n in names])
+        self.entries[key] = result
+        self.added[key] = result
+        self.evict()
+
+    def merge(self, entries: Dict[str, str]) -> None:
+        """
+        Adds entries, parsed by other process
+        :param entries: {key: json result} dict
+        """
+        for key, result in entries.items():
+            self.entries[key] = result
+            self.entries.move_to_end(key)
+        self.evict()
+
+    def pop_added(self) -> Dict[str, str]:
+        """
+        :return: {key: json result} dict of entries added since previous call
+        """
+        added, self.added = self.added, {}
+        return added
+
+    def evict(self) -> None:
+        while len(self.entries) > self.max_size:
+            self.entries.popitem(last=False)
+
+
+def parse_hql_names(script_text: str, matcher: TableNameMatcher, backend: str = 'fast') -> HqlNames:
+    """
+    Parses hql query and extracts relations between tables by their names
+    :param script_text: text of hql query
+    :param matcher: matcher of known table names
+    :param backend: name of splitter from HQL_BACKENDS
+    :return: table_based_on, table_created_in, table_partitions, table_updated_in, table_used_in with table names
+    """
+    table_based_on: Set[Tuple[str, str]] = set()
+    table_created_in: Set[str] = set()
+    table_partitions: Set[Tuple[str, str]] = set()
+    table_updated_in: Set[str] = set()
+    table_used_in: Set[str] = set()
+    with profiling.phase(f'split_hql.{backend}', len(script_text)):
+        statements: List[Tuple[str, str]] = list(HQL_BACKENDS[backend](script_text))
+    for command, statement in statements:
+        if command == 'CREATE':
             partitions: Set[str] = extract_partitions(statement)
-            table_names: List[str] = extract_tables(statement.normalized, all_table_names)
+            table_names: List[str] = extract_tables(statement, matcher)
             if len(table_names) == 0:
                 continue
-            created_table_id = tables_name_id_dict[table_names.pop()]
-            base_tables_ids = [tables_name_id_dict[t_n] for t_n in table_names]
-            table_based_on.update(((created_table_id, b_t_i) for b_t_i in base_tables_ids))
-            table_created_in.update(((created_table_id, workflow_id),))
-            table_partitions.update(((created_table_id, p_n) for p_n in partitions))
-            table_used_in.update(((b_t_i, workflow_id) for b_t_i in base_tables_ids))
-        elif command.normalized == 'INSERT':
-            table_names: List[str] = extract_tables(statement.normalized, all_table_names)
+            created_table_name: str = table_names.pop()
+            table_based_on.update(((created_table_name, b_t_n) for b_t_n in table_names))
+            table_created_in.add(created_table_name)
+            table_partitions.update(((created_table_name, p_n) for p_n in partitions))
+            table_used_in.update(table_names)
+        elif command == 'INSERT':
+            table_names: List[str] = extract_tables(statement, matcher)
             if len(table_names) == 0:
                 continue
-            inserted_table_id = tables_name_id_dict[table_names.pop()]
-            base_tables_ids = [tables_name_id_dict[t_n] for t_n in table_names]
-            table_based_on.update(((inserted_table_id, b_t_i) for b_t_i in base_tables_ids))
-            table_updated_in.update(((inserted_table_id, workflow_id),))
-            table_used_in.update(((b_t_i, workflow_id) for b_t_i in base_tables_ids))
-        elif command.normalized == 'WITH':
-            sub_statements: List[str] = lower_statement.split('insert')
-            table_names: List[str] = extract_tables(sub_statements[1], all_table_names)
+            inserted_table_name: str = table_names.pop()
+            table_based_on.update(((inserted_table_name, b_t_n) for b_t_n in table_names))
+            table_updated_in.add(inserted_table_name)
+            table_used_in.update(table_names)
+        elif command == 'WITH':
+            sub_statements: List[str] = statement.lower().replace('\n', ' ').split('insert')
+            table_names: List[str] = extract_tables(sub_statements[1], matcher)
             if len(table_names) == 0:
                 continue
-            inserted_table_name = table_names.pop()
-            inserted_table_id = tables_name_id_dict[inserted_table_name]
-            table_names += extract_tables(sub_statements[0], all_table_names)
-            base_tables_ids = [tables_name_id_dict[t_n] for t_n in table_names]
-            table_based_on.update(((inserted_table_id, b_t_i) for b_t_i in base_tables_ids))
-            table_updated_in.update(((inserted_table_id, workflow_id),))
-            table_used_in.update(((b_t_i, workflow_id) for b_t_i in base_tables_ids))
-        else:
-            pass
+            inserted_table_name: str = table_names.pop()
+            table_names += extract_tables(sub_statements[0], matcher)
+            table_based_on.update(((inserted_table_name, b_t_n) for b_t_n in table_names))
+            table_updated_in.add(inserted_table_name)
+            table_used_in.update(table_names)
     return table_based_on, table_created_in, table_partitions, table_updated_in, table_used_in
 
 
-def parse_workflow(path_to_workflow_xml: str, workflow_id: int, table_id_name_pairs: List[Tuple[int, str]]):
+@profiling.profiled(size=lambda script_text, *args, **kwargs: len(script_text))
+def parse_hql(script_text: str, workflow_id: int, tables_name_id_dict: Mapping[str, int],
+              matcher: TableNameMatcher = None, cache: HqlParseCache = None, backend: str = 'fast'):
     """
-    Parse workflow and extracts tables and relations between them in workflow
+    Parses hql query and extracts relations between tables and workflows
+    :param script_text: text of hql query
+    :param workflow_id: workflow id
+    :param tables_name_id_dict: {table_name: table_id} dict
+    :param matcher: matcher of table names from tables_name_id_dict, built if not passed
+    :param cache: cache of parse_hql_names results
+    :param backend: name of splitter from HQL_BACKENDS
+    :return: table_based_on, table_created_in, table_partitions, table_updated_in, table_used_in
+    """
+    if script_text == '':
+        return set(), set(), set(), set(), set()
+    if matcher is None:
+        matcher = TableNameMatcher(tables_name_id_dict.keys())
+    if cache is None:
+        names: HqlNames = parse_hql_names(script_text, matcher, backend)
+    else:
+        key: str = HqlParseCache.key(script_text, matcher, backend)
+        names: Union[HqlNames, None] = cache.get(key)
+        if names is None:
+            names = parse_hql_names(script_text, matcher, backend)
+            cache.put(key, names)
+    based_on, created, partitions, updated, used = names
+    table_based_on: Set[Tuple[int, int, int]] = {(tables_name_id_dict[t_n], tables_name_id_dict[b_t_n], workflow_id)
+                                                 for t_n, b_t_n in based_on}
+    table_created_in: Set[Tuple[int, int]] = {(tables_name_id_dict[t_n], workflow_id) for t_n in created}
+    table_partitions: Set[Tuple[int, str, int]] = {(tables_name_id_dict[t_n], p_n, workflow_id)
+                                                   for t_n, p_n in partitions}
+    table_updated_in: Set[Tuple[int, int]] = {(tables_name_id_dict[t_n], workflow_id) for t_n in updated}
+    table_used_in: Set[Tuple[int, int]] = {(tables_name_id_dict[t_n], workflow_id) for t_n in used}
+    return table_based_on, table_created_in, table_partitions, table_updated_in, table_used_in
+
+
+class WorkflowDefinition:
+    """
+    Actions of workflow.xml with resolved properties: sqooped tables, hive scripts and sub-workflows
+    """
+    __slots__ = ('path_to_workflow_xml', 'sqooped_tables', 'hive_scripts', 'sub_workflows')
+
+    def __init__(self, path_to_workflow_xml: str):
+        self.path_to_workflow_xml: str = path_to_workflow_xml
+        self.sqooped_tables: List[str] = []
+        # (script path, script text)
+        self.hive_scripts: List[Tuple[str, str]] = []
+        # (path to sub-workflow xml, overrides)
+        self.sub_workflows: List[Tuple[str, Dict[str, str]]] = []
+
+
+def read_workflow_definition(path_to_workflow_xml: str, overrides: Dict[str, str] = None,
+                             app_paths: AppPathIndex = None) -> WorkflowDefinition:
+    """
+    Reads actions of workflow
+    :param path_to_workflow_xml: path to workflow.xml
+    :param overrides: properties passed by parent workflow, coordinator or bundle
+    :param app_paths: index of repository applications, sub-workflows are skipped without it
+    :return: workflow definition
+    """
+    with profiling.phase('read_workflow_xml') as phase:
+        workflow_xml: WorkflowXml = scan_workflow_xml(path_to_workflow_xml)
+        phase.size = workflow_xml.size
+    path_to_workflow = workflow_xml.path_to_workflow
+    resolver: PropertyResolver = PropertyResolver.for_workflow(path_to_workflow, overrides)
+    definition: WorkflowDefinition = WorkflowDefinition(path_to_workflow_xml)
+    definition.sqooped_tables = [resolver.replace(t_n) for t_n in workflow_xml.sqooped_tables]
+    definition.hive_scripts = [(s_p, resolver.replace(read_hive_script(s_p)))
+                               for s_p in workflow_xml.hive_script_paths]
+    if app_paths is not None:
+        for app_path, configuration, propagate in workflow_xml.sub_workflows:
+            sub_workflow_xml_path: Union[str, None] = app_paths.resolve(resolver.replace(app_path), path_to_workflow)
+            if sub_workflow_xml_path is None:
+                continue
+            sub_overrides: Dict[str, str] = dict(resolver.properties) if propagate else {}
+            sub_overrides.update((k, resolver.replace(v)) for k, v in configuration.items())
+            definition.sub_workflows.append((sub_workflow_xml_path, sub_overrides))
+    return definition
+
+
+# {(path to sub-workflow xml, sorted overrides): definition} of sub-workflows read during parse run
+WorkflowMemo = Dict[Tuple[str, Tuple[Tuple[str, str], ...]], WorkflowDefinition]
+
+
+def read_workflow_tree(path_to_workflow_xml: str, overrides: Dict[str, str] = None, app_paths: AppPathIndex = None,
+                       memo: WorkflowMemo = None) -> List[WorkflowDefinition]:
+    """
+    Reads workflow and its sub-workflows, sub-workflow is read once per overrides, however many parents it has,
+    sub-workflows, which are broken or run their ancestors, are skipped
+    :param path_to_workflow_xml: path to workflow.xml
+    :param overrides: properties passed by coordinator or bundle
+    :param app_paths: index of repository applications, sub-workflows are skipped without it
+    :param memo: definitions of sub-workflows read before
+    :return: definitions of workflow and its sub-workflows in depth first order
+    """
+    if memo is None:
+        memo = {}
+    definitions: List[WorkflowDefinition] = []
+
+    def visit(path: str, path_overrides: Dict[str, str], ancestors: Tuple[str, ...]) -> None:
+        if not len(ancestors):
+            definition: WorkflowDefinition = read_workflow_definition(path, path_overrides, app_paths)
+        elif path in ancestors:
+            return
+        else:
+            key: Tuple[str, Tuple[Tuple[str, str], ...]] = (path, tuple(sorted(path_overrides.items())))
+            definition: Union[WorkflowDefinition, None] = memo.get(key)
+            if definition is None:
+                try:
+                    definition = read_workflow_definition(path, path_overrides, app_paths)
+                except (ParseError, OSError):
+                    return
+                memo[key] = definition
+        definitions.append(definition)
+        for sub_workflow_xml_path, sub_overrides in definition.sub_workflows:
+            visit(sub_workflow_xml_path, sub_overrides, ancestors + (path,))
+
+    visit(path_to_workflow_xml, overrides or {}, ())
+    return definitions
+
+
+def parse_workflow(path_to_workflow_xml: str, workflow_id: int, table_index: TableIndex,
+                   cache: HqlParseCache = None, hql_backend: str = 'fast', overrides: Dict[str, str] = None,
+                   app_paths: AppPathIndex = None, memo: WorkflowMemo = None):
+    """
+    Parse workflow and extracts tables and relations between them in workflow, relations of its sub-workflows
+    belong to it too
     :param path_to_workflow_xml: path to workflow.xml
     :param workflow_id: id of that workflow
-    :param table_id_name_pairs: list of (table_id, table_name) pairs
+    :param table_index: index of known tables, it is not changed, new sqooped tables are kept aside
+    :param cache: cache of hive scripts parse results
+    :param hql_backend: name of hql splitter from HQL_BACKENDS
+    :param overrides: properties passed by coordinator or bundle
+    :param app_paths: index of repository applications, sub-workflows are skipped without it
+    :param memo: definitions of sub-workflows read during parse run
     :return: sqooped_tables, workflows, table_based_on, table_created_in, table_partitions, table_updated_in, table_used_in
     """
-    with open(path_to_workflow_xml, 'r') as workflow_xml:
-        root = ElementTree(file=workflow_xml).getroot()
     path_to_workflow = os.path.sep.join(path_to_workflow_xml.split(os.path.sep)[:-1])
     workflow_name = path_to_workflow.split(os.path.sep)[-1]
-    if workflow_name == 'wf_mrr_all_products_daily_report':
-        b = 1
-    r_g = resolve_global(path_to_workflow)
-    next(r_g)
-    tables_id_name_dict: Dict[int, str] = {t[0]: t[1] for t in table_id_name_pairs}
-    tables_name_id_dict: Dict[str, int] = {t[1]: t[0] for t in table_id_name_pairs}
-    index_g = index_generator(max(tables_id_name_dict.keys()) + 1)
-    sqooped_tables: Set[Tuple[int, str, bool]] = set()
+    definitions: List[WorkflowDefinition] = read_workflow_tree(path_to_workflow_xml, overrides, app_paths, memo)
+    new_tables_name_id_dict: Dict[str, int] = {}
+    index_g = index_generator(table_index.max_id + 1)
+    sqooped_tables: Set[Tuple[int, str, bool, int]] = set()
     workflows: Set[Tuple[int, str]] = {(workflow_id, workflow_name)}
-    table_based_on: Set[Tuple[int, int]] = set()
+    table_based_on: Set[Tuple[int, int, int]] = set()
     table_created_in: Set[Tuple[int, int]] = set()
-    table_partitions: Set[Tuple[int, str]] = set()
+    table_partitions: Set[Tuple[int, str, int]] = set()
     table_updated_in: Set[Tuple[int, int]] = set()
     table_used_in: Set[Tuple[int, int]] = set()
-    for el in root:
-        if 'action' in el.tag:
-            for el_ in el:
-                if 'sqoop' in el_.tag:
-                    table_name: str = parse_sqoop(el_)
-                    table_name: str = replace_global(table_name, r_g)
-                    table_id: int = tables_name_id_dict.get(table_name, None)
-                    new: bool = False
-                    if table_id is None:
-                        table_id = next(index_g)
-                        tables_id_name_dict.update({table_id: table_name})
-                        tables_name_id_dict.update({table_name: table_id})
-                        new = True
-                    sqooped_tables.update(((table_id, table_name, new),))
-                    table_used_in.update(((table_id, workflow_id),))
-    for el in root:
-        if 'action' in el.tag:
-            for el_ in el:
-                if 'hive' in el_.tag:
-                    script_text = replace_global(get_hive_script(path_to_workflow, el_), r_g)
-                    _table_based_on, _table_created_in, _table_partitions, _table_updated_in, _table_used_in = parse_hql(
-                        script_text, workflow_id, tables_name_id_dict)
-                    table_based_on.update(_table_based_on)
-                    table_created_in.update(_table_created_in)
-                    table_partitions.update(_table_partitions)
-                    table_updated_in.update(_table_updated_in)
-                    table_used_in.update(_table_used_in)
+    # sqooped tables of all sub-workflows are known before hive scripts are parsed
+    for definition in definitions:
+        for table_name in definition.sqooped_tables:
+            table_id: int = table_index.name_ids.get(table_name, new_tables_name_id_dict.get(table_name))
+            new: bool = False
+            if table_id is None:
+                table_id = next(index_g)
+                new_tables_name_id_dict[table_name] = table_id
+                new = True
+            sqooped_tables.update(((table_id, table_name, new, workflow_id),))
+            table_used_in.update(((table_id, workflow_id),))
+    matcher: TableNameMatcher = table_index.matcher
+    tables_name_id_dict: Mapping[str, int] = table_index.name_ids
+    if len(new_tables_name_id_dict):
+        matcher = matcher.extend(new_tables_name_id_dict)
+        tables_name_id_dict = ChainMap(new_tables_name_id_dict, table_index.name_ids)
+    for definition in definitions:
+        for script_path, script_text in definition.hive_scripts:
+            with profiling.phase('hive_script', len(script_text), kind='script', item=script_path):
+                _table_based_on, _table_created_in, _table_partitions, _table_updated_in, _table_used_in = \
+                    parse_hql(script_text, workflow_id, tables_name_id_dict, matcher, cache, hql_backend)
+            table_based_on.update(_table_based_on)
+            table_created_in.update(_table_created_in)
+            table_partitions.update(_table_partitions)
+            table_updated_in.update(_table_updated_in)
+            table_used_in.update(_table_used_in)
 
     return sqooped_tables, workflows, table_based_on, table_created_in, table_partitions, table_updated_in, table_used_in
 
 
-def parse_workflows_coroutine(working_dir: str, table_id_name_pairs: List[Tuple[int, str]]) -> Tuple[List[Tuple]]:
+_worker_context: Dict[str, Any] = {}
+
+
+def init_parse_worker(table_index: TableIndex, cache: HqlParseCache,
+                      hql_backend: str = 'fast', profile_top_n: int = 0, app_paths: AppPathIndex = None) -> None:
+    """
+    Initializes worker process of parsing pool, forked workers share table index of parent process
+    :param table_index: index of known tables
+    :param cache: cache of hive scripts parse results, worker gets its own copy
+    :param hql_backend: name of hql splitter from HQL_BACKENDS
+    :param profile_top_n: enables profiling in worker process, keeping that number of the slowest items,
+    forked worker gets a new profiler instead of the inherited one, which has phases of parent process
+    :param app_paths: index of repository applications to follow sub-workflows
+    """
+    _worker_context['profiler'] = profiling.enable(profile_top_n) if profile_top_n else None
+    _worker_context['table_index'] = table_index
+    _worker_context['cache'] = cache
+    _worker_context['hql_backend'] = hql_backend
+    _worker_context['app_paths'] = app_paths
+    _worker_context['memo'] = {}
+
+
+def parse_workflow_task(task: Tuple[str, int, Dict[str, str]]):
+    """
+    Parses workflow in worker process of parsing pool
+    :param task: (path_to_workflow_xml, workflow_id, overrides)
+    :return: parse_workflow result, hive scripts parse results added to worker cache and profiler state of worker
+    process, None if phases are measured by profiler of current process
+    """
+    path_to_workflow_xml, workflow_id, overrides = task
+    cache: HqlParseCache = _worker_context['cache']
+    with profiling.phase('parse_workflow', kind='workflow', item=path_to_workflow_xml):
+        result = parse_workflow(path_to_workflow_xml, workflow_id, _worker_context['table_index'], cache,
+                                _worker_context['hql_backend'], overrides, _worker_context['app_paths'],
+                                _worker_context['memo'])
+    profiler: Union[profiling.Profiler, None] = _worker_context['profiler']
+    return result, cache.pop_added(), profiler.pop_state() if profiler is not None else None
+
+
+def merge_new_table_ids(result: Tuple[Set[Tuple], ...], new_tables_name_id_dict: Dict[str, int],
+                        index_g: Generator) -> Tuple[Set[Tuple], ...]:
+    """
+    Replaces table ids, allocated by parse_workflow for new sqooped tables, with ids unique across all workflows
+    :param result: parse_workflow result
+    :param new_tables_name_id_dict: {table_name: table_id} dict of new tables from already merged workflows
+    :param index_g: generator of new table ids
+    :return: parse_workflow result with remapped table ids
+    """
+    sqooped_tables, workflows, table_based_on, table_created_in, table_partitions, table_updated_in, table_used_in = result
+    ids_map: Dict[int, int] = {}
+    for table_id, table_name, new, _ in sorted(sqooped_tables, key=itemgetter(0)):
+        if new:
+            if table_name not in new_tables_name_id_dict:
+                new_tables_name_id_dict[table_name] = next(index_g)
+            ids_map[table_id] = new_tables_name_id_dict[table_name]
+    if not len(ids_map):
+        return result
+
+    def remap(pairs: Set[Tuple], positions: Tuple[int, ...] = (0,)) -> Set[Tuple]:
+        return {tuple(ids_map.get(v, v) if i in positions else v for i, v in enumerate(p)) for p in pairs}
+
+    return (remap(sqooped_tables), workflows, remap(table_based_on, (0, 1)), remap(table_created_in),
+            remap(table_partitions), remap(table_updated_in), remap(table_used_in))
+
+
+def parse_workflows_coroutine(working_dir: str, table_id_name_pairs: List[Tuple[int, str]],
+                              processes: Union[int, None] = 1,
+                              manifest: Dict[str, Tuple[int, Dict[str, str]]] = None,
+                              workflow_id_name_pairs: List[Tuple[int, str]] = None,
+                              hql_cache: HqlParseCache = None, hql_backend: str = 'fast',
+                              store: Store = None, batch_size: int = 100) -> Tuple[List[Tuple]]:
     """
-    Coroutine, witch parses workflows one by one in working_dir, looking for tables in it
+    Coroutine, witch parses new and changed workflows in working_dir, looking for tables in it,
+    sub-workflows are parsed as parts of workflows, which run them, coordinators and bundles pass their configuration
     :param working_dir: dir with workflows directories
     :param table_id_name_pairs: list of pairs (table_id, table_name) from hive/impala schema
-    :return: sqooped_tables, workflows, table_based_on, table_created_in, table_partitions, table_updated_in, table_used_in
+    :param processes: number of parsing processes, None for cpu count, 1 parses in current process
+    :param manifest: {workflow_xml_path: (workflow_id, {file_path: digest})} dict from previous run,
+    workflows with unchanged files (of their sub-workflows, coordinators and bundles too) are not parsed
+    :param workflow_id_name_pairs: list of pairs (workflow_id, workflow_name) of known workflows, they keep their ids
+    :param hql_cache: cache of hive scripts parse results, it is updated with scripts parsed in this run
+    :param hql_backend: name of hql splitter from HQL_BACKENDS
+    :param store: store, which gets results instead of returning them: relations of stale workflows are deleted
+    before parsing and results are inserted with manifest of their workflows in batches, so memory does not grow
+    with repository and interrupted run resumes after the last inserted batch
+    :param batch_size: number of workflows in batch inserted into store
+    :return: sqooped_tables, workflows, table_based_on, table_created_in, table_partitions, table_updated_in, table_used_in,
+    workflows_manifest, stale_workflows (ids of workflows, whose previous relations are outdated),
+    only workflows are collected, if results are inserted into store
     (yields progress value after each parsed workflow)
     """
-    paths_to_workflows: List[str] = glob.glob(f'{working_dir}/**/workflow.xml')
+    if manifest is None:
+        manifest = {}
+    if workflow_id_name_pairs is None:
+        workflow_id_name_pairs = []
+    if hql_cache is None:
+        hql_cache = HqlParseCache()
+    workflows_name_id_dict: Dict[str, int] = {w[1]: w[0] for w in workflow_id_name_pairs}
+    index_g = index_generator(max(workflows_name_id_dict.values(), default=0) + 1)
+    workflows_manifest: Dict[str, Tuple[int, Dict[str, str]]] = {}
+    repository: WorkflowRepository = WorkflowRepository(working_dir)
+    for path in repository.roots:
+        workflow_name = os.path.sep.join(path.split(os.path.sep)[:-1]).split(os.path.sep)[-1]
+        if workflow_name not in workflows_name_id_dict:
+            workflows_name_id_dict[workflow_name] = next(index_g)
+        workflows_manifest[path] = (workflows_name_id_dict[workflow_name], repository.digests(path))
+    if len(manifest):
+        stale_workflows: Set[int] = {m[0] for p, m in manifest.items() if workflows_manifest.get(p) != m}
+    else:
+        stale_workflows: Set[int] = {w[0] for w in workflow_id_name_pairs}
+    tasks: List[Tuple[str, int, Dict[str, str]]] = [(p, m[0], repository.overrides.get(p, {}))
+                                                    for p, m in workflows_manifest.items()
+                                                    if manifest.get(p) != m or m[0] in stale_workflows]
+    stale_workflows.update(t[1] for t in tasks)
     progress: int = 0
-    length: int = len(paths_to_workflows)
-    sqooped_tables: Set[Tuple[int, str, bool]] = set()
+    length: int = len(tasks)
+    sqooped_tables: Set[Tuple[int, str, bool, int]] = set()
     workflows: Set[Tuple[int, str]] = set()
-    table_based_on: Set[Tuple[int, int]] = set()
+    table_based_on: Set[Tuple[int, int, int]] = set()
     table_created_in: Set[Tuple[int, int]] = set()
-    table_partitions: Set[Tuple[int, str]] = set()
+    table_partitions: Set[Tuple[int, str, int]] = set()
     table_updated_in: Set[Tuple[int, int]] = set()
     table_used_in: Set[Tuple[int, int]] = set()
-    index_g = index_generator(1)
-    for path in paths_to_workflows:
-        _sqooped_tables, _workflows, _table_based_on, _table_created_in, _table_partitions, _table_updated_in, _table_used_in = parse_workflow(
-            path, next(index_g), table_id_name_pairs)
-        sqooped_tables.update(_sqooped_tables)
-        workflows.update(_workflows)
-        table_based_on.update(_table_based_on)
-        table_created_in.update(_table_created_in)
-        table_partitions.update(_table_partitions)
-        table_updated_in.update(_table_updated_in)
-        table_used_in.update(_table_used_in)
-        yield round(progress / length * 100)
-        progress += 1
-    return sqooped_tables, workflows, table_based_on, table_created_in, table_partitions, table_updated_in, table_used_in
+    new_tables_name_id_dict: Dict[str, int] = {}
+    table_index: TableIndex = TableIndex(table_id_name_pairs)
+    new_table_index_g = index_generator(table_index.max_id + 1)
+    batch: List[Tuple[Set[Tuple], ...]] = []
+    batch_manifest: Dict[str, Tuple[int, Dict[str, str]]] = {}
+    if store is not None:
+        store.delete_workflows_relations(stale_workflows)
+    profiler: Union[profiling.Profiler, None] = profiling.active()
+    profile_top_n: int = profiler.top_n if profiler is not None else 0
+    pool: Union[Pool, None] = None
+    if processes == 1:
+        # phases are measured by the active profiler of current process directly
+        init_parse_worker(table_index, hql_cache, hql_backend, 0, repository.app_paths)
+        results = map(parse_workflow_task, tasks)
+    else:
+        processes = processes or os.cpu_count() or 1
+        pool = Pool(processes, initializer=init_parse_worker,
+                    initargs=(table_index, hql_cache, hql_backend, profile_top_n, repository.app_paths))
+        results = pool.imap(parse_workflow_task, tasks, chunksize=max(1, min(16, length // (processes * 4))))
+    try:
+        # results come in tasks order, so new table ids do not depend on workers scheduling
+        for (path, _, _), (result, added_to_cache, profiler_state) in zip(tasks, results):
+            hql_cache.merge(added_to_cache)
+            if profiler is not None and profiler_state is not None:
+                profiler.merge(profiler_state)
+            result = merge_new_table_ids(result, new_tables_name_id_dict, new_table_index_g)
+            workflows.update(result[1])
+            if store is not None:
+                batch.append(result)
+                batch_manifest[path] = workflows_manifest[path]
+                if len(batch) >= batch_size:
+                    store.insert_workflows_results(batch, batch_manifest)
+                    batch, batch_manifest = [], {}
+            else:
+                _sqooped_tables, _, _table_based_on, _table_created_in, _table_partitions, _table_updated_in, \
+                    _table_used_in = result
+                sqooped_tables.update(_sqooped_tables)
+                table_based_on.update(_table_based_on)
+                table_created_in.update(_table_created_in)
+                table_partitions.update(_table_partitions)
+                table_updated_in.update(_table_updated_in)
+                table_used_in.update(_table_used_in)
+            yield round(progress / length * 100)
+            progress += 1
+        if len(batch):
+            store.insert_workflows_results(batch, batch_manifest)
+    finally:
+        if pool is not None:
+            pool.terminate()
+        _worker_context.clear()
+    return sqooped_tables, workflows, table_based_on, table_created_in, table_partitions, table_updated_in, \
+        table_used_in, workflows_manifest, stale_workflows
 
 
 if __name__ == '__main__':
@@ -0,0 +1,211 @@
+"""
+Opt-in wall time instrumentation: phases aggregate time, number of calls and processed bytes,
+kinds of items (workflows, scripts) keep the slowest ones. Nothing is measured until enable() is called
+"""
+import functools
+import heapq
+import inspect
+from time import perf_counter
+from typing import List, Dict, Tuple, Union, Callable, Any
+
+# {phase: [seconds, calls, bytes]}, {kind: min heap of (seconds, item)}
+ProfilerState = Tuple[Dict[str, List], Dict[str, List[Tuple[float, str]]]]
+
+
+class Profiler:
+    def __init__(self, top_n: int = 10):
+        """
+        :param top_n: number of the slowest items kept for every kind
+        """
+        self.top_n: int = top_n
+        self.phases: Dict[str, List] = {}
+        self.slowest: Dict[str, List[Tuple[float, str]]] = {}
+
+    def add(self, phase: str, seconds: float, size: int = 0, kind: str = None, item: str = None) -> None:
+        """
+        Adds call of phase
+        :param phase: phase name
+        :param seconds: wall time of call
+        :param size: number of processed bytes
+        :param kind: kind of processed item, if the slowest items of that kind are kept
+        :param item: processed item, workflow or script path
+        """
+        totals: Union[List, None] = self.phases.get(phase)
+        if totals is None:
+            totals = self.phases[phase] = [0.0, 0, 0]
+        totals[0] += seconds
+        totals[1] += 1
+        totals[2] += size
+        if kind is not None:
+            heap: List[Tuple[float, str]] = self.slowest.setdefault(kind, [])
+            if len(heap) < self.top_n:
+                heapq.heappush(heap, (seconds, item))
+            elif seconds > heap[0][0]:
+                heapq.heapreplace(heap, (seconds, item))
+
+    def pop_state(self) -> ProfilerState:
+        """
+        :return: state measured since previous call, to be merged by profiler of another process
+        """
+        state: ProfilerState = (self.phases, self.slowest)
+        self.phases, self.slowest = {}, {}
+        return state
+
+    def merge(self, state: ProfilerState) -> None:
+        phases, slowest = state
+        for phase, (seconds, calls, size) in phases.items():
+            totals: List = self.phases.setdefault(phase, [0.0, 0, 0])
+            totals[0] += seconds
+            totals[1] += calls
+            totals[2] += size
+        for kind, items in slowest.items():
+            heap: List[Tuple[float, str]] = self.slowest.setdefault(kind, [])
+            for seconds_item in items:
+                if len(heap) < self.top_n:
+                    heapq.heappush(heap, seconds_item)
+                elif seconds_item[0] > heap[0][0]:
+                    heapq.heapreplace(heap, seconds_item)
+
+    def report(self) -> Dict[str, Any]:
+        """
+        :return: phases from the slowest one with their totals and the slowest items of every kind
+        """
+        return {
+            'phases': {
+                phase: {'seconds': round(t[0], 4), 'calls': t[1], 'bytes': t[2]}
+                for phase, t in sorted(self.phases.items(), key=lambda p: -p[1][0])
+            },
+            'slowest': {
+                kind: [{'seconds': round(s, 4), 'item': i} for s, i in sorted(items, reverse=True)]
+                for kind, items in self.slowest.items()
+            },
+        }
+
+    def summary(self, phases_count: int = 4) -> str:
+        """
+        :return: one line text with the slowest phases and the slowest item of every kind
+        """
+        phases: List[Tuple[str, List]] = sorted(self.phases.items(), key=lambda p: -p[1][0])[:phases_count]
+        parts: List[str] = [f'{phase} {t[0]:.2f}s/{t[1]}' for phase, t in phases]
+        for kind, items in self.slowest.items():
+            if len(items):
+                seconds, item = max(items)
+                parts.append(f'slowest {kind} {item} {seconds:.2f}s')
+        return ', '.join(parts)
+
+
+_profiler: Union[Profiler, None] = None
+
+
+def enable(top_n: int = 10) -> Profiler:
+    """
+    Starts instrumentation in current process
+    :param top_n: number of the slowest items kept for every kind
+    :return: active profiler
+    """
+    global _profiler
+    _profiler = Profiler(top_n)
+    return _profiler
+
+
+def disable() -> Union[Profiler, None]:
+    """
+    Stops instrumentation in current process
+    :return: profiler, which was active
+    """
+    global _profiler
+    profiler, _profiler = _profiler, None
+    return profiler
+
+
+def active() -> Union[Profiler, None]:
+    return _profiler
+
+
+class _Phase:
+    __slots__ = ('profiler', 'name', 'size', 'kind', 'item', 'started')
+
+    def __init__(self, profiler: Profiler, name: str, size: int, kind: str, item: str):
+        self.profiler: Profiler = profiler
+        self.name: str = name
+        self.size: int = size
+        self.kind: str = kind
+        self.item: str = item
+
+    def __enter__(self) -> '_Phase':
+        self.started: float = perf_counter()
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.profiler.add(self.name, perf_counter() - self.started, self.size, self.kind, self.item)
+
+
+class _NullPhase:
+    __slots__ = ('size',)
+
+    def __enter__(self) -> '_NullPhase':
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        pass
+
+
+_NULL_PHASE: _NullPhase = _NullPhase()
+
+
+def phase(name: str, size: int = 0, kind: str = None, item: str = None) -> Union[_Phase, _NullPhase]:
+    """
+    Context manager, which measures code block as a call of phase, if instrumentation is enabled,
+    size can be set on returned object inside the block
+    :param name: phase name
+    :param size: number of processed bytes
+    :param kind: kind of processed item, if the slowest items of that kind are kept
+    :param item: processed item
+    """
+    if _profiler is None:
+        return _NULL_PHASE
+    return _Phase(_profiler, name, size, kind, item)
+
+
+def profiled(name: str = None, size: Callable[..., int] = None):
+    """
+    Decorator, which measures every call of function as a call of phase, if instrumentation is enabled,
+    generator functions are measured until they are exhausted
+    :param name: phase name, function qualified name by default
+    :param size: function of the same arguments, which returns number of processed bytes
+    """
+
+    def decorator(func: Callable) -> Callable:
+        phase_name: str = name or func.__qualname__
+        if inspect.isgeneratorfunction(func):
+            @functools.wraps(func)
+            def wrapper(*args, **kwargs):
+                if _profiler is None:
+                    return (yield from func(*args, **kwargs))
+                with phase(phase_name, size(*args, **kwargs) if size else 0):
+                    return (yield from func(*args, **kwargs))
+        else:
+            @functools.wraps(func)
+            def wrapper(*args, **kwargs):
+                if _profiler is None:
+                    return func(*args, **kwargs)
+                with phase(phase_name, size(*args, **kwargs) if size else 0):
+                    return func(*args, **kwargs)
+        return wrapper
+
+    return decorator
+
+
+def profiled_methods(cls: type) -> type:
+    """
+    Class decorator, which applies profiled to every public method of class, except context managers:
+    their call only creates context manager, while the work is done in the with block
+    """
+    for name, member in list(vars(cls).items()):
+        if name.startswith('_') or not inspect.isfunction(member):
+            continue
+        if inspect.isgeneratorfunction(getattr(member, '__wrapped__', None)) and \
+                not inspect.isgeneratorfunction(member):
+            continue
+        setattr(cls, name, profiled(f'{cls.__name__}.{name}')(member))
+    return cls
@@ -1,8 +1,13 @@
 import sqlite3
+import threading
+from array import array
+from collections import OrderedDict
+from contextlib import contextmanager
 from enum import Enum
-from typing import List, Tuple, Union, Dict, Set
+from pathlib import Path
+from typing import List, Tuple, Union, Dict, Set, Generator, Iterable
 
-from PyQt5.QtGui import QColor
+import profiling
 
 
 class Color(Enum):
@@ -12,30 +17,29 @@ class Color(Enum):
     GREEN: str = 'green'
     NONE: str = None
 
-    @classmethod
-    def to_q_color(cls, color: 'Color') -> QColor:
-        if color is None:
-            return QColor('black')
-        else:
-            return QColor(color.value)
-
-    @classmethod
-    def from_q_color(cls, color: QColor) -> 'Color':
-        for c in cls:
-            if Color.to_q_color(c) == color:
-                return c
-        return cls.NONE
+    @property
+    def sort_key(self) -> int:
+        """
+        Position of color in lists, the same as COLOR_SORT_KEY_SQL gives
+        """
+        return COLOR_ORDER.index(self)
 
     def __lt__(self, other: 'Color'):
         if other is None:
             other: Color = Color.NONE
-        colors: List[Color] = [Color.MAGENTA, Color.BLUE, Color.GREEN, Color.RED, Color.NONE]
-        return colors.index(self) < colors.index(other)
+        return self.sort_key < other.sort_key
 
     def __gt__(self, other: 'Color'):
         return not self < other
 
 
+COLOR_ORDER: List[Color] = [Color.MAGENTA, Color.BLUE, Color.GREEN, Color.RED, Color.NONE]
+# integer sort key of COLOR column, lists are ordered by it and NAME with T_LIST_ORDER and W_LIST_ORDER indexes
+COLOR_SORT_KEY_SQL: str = 'CASE COLOR ' + ' '.join(
+    f"WHEN '{c.value}' THEN {i}" for i, c in enumerate(COLOR_ORDER) if c is not Color.NONE
+) + f' ELSE {Color.NONE.sort_key} END'
+
+
 class Table:
     def __init__(self, index: int, name: str, meaning: str, authors: str, sqooped: Union[bool, int],
                  color: Union[Color, str] = Color.NONE,
@@ -123,14 +127,343 @@ class Workflow:
         return f'Workflow({str(self)})'
 
 
+# Recounts relations of every table into TABLE_USAGE, table without any relation has DEGREE = 0 (is unplugged)
+REFRESH_TABLE_USAGE: List[str] = [
+    'DELETE FROM TABLE_USAGE;',
+    """
+    INSERT INTO TABLE_USAGE(TABLE_ID, BASED_ON, CREATED_IN, UPDATED_IN, USED_IN, DEGREE)
+    SELECT
+        ID,
+        COALESCE(BO.N, 0),
+        COALESCE(CI.N, 0),
+        COALESCE(UPI.N, 0),
+        COALESCE(USI.N, 0),
+        COALESCE(BO.N, 0) + COALESCE(CI.N, 0) + COALESCE(UPI.N, 0) + COALESCE(USI.N, 0)
+    FROM TABLES
+    LEFT JOIN (SELECT TARGET_TABLE AS T_ID, COUNT(*) AS N FROM TABLE_BASED_ON GROUP BY TARGET_TABLE) BO
+        ON BO.T_ID = TABLES.ID
+    LEFT JOIN (SELECT CREATED_TABLE AS T_ID, COUNT(*) AS N FROM TABLE_CREATED_IN GROUP BY CREATED_TABLE) CI
+        ON CI.T_ID = TABLES.ID
+    LEFT JOIN (SELECT UPDATED_TABLE AS T_ID, COUNT(*) AS N FROM TABLE_UPDATED_IN GROUP BY UPDATED_TABLE) UPI
+        ON UPI.T_ID = TABLES.ID
+    LEFT JOIN (SELECT USED_TABLE AS T_ID, COUNT(*) AS N FROM TABLE_USED_IN GROUP BY USED_TABLE) USI
+        ON USI.T_ID = TABLES.ID;
+    """,
+]
+
+# Fills COLUMNS of tables search index with names and types of table columns,
+# TABLE_ID has no affinity, unary plus on rowid lets it be searched by index
+REFRESH_COLUMNS_SEARCH: str = """
+    UPDATE TABLES_SEARCH SET COLUMNS = (
+        SELECT COALESCE(group_concat(COLUMN_NAME || ' ' || COLUMN_TYPE, ' '), '')
+        FROM TABLE_COLUMNS WHERE TABLE_ID = +TABLES_SEARCH.rowid
+    );
+"""
+# trigram tokenizer does not match shorter search texts
+SEARCH_MIN_LENGTH: int = 3
+# index of MIGRATIONS entry, which creates search index, it is skipped by sqlite builds without fts5 trigram tokenizer
+SEARCH_MIGRATION: int = 4
+# triggers, which keep search index up to date, they are dropped by builds without fts5 trigram tokenizer,
+# so tables stay writable, and are recreated with refilled index by builds with it
+SEARCH_TRIGGERS: List[str] = ['TS_INSERT', 'TS_UPDATE', 'TS_DELETE', 'WS_INSERT', 'WS_UPDATE', 'WS_DELETE']
+
+# PRAGMA settings of connections: default ones are applied to every connection, journal_mode only to writing one,
+# bulk_profile of Store is applied to writing connection for imports and parse runs and reverted after them
+CONNECTION_PROFILES: Dict[str, Dict[str, Union[str, int]]] = {
+    'default': {'journal_mode': 'WAL', 'synchronous': 'FULL', 'temp_store': 'MEMORY', 'busy_timeout': 5000},
+    'bulk': {'synchronous': 'NORMAL', 'cache_size': -262144, 'mmap_size': 1 << 30},
+    'safe': {},
+}
+# bulk run, which changed at least that number of rows, refreshes query planner statistics
+ANALYZE_MIN_CHANGES: int = 10000
+# number of rows of every index sampled by ANALYZE
+ANALYZE_LIMIT: int = 1000
+
+
+def apply_pragmas(connection: sqlite3.Connection, pragmas: Dict[str, Union[str, int]]) -> Dict[str, Union[str, int]]:
+    """
+    :return: previous values of changed pragmas
+    """
+    previous: Dict[str, Union[str, int]] = {}
+    for name, value in pragmas.items():
+        previous[name] = connection.execute(f'PRAGMA {name};').fetchone()[0]
+        connection.execute(f'PRAGMA {name} = {value};')
+    return previous
+
+
+def supports_search_index(connection: sqlite3.Connection) -> bool:
+    """
+    :return: True if sqlite has fts5 with trigram tokenizer (3.34+), which search index is built on
+    """
+    try:
+        connection.execute("CREATE VIRTUAL TABLE temp.SEARCH_PROBE USING fts5(NAME, tokenize = 'trigram');")
+    except sqlite3.OperationalError:
+        return False
+    connection.execute('DROP TABLE temp.SEARCH_PROBE;')
+    return True
+
+
+# Schema changes applied on top of create_db_tables, n-th list upgrades database from version n to n + 1,
+# version is kept in PRAGMA user_version
+MIGRATIONS: List[List[str]] = [
+    [
+        'CREATE INDEX IF NOT EXISTS TCI_WORKFLOW ON TABLE_CREATED_IN(WORKFLOW, CREATED_TABLE);',
+        'CREATE INDEX IF NOT EXISTS TUSI_WORKFLOW ON TABLE_USED_IN(WORKFLOW, USED_TABLE);',
+        'CREATE INDEX IF NOT EXISTS TUPI_WORKFLOW ON TABLE_UPDATED_IN(WORKFLOW, UPDATED_TABLE);',
+        'CREATE INDEX IF NOT EXISTS TBO_BASE_TABLE ON TABLE_BASED_ON(BASE_TABLE, TARGET_TABLE);',
+        'CREATE INDEX IF NOT EXISTS TBOI_WORKFLOW ON TABLE_BASED_ON_IN(WORKFLOW);',
+        'CREATE INDEX IF NOT EXISTS WM_WORKFLOW ON WORKFLOW_MANIFEST(WORKFLOW);',
+    ],
+    [
+        """
+        CREATE TABLE IF NOT EXISTS TABLE_USAGE
+        (
+            TABLE_ID   INTEGER PRIMARY KEY REFERENCES TABLES,
+            BASED_ON   INTEGER NOT NULL DEFAULT 0,
+            CREATED_IN INTEGER NOT NULL DEFAULT 0,
+            UPDATED_IN INTEGER NOT NULL DEFAULT 0,
+            USED_IN    INTEGER NOT NULL DEFAULT 0,
+            DEGREE     INTEGER NOT NULL DEFAULT 0
+        );
+        """,
+        'CREATE INDEX IF NOT EXISTS TU_DEGREE ON TABLE_USAGE(DEGREE, TABLE_ID);',
+        *REFRESH_TABLE_USAGE,
+    ],
+    [
+        """
+        CREATE TABLE IF NOT EXISTS HQL_PARSE_CACHE
+        (
+            KEY      TEXT PRIMARY KEY,
+            RESULT   TEXT    NOT NULL,
+            POSITION INTEGER NOT NULL
+        );
+        """,
+    ],
+    [
+        f'CREATE INDEX IF NOT EXISTS T_LIST_ORDER ON TABLES({COLOR_SORT_KEY_SQL}, NAME);',
+        f'CREATE INDEX IF NOT EXISTS W_LIST_ORDER ON WORKFLOWS({COLOR_SORT_KEY_SQL}, NAME);',
+    ],
+    [
+        """
+        CREATE VIRTUAL TABLE IF NOT EXISTS TABLES_SEARCH
+        USING fts5(NAME, COLUMNS, MEANING, AUTHORS, tokenize = 'trigram');
+        """,
+        "CREATE VIRTUAL TABLE IF NOT EXISTS WORKFLOWS_SEARCH USING fts5(NAME, tokenize = 'trigram');",
+        """
+        CREATE TRIGGER IF NOT EXISTS TS_INSERT AFTER INSERT ON TABLES BEGIN
+            INSERT INTO TABLES_SEARCH(rowid, NAME, COLUMNS, MEANING, AUTHORS)
+            VALUES(new.ID, new.NAME, '', new.MEANING, new.AUTHORS);
+        END;
+        """,
+        """
+        CREATE TRIGGER IF NOT EXISTS TS_UPDATE AFTER UPDATE OF NAME, MEANING, AUTHORS ON TABLES BEGIN
+            UPDATE TABLES_SEARCH SET NAME = new.NAME, MEANING = new.MEANING, AUTHORS = new.AUTHORS
+            WHERE rowid = new.ID;
+        END;
+        """,
+        """
+        CREATE TRIGGER IF NOT EXISTS TS_DELETE AFTER DELETE ON TABLES BEGIN
+            DELETE FROM TABLES_SEARCH WHERE rowid = old.ID;
+        END;
+        """,
+        """
+        CREATE TRIGGER IF NOT EXISTS WS_INSERT AFTER INSERT ON WORKFLOWS BEGIN
+            INSERT INTO WORKFLOWS_SEARCH(rowid, NAME) VALUES(new.ID, new.NAME);
+        END;
+        """,
+        """
+        CREATE TRIGGER IF NOT EXISTS WS_UPDATE AFTER UPDATE OF NAME ON WORKFLOWS BEGIN
+            UPDATE WORKFLOWS_SEARCH SET NAME = new.NAME WHERE rowid = new.ID;
+        END;
+        """,
+        """
+        CREATE TRIGGER IF NOT EXISTS WS_DELETE AFTER DELETE ON WORKFLOWS BEGIN
+            DELETE FROM WORKFLOWS_SEARCH WHERE rowid = old.ID;
+        END;
+        """,
+        # index is refilled, when it is recreated after the database was written without it
+        'DELETE FROM TABLES_SEARCH;',
+        """
+        INSERT INTO TABLES_SEARCH(rowid, NAME, COLUMNS, MEANING, AUTHORS)
+        SELECT ID, NAME, '', MEANING, AUTHORS FROM TABLES;
+        """,
+        REFRESH_COLUMNS_SEARCH,
+        'DELETE FROM WORKFLOWS_SEARCH;',
+        'INSERT INTO WORKFLOWS_SEARCH(rowid, NAME) SELECT ID, NAME FROM WORKFLOWS;',
+    ],
+    [
+        """
+        CREATE TABLE IF NOT EXISTS TABLE_PARTITIONS_IN
+        (
+            TARGET_TABLE REFERENCES TABLES,
+            PARTITION_NAME TEXT NOT NULL,
+            WORKFLOW REFERENCES WORKFLOWS,
+            CONSTRAINT TPI_PK PRIMARY KEY(TARGET_TABLE, PARTITION_NAME, WORKFLOW)
+        );
+        """,
+        'CREATE INDEX IF NOT EXISTS TPI_WORKFLOW ON TABLE_PARTITIONS_IN(WORKFLOW);',
+        """
+        CREATE TABLE IF NOT EXISTS TABLE_SQOOPED_IN
+        (
+            SQOOPED_TABLE REFERENCES TABLES,
+            WORKFLOW REFERENCES WORKFLOWS,
+            CONSTRAINT TSI_PK PRIMARY KEY(SQOOPED_TABLE, WORKFLOW)
+        );
+        """,
+        'CREATE INDEX IF NOT EXISTS TSI_WORKFLOW ON TABLE_SQOOPED_IN(WORKFLOW);',
+        # partitions and sqooped tables of parsed workflows are not known per workflow, so all of them are parsed again
+        'DELETE FROM WORKFLOW_MANIFEST;',
+    ],
+]
+
+
+class PopulatedCache:
+    """
+    LRU cache of populated data of tables or workflows by their ids, counts hits and misses to tune its size
+    """
+
+    def __init__(self, max_size: int = 256):
+        """
+        :param max_size: max number of entries, the least recently used ones are evicted
+        """
+        self.max_size: int = max_size
+        self.entries: OrderedDict = OrderedDict()
+        self.hits: int = 0
+        self.misses: int = 0
+
+    def get(self, key: int) -> Union[Tuple, None]:
+        value: Union[Tuple, None] = self.entries.get(key)
+        if value is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        self.entries.move_to_end(key)
+        return value
+
+    def put(self, key: int, value: Tuple) -> None:
+        self.entries[key] = value
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.max_size:
+            self.entries.popitem(last=False)
+
+    def discard(self, keys: Iterable[int]) -> None:
+        for key in keys:
+            self.entries.pop(key, None)
+
+    def clear(self) -> None:
+        self.entries.clear()
+
+    def stats(self) -> Dict[str, int]:
+        return {'size': len(self.entries), 'max_size': self.max_size, 'hits': self.hits, 'misses': self.misses}
+
+
+@profiling.profiled_methods
 class Store:
-    def __init__(self, db_name: str):
+    def __init__(self, db_name: str, bulk_profile: str = 'bulk', cache_size: int = 256):
+        """
+        :param db_name: database file
+        :param bulk_profile: name of CONNECTION_PROFILES entry applied by bulk()
+        :param cache_size: number of populated tables and of populated workflows kept in cache
+        """
+        self.db_name: str = db_name
+        self.bulk_profile: str = bulk_profile
         self.connection: sqlite3.Connection = sqlite3.connect(db_name)
+        apply_pragmas(self.connection, CONNECTION_PROFILES['default'])
+        # populated data is dropped by writes of this store and by commits of other connections, seen by data_version
+        self.tables_cache: PopulatedCache = PopulatedCache(cache_size)
+        self.workflows_cache: PopulatedCache = PopulatedCache(cache_size)
+        self._data_version: int = self.connection.execute('PRAGMA data_version;').fetchone()[0]
+        self._readers: threading.local = threading.local()
+        self._reader_connections: List[sqlite3.Connection] = []
+        self._readers_lock: threading.Lock = threading.Lock()
+        # without search index tables and workflows are searched by names with instr
+        self.search_index: bool = supports_search_index(self.connection)
         self.create_db_tables()
+        cursor: sqlite3.Cursor = self.connection.cursor()
+        closure_missing: bool = cursor.execute("""
+            SELECT EXISTS(SELECT 1 FROM TABLE_BASED_ON) AND NOT EXISTS(SELECT 1 FROM TABLE_LINEAGE_CLOSURE)
+        """).fetchone()[0]
+        cursor.close()
+        if closure_missing:
+            self.refresh_lineage_closure()
+
+    def reader(self) -> sqlite3.Connection:
+        """
+        Read only connection of current thread from pool of reading connections, they do not hold transactions,
+        so reads see the last commit and do not wait for writing connection of the same or another Store
+        :return: connection, writing one for in-memory database
+        """
+        if self.db_name in ('', ':memory:'):
+            return self.connection
+        connection: Union[sqlite3.Connection, None] = getattr(self._readers, 'connection', None)
+        if connection is None:
+            connection = sqlite3.connect(Path(self.db_name).absolute().as_uri() + '?mode=ro', uri=True,
+                                         isolation_level=None, check_same_thread=False)
+            apply_pragmas(connection, {k: v for k, v in CONNECTION_PROFILES['default'].items() if k != 'journal_mode'})
+            self._readers.connection = connection
+            with self._readers_lock:
+                self._reader_connections.append(connection)
+        return connection
+
+    @contextmanager
+    def bulk(self):
+        """
+        Applies bulk connection profile to writing connection for a block of large writes,
+        query planner statistics are refreshed after it, if it changed many rows
+        """
+        changes: int = self.connection.total_changes
+        previous: Dict[str, Union[str, int]] = apply_pragmas(self.connection, CONNECTION_PROFILES[self.bulk_profile])
+        try:
+            yield self
+        finally:
+            apply_pragmas(self.connection, previous)
+        if self.connection.total_changes - changes >= ANALYZE_MIN_CHANGES:
+            self.analyze()
+
+    def analyze(self):
+        """
+        Refreshes query planner statistics, sampling at most ANALYZE_LIMIT rows of every index
+        """
+        cursor: sqlite3.Cursor = self.connection.cursor()
+        cursor.execute(f'PRAGMA analysis_limit = {ANALYZE_LIMIT};')
+        cursor.execute('ANALYZE;')
+        self.connection.commit()
+        cursor.close()
+
+    def close(self):
+        with self._readers_lock:
+            for connection in self._reader_connections:
+                connection.close()
+            self._reader_connections.clear()
+        self._readers = threading.local()
+        self.connection.close()
+
+    def invalidate_cache(self, table_ids: Iterable[int] = None, workflows: bool = True) -> None:
+        """
+        Drops populated data, which writes made outdated
+        :param table_ids: ids of tables with changed relations, None for all tables
+        :param workflows: drop all workflows, their lineage depends on relations of any table
+        """
+        if table_ids is None:
+            self.tables_cache.clear()
+        else:
+            self.tables_cache.discard(table_ids)
+        if workflows:
+            self.workflows_cache.clear()
+
+    def _validate_cache(self) -> None:
+        data_version: int = self.connection.execute('PRAGMA data_version;').fetchone()[0]
+        if data_version != self._data_version:
+            self._data_version = data_version
+            self.invalidate_cache()
+
+    def cache_stats(self) -> Dict[str, Dict[str, int]]:
+        return {'tables': self.tables_cache.stats(), 'workflows': self.workflows_cache.stats()}
 
     def create_db_tables(self, force: bool = False):
         cursor = self.connection.cursor()
         if force:
+            self.invalidate_cache()
             cursor.execute('DROP TABLE IF EXISTS TABLES;')
             cursor.execute('DROP TABLE IF EXISTS WORKFLOWS;')
             cursor.execute('DROP TABLE IF EXISTS TABLE_CREATED_IN;')
@@ -138,6 +471,15 @@ class Store:
             cursor.execute('DROP TABLE IF EXISTS TABLE_BASED_ON;')
             cursor.execute('DROP TABLE IF EXISTS TABLE_PARTITIONS;')
             cursor.execute('DROP TABLE IF EXISTS TABLE_COLUMNS;')
+            cursor.execute('DROP TABLE IF EXISTS TABLE_BASED_ON_IN;')
+            cursor.execute('DROP TABLE IF EXISTS TABLE_PARTITIONS_IN;')
+            cursor.execute('DROP TABLE IF EXISTS TABLE_SQOOPED_IN;')
+            cursor.execute('DROP TABLE IF EXISTS WORKFLOW_MANIFEST;')
+            cursor.execute('DROP TABLE IF EXISTS TABLE_LINEAGE_CLOSURE;')
+            cursor.execute('DROP TABLE IF EXISTS TABLE_USAGE;')
+            cursor.execute('DROP TABLE IF EXISTS HQL_PARSE_CACHE;')
+            cursor.execute('DROP TABLE IF EXISTS TABLES_SEARCH;')
+            cursor.execute('DROP TABLE IF EXISTS WORKFLOWS_SEARCH;')
         cursor.execute("""
             CREATE TABLE IF NOT EXISTS TABLES
             (
@@ -206,13 +548,84 @@ class Store:
                 CONSTRAINT TC_PK PRIMARY KEY(TABLE_ID, COLUMN_NAME)
             );
         """)
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS TABLE_BASED_ON_IN
+            (
+                TARGET_TABLE REFERENCES TABLES,
+                BASE_TABLE REFERENCES TABLES,
+                WORKFLOW REFERENCES WORKFLOWS,
+                CONSTRAINT TBOI_PK PRIMARY KEY(TARGET_TABLE, BASE_TABLE, WORKFLOW)
+            );
+        """)
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS WORKFLOW_MANIFEST
+            (
+                WORKFLOW_PATH TEXT NOT NULL,
+                WORKFLOW REFERENCES WORKFLOWS,
+                FILE_PATH TEXT NOT NULL,
+                DIGEST TEXT NOT NULL,
+                CONSTRAINT WM_PK PRIMARY KEY(WORKFLOW_PATH, FILE_PATH)
+            );
+        """)
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS TABLE_LINEAGE_CLOSURE
+            (
+                TARGET_TABLE REFERENCES TABLES,
+                ANCESTOR REFERENCES TABLES,
+                DEPTH INTEGER NOT NULL,
+                CONSTRAINT TLC_PK PRIMARY KEY(TARGET_TABLE, ANCESTOR)
+            );
+        """)
+        cursor.execute('CREATE INDEX IF NOT EXISTS TLC_ANCESTOR ON TABLE_LINEAGE_CLOSURE(ANCESTOR, TARGET_TABLE);')
+        if force:
+            cursor.execute('PRAGMA user_version = 0;')
         cursor.close()
+        self.migrate()
+
+    def migrate(self):
+        """
+        Upgrades database schema in place to the latest version from MIGRATIONS, every migration is applied
+        in its own transaction. Search index is skipped without fts5 trigram tokenizer and is built later
+        by sqlite, which has it
+        """
+        cursor: sqlite3.Cursor = self.connection.cursor()
+        version: int = cursor.execute('PRAGMA user_version;').fetchone()[0]
+        search_triggers: int = cursor.execute(
+            "SELECT COUNT(*) FROM sqlite_master WHERE TYPE = 'trigger' AND NAME IN ("
+            + ', '.join('?' for _ in SEARCH_TRIGGERS) + ')', SEARCH_TRIGGERS).fetchone()[0]
+        try:
+            for i in range(version, len(MIGRATIONS)):
+                self._apply_migration(cursor, MIGRATIONS[i] if i != SEARCH_MIGRATION or self.search_index else [],
+                                      i + 1)
+            if not self.search_index and search_triggers:
+                self._apply_migration(cursor, [f'DROP TRIGGER IF EXISTS {t};' for t in SEARCH_TRIGGERS])
+            elif self.search_index and version > SEARCH_MIGRATION and search_triggers < len(SEARCH_TRIGGERS):
+                self._apply_migration(cursor, MIGRATIONS[SEARCH_MIGRATION])
+        finally:
+            cursor.close()
+
+    def _apply_migration(self, cursor: sqlite3.Cursor, statements: List[str], version: int = None):
+        """
+        Executes statements in one transaction, which is rolled back, if any of them fails
+        :param version: new user_version
+        """
+        cursor.execute('BEGIN;')
+        try:
+            for sql in statements:
+                cursor.execute(sql)
+            if version is not None:
+                cursor.execute(f'PRAGMA user_version = {version};')
+            self.connection.commit()
+        except sqlite3.Error:
+            self.connection.rollback()
+            raise
 
     def update_workflow(self, workflow: Workflow) -> None:
         cursor: sqlite3.Cursor = self.connection.cursor()
         cursor.execute('UPDATE WORKFLOWS SET COLOR=? WHERE ID = ?',
                        (workflow.color.value, workflow.index))
         self.connection.commit()
+        self.workflows_cache.discard([workflow.index])
         cursor.close()
 
     def update_table(self, table: Table) -> None:
@@ -220,6 +633,7 @@ class Store:
         cursor.execute('UPDATE TABLES SET MEANING=?, AUTHORS=?, COLOR=? WHERE ID = ?',
                        (table.meaning, table.authors, table.color.value, table.index))
         self.connection.commit()
+        self.tables_cache.discard([table.index])
         cursor.close()
 
     def get_tables(self, search_text: str = '', color_filter=None, only_names: bool = False,
@@ -234,27 +648,9 @@ class Store:
             AUTHORS,
             SQOOPED,
             COLOR,
-            (
-               SELECT COUNT(*)
-               FROM (
-                    SELECT TARGET_TABLE AS COLS
-                    FROM TABLE_BASED_ON
-                    WHERE TARGET_TABLE = TABLES.ID
-                    UNION
-                    SELECT CREATED_TABLE
-                    FROM TABLE_CREATED_IN
-                    WHERE CREATED_TABLE = TABLES.ID
-                    UNION
-                    SELECT UPDATED_TABLE
-                    FROM TABLE_UPDATED_IN
-                    WHERE UPDATED_TABLE = TABLES.ID
-                    UNION
-                    SELECT USED_TABLE
-                    FROM TABLE_USED_IN
-                    WHERE USED_TABLE = TABLES.ID
-                )
-            ) AS UNPLUGGED
-        FROM TABLES 
+            COALESCE(min(TABLE_USAGE.DEGREE, 1), 0) AS UNPLUGGED
+        FROM TABLES
+        LEFT JOIN TABLE_USAGE ON TABLE_USAGE.TABLE_ID = TABLES.ID
         WHERE instr(NAME, ?) > 0
         """
         if len(color_filter) > 0:
@@ -265,8 +661,9 @@ class Store:
                     [f'\'{c.value}\'' for c in color_filter]) + ') OR COLOR IS NULL)'
             sql += where_color
         if only_unplugged:
-            sql += 'AND UNPLUGGED = 0'
-        cursor: sqlite3.Cursor = self.connection.cursor()
+            # table without TABLE_USAGE row has no relations either
+            sql += ' AND COALESCE(TABLE_USAGE.DEGREE, 0) = 0'
+        cursor: sqlite3.Cursor = self.reader().cursor()
         tables: List[Tuple] = cursor.execute(sql, (search_text,)).fetchall()
         cursor.close()
         if only_names:
@@ -275,8 +672,8 @@ class Store:
             return [(d[0], d[1]) for d in tables]
         return [Table(*d) for d in tables]
 
-    def get_workflows(self, search_text: str = '', only_names: bool = False, color_filter: List[Color] = None) -> List[
-        Union[str, Workflow]]:
+    def get_workflows(self, search_text: str = '', only_names: bool = False, color_filter: List[Color] = None,
+                      id_name_pairs: bool = False) -> List[Union[str, Workflow, Tuple[int, str]]]:
         if color_filter is None:
             color_filter = []
         sql: str = 'SELECT ID, NAME, COLOR FROM WORKFLOWS WHERE instr(NAME, ?) > 0'
@@ -287,33 +684,117 @@ class Store:
                 where_color: str = ' AND (COLOR IN (' + ', '.join(
                     [f'\'{c.value}\'' for c in color_filter]) + ') OR COLOR IS NULL)'
             sql += where_color
-        cursor: sqlite3.Cursor = self.connection.cursor()
+        cursor: sqlite3.Cursor = self.reader().cursor()
         workflows: List[Tuple] = cursor.execute(
             sql, (search_text,)).fetchall()
         cursor.close()
         if only_names:
             return [d[1] for d in workflows]
+        if id_name_pairs:
+            return [(d[0], d[1]) for d in workflows]
         return [Workflow(*d) for d in workflows]
 
+    @staticmethod
+    def color_filter_sql(color_filter: List[Color]) -> str:
+        """
+        :return: condition on sort key of COLOR column, which is true for colors from color_filter or always true
+        """
+        if not len(color_filter):
+            return '1'
+        return f'{COLOR_SORT_KEY_SQL} IN (' + ', '.join(str(c.sort_key) for c in set(color_filter)) + ')'
+
+    @staticmethod
+    def search_phrase(search_text: str) -> str:
+        """
+        :return: search text as fts5 phrase, which matches it as a substring
+        """
+        return '"' + search_text.replace('"', '""') + '"'
+
+    def get_table_list_ids(self, search_text: str = '', color_filter: List[Color] = None,
+                           only_unplugged: bool = False) -> array:
+        """
+        Filters and sorts tables list by color and name in database, search text is matched against names,
+        columns, descriptions and authors of tables, matches are ranked by bm25 inside every color
+        :return: ids of tables in list order
+        """
+        if self.search_index and len(search_text) >= SEARCH_MIN_LENGTH:
+            sql: str = f"""
+                SELECT ID FROM TABLES_SEARCH JOIN TABLES ON TABLES.ID = TABLES_SEARCH.rowid
+                WHERE TABLES_SEARCH MATCH ? AND {self.color_filter_sql(color_filter or [])}
+            """
+            order: str = f'{COLOR_SORT_KEY_SQL}, bm25(TABLES_SEARCH, 10.0, 1.0, 2.0, 2.0), TABLES.NAME'
+            params: Tuple = (self.search_phrase(search_text),)
+        else:
+            sql: str = f"""
+                SELECT ID FROM TABLES
+                WHERE instr(lower(NAME), lower(?)) > 0 AND {self.color_filter_sql(color_filter or [])}
+            """
+            order: str = f'{COLOR_SORT_KEY_SQL}, NAME'
+            params: Tuple = (search_text,)
+        if only_unplugged:
+            sql += ' AND ID NOT IN (SELECT TABLE_ID FROM TABLE_USAGE WHERE DEGREE > 0)'
+        sql += f' ORDER BY {order}'
+        cursor: sqlite3.Cursor = self.reader().cursor()
+        ids: array = array('q', (r[0] for r in cursor.execute(sql, params)))
+        cursor.close()
+        return ids
+
+    def get_workflow_list_ids(self, search_text: str = '', color_filter: List[Color] = None) -> array:
+        """
+        Filters and sorts workflows list by color and name in database, matches of search text are ranked by bm25
+        inside every color
+        :return: ids of workflows in list order
+        """
+        if self.search_index and len(search_text) >= SEARCH_MIN_LENGTH:
+            sql: str = f"""
+                SELECT ID FROM WORKFLOWS_SEARCH JOIN WORKFLOWS ON WORKFLOWS.ID = WORKFLOWS_SEARCH.rowid
+                WHERE WORKFLOWS_SEARCH MATCH ? AND {self.color_filter_sql(color_filter or [])}
+                ORDER BY {COLOR_SORT_KEY_SQL}, bm25(WORKFLOWS_SEARCH), WORKFLOWS.NAME
+            """
+            params: Tuple = (self.search_phrase(search_text),)
+        else:
+            sql: str = f"""
+                SELECT ID FROM WORKFLOWS
+                WHERE instr(lower(NAME), lower(?)) > 0 AND {self.color_filter_sql(color_filter or [])}
+                ORDER BY {COLOR_SORT_KEY_SQL}, NAME
+            """
+            params: Tuple = (search_text,)
+        cursor: sqlite3.Cursor = self.reader().cursor()
+        ids: array = array('q', (r[0] for r in cursor.execute(sql, params)))
+        cursor.close()
+        return ids
+
+    def get_list_rows(self, db_table: str, ids: List[int]) -> Dict[int, Tuple[str, int]]:
+        """
+        :param db_table: TABLES or WORKFLOWS
+        :param ids: ids of rows
+        :return: {id: (name, color sort key)} dict
+        """
+        cursor: sqlite3.Cursor = self.reader().cursor()
+        sql: str = f'SELECT ID, NAME, {COLOR_SORT_KEY_SQL} FROM {db_table} WHERE ID IN ('
+        sql += ', '.join(['?' for _ in ids]) + ')'
+        rows: Dict[int, Tuple[str, int]] = {r[0]: (r[1], r[2]) for r in cursor.execute(sql, list(ids))}
+        cursor.close()
+        return rows
+
     def get_tables_by_names(self, table_names: List[str]) -> List[Table]:
-        cursor: sqlite3.Cursor = self.connection.cursor()
-        sql: str = 'SELECT * FROM TABLES WHERE NAME IN ('
-        sql += ', '.join([f"'{t_n}'" for t_n in table_names]) + ')'
-        tables: List[Tuple] = cursor.execute(sql).fetchall()
+        cursor: sqlite3.Cursor = self.reader().cursor()
+        sql: str = 'SELECT ID, NAME, MEANING, AUTHORS, SQOOPED, COLOR FROM TABLES WHERE NAME IN ('
+        sql += ', '.join(['?' for _ in table_names]) + ')'
+        tables: List[Tuple] = cursor.execute(sql, table_names).fetchall()
         cursor.close()
         return [Table(*d) for d in tables]
 
     def get_workflows_by_names(self, workflow_names: List[str]) -> List[Workflow]:
-        cursor: sqlite3.Cursor = self.connection.cursor()
-        sql: str = 'SELECT ID, NAME, COLOR FROM WORKFLOWS WHERE 1=0'
-        for name in workflow_names:
-            sql += f' OR NAME = "{name}"'
-        workflows: List[Tuple] = cursor.execute(sql).fetchall()
+        cursor: sqlite3.Cursor = self.reader().cursor()
+        sql: str = 'SELECT ID, NAME, COLOR FROM WORKFLOWS WHERE NAME IN ('
+        sql += ', '.join(['?' for _ in workflow_names]) + ')'
+        workflows: List[Tuple] = cursor.execute(sql, workflow_names).fetchall()
         cursor.close()
         return [Workflow(*d) for d in workflows]
 
     def get_db_status(self) -> str:
-        cursor: sqlite3.Cursor = self.connection.cursor()
+        cursor: sqlite3.Cursor = self.reader().cursor()
         workflows_exists: bool = int(cursor.execute('SELECT COUNT(*) FROM WORKFLOWS').fetchall()[0][0]) > 0
         tables_exists: bool = int(cursor.execute('SELECT COUNT(*) FROM TABLES').fetchall()[0][0]) > 0
         columns_exists: bool = int(cursor.execute('SELECT COUNT(*) FROM TABLE_COLUMNS').fetchall()[0][0]) > 0
@@ -326,94 +807,129 @@ class Store:
         else:
             return 'db_empty'
 
-    def get_related_tables(self, target_wf_name: str, base_wf_name: str) -> List[str]:
-        cursor: sqlite3.Cursor = self.connection.cursor()
-        sql: str = """
-            SELECT DISTINCT
-                (SELECT NAME FROM TABLES WHERE ID = E.EFFECTED_TABLE) AS RELATED_TABLE
-            FROM
-            (
-                SELECT CREATED_TABLE AS EFFECTED_TABLE, WORKFLOW AS WORKFLOW_ID, W2.NAME AS WORKFLOW_NAME FROM TABLE_CREATED_IN JOIN WORKFLOWS W2 on TABLE_CREATED_IN.WORKFLOW = W2.ID
-                UNION
-                SELECT UPDATED_TABLE, WORKFLOW, W3.NAME FROM TABLE_UPDATED_IN JOIN WORKFLOWS W3 on TABLE_UPDATED_IN.WORKFLOW = W3.ID
-            ) AS E JOIN TABLE_USED_IN TUI ON E.EFFECTED_TABLE = TUI.USED_TABLE JOIN WORKFLOWS W on TUI.WORKFLOW = W.ID
-            WHERE E.WORKFLOW_NAME = ? AND W.NAME = ?;
+    def get_row_counts(self) -> Dict[str, int]:
+        cursor: sqlite3.Cursor = self.reader().cursor()
+        counts: Dict[str, int] = {}
+        for table in ('TABLES', 'WORKFLOWS', 'TABLE_COLUMNS', 'TABLE_PARTITIONS', 'TABLE_BASED_ON',
+                      'TABLE_CREATED_IN', 'TABLE_UPDATED_IN', 'TABLE_USED_IN', 'TABLE_LINEAGE_CLOSURE'):
+            counts[table] = cursor.execute(f'SELECT COUNT(*) FROM {table}').fetchone()[0]
+        cursor.close()
+        return counts
+
+    def get_workflows_relations(self, workflow_ids: Iterable[int]) -> Tuple[List[Tuple[int, int, int]],
+                                                                           List[Tuple[int, int]],
+                                                                           List[Tuple[int, int]]]:
+        """
+        :param workflow_ids: ids of workflows
+        :return: (target_table, base_table, workflow) based on relations, (table, workflow) created or updated tables
+        and (table, workflow) used tables of workflows
         """
-        related_tables: List[str] = [t[0] for t in cursor.execute(sql, (base_wf_name, target_wf_name))]
-        return related_tables
+        cursor: sqlite3.Cursor = self.reader().cursor()
+        cursor.execute('CREATE TEMP TABLE IF NOT EXISTS SELECTED_WORKFLOWS(ID INTEGER PRIMARY KEY)')
+        cursor.execute('DELETE FROM SELECTED_WORKFLOWS')
+        cursor.executemany('INSERT OR IGNORE INTO SELECTED_WORKFLOWS(ID) VALUES(?)', [(w_i,) for w_i in workflow_ids])
+        # relation columns have no affinity, unary plus on temp table ids lets them be searched by index
+        based_on_in: List[Tuple[int, int, int]] = cursor.execute("""
+            SELECT TARGET_TABLE, BASE_TABLE, WORKFLOW
+            FROM SELECTED_WORKFLOWS S CROSS JOIN TABLE_BASED_ON_IN ON WORKFLOW = +S.ID
+        """).fetchall()
+        written: List[Tuple[int, int]] = cursor.execute("""
+            SELECT CREATED_TABLE, WORKFLOW FROM SELECTED_WORKFLOWS S CROSS JOIN TABLE_CREATED_IN ON WORKFLOW = +S.ID
+            UNION
+            SELECT UPDATED_TABLE, WORKFLOW FROM SELECTED_WORKFLOWS S CROSS JOIN TABLE_UPDATED_IN ON WORKFLOW = +S.ID
+        """).fetchall()
+        used: List[Tuple[int, int]] = cursor.execute("""
+            SELECT USED_TABLE, WORKFLOW FROM SELECTED_WORKFLOWS S CROSS JOIN TABLE_USED_IN ON WORKFLOW = +S.ID
+        """).fetchall()
+        cursor.execute('DELETE FROM SELECTED_WORKFLOWS')
+        cursor.close()
+        return based_on_in, written, used
 
     def populate_workflow_data(self, workflow: Workflow):
-        cursor: sqlite3.Cursor = self.connection.cursor()
-        relations: List[Tuple] = cursor.execute(
-            'SELECT TARGET_TABLE, BASE_TABLE FROM TABLE_BASED_ON;'
-        ).fetchall()
-        relations_dict: Dict[int, Set[int]] = {}
-        for r in relations:
-            if r[0] not in relations_dict:
-                relations_dict[r[0]] = {r[1]}
-            else:
-                relations_dict[r[0]].add(r[1])
+        """
+        Fills source and effected tables, predecessors and descendants of workflow with a constant number of queries,
+        sources are tables used in workflow with all their ancestors, results are cached by workflow id
+        """
+        self._validate_cache()
+        populated: Union[Tuple[Tuple[str, ...], ...], None] = self.workflows_cache.get(workflow.index)
+        if populated is None:
+            populated = self._query_workflow_data(workflow)
+            self.workflows_cache.put(workflow.index, populated)
+        source_tables, effected_tables, predecessors, descendants = populated
+        workflow.source_tables += source_tables
+        workflow.effected_tables = set(effected_tables)
+        workflow.predecessors = list(predecessors)
+        workflow.descendants = list(descendants)
 
-        used_tables: List[Tuple] = cursor.execute(
-            'SELECT TABLES.ID, TABLES.NAME, TABLES.MEANING, TABLES.AUTHORS, TABLES.SQOOPED, TABLES.COLOR FROM TABLE_USED_IN JOIN TABLES WHERE WORKFLOW = ? AND USED_TABLE = TABLES.ID;',
-            (workflow.index,)
-        ).fetchall()
-        used_tables: List[Table] = [self.populate_table_data(Table(*t)) for t in used_tables]
-        src_tables: Set[str] = set()
-        for u_t in used_tables:
-            src_tables.add(u_t.name)
-            src_tables.update(u_t.based_on_tables)
-        workflow.source_tables += list(src_tables)
-
-        effected_tables: List[Tuple] = cursor.execute(
-            """
-            SELECT T.NAME FROM TABLE_CREATED_IN TCI JOIN TABLES T ON TCI.CREATED_TABLE = T.ID AND TCI.WORKFLOW = ?
+    def _query_workflow_data(self, workflow: Workflow) -> Tuple[Tuple[str, ...], ...]:
+        """
+        :return: source tables, effected tables, predecessors and descendants of workflow
+        """
+        cursor: sqlite3.Cursor = self.reader().cursor()
+        cursor.execute('CREATE TEMP TABLE IF NOT EXISTS WORKFLOW_SOURCES(ID INTEGER PRIMARY KEY)')
+        cursor.execute('CREATE TEMP TABLE IF NOT EXISTS WORKFLOW_EFFECTED(ID INTEGER PRIMARY KEY)')
+        cursor.execute('DELETE FROM WORKFLOW_SOURCES')
+        cursor.execute('DELETE FROM WORKFLOW_EFFECTED')
+        cursor.execute("""
+            INSERT OR IGNORE INTO WORKFLOW_SOURCES(ID)
+            SELECT USED_TABLE FROM TABLE_USED_IN WHERE WORKFLOW = ?
+            UNION
+            SELECT ANCESTOR FROM TABLE_USED_IN CROSS JOIN TABLE_LINEAGE_CLOSURE ON TARGET_TABLE = USED_TABLE
+            WHERE WORKFLOW = ?
+        """, (workflow.index, workflow.index))
+        cursor.execute("""
+            INSERT OR IGNORE INTO WORKFLOW_EFFECTED(ID)
+            SELECT CREATED_TABLE FROM TABLE_CREATED_IN WHERE WORKFLOW = ?
             UNION
-            SELECT T.NAME FROM TABLE_UPDATED_IN TUI JOIN TABLES T ON TUI.UPDATED_TABLE = T.ID AND TUI.WORKFLOW = ?
-            """, (workflow.index, workflow.index)
-        )
-        effected_tables: Set[str] = {t[0] for t in effected_tables}
-        workflow.effected_tables = effected_tables
+            SELECT UPDATED_TABLE FROM TABLE_UPDATED_IN WHERE WORKFLOW = ?
+        """, (workflow.index, workflow.index))
+        source_tables: List[str] = [t[0] for t in cursor.execute(
+            'SELECT TABLES.NAME FROM WORKFLOW_SOURCES CROSS JOIN TABLES ON TABLES.ID = WORKFLOW_SOURCES.ID')]
+        effected_tables: Set[str] = {t[0] for t in cursor.execute(
+            'SELECT TABLES.NAME FROM WORKFLOW_EFFECTED CROSS JOIN TABLES ON TABLES.ID = WORKFLOW_EFFECTED.ID')}
 
-        predecessors_sql: str = f"""
-            SELECT DISTINCT WORKFLOWS.NAME
-            FROM WORKFLOWS JOIN
-            (
-                SELECT CREATED_TABLE AS T_ID, WORKFLOW AS W_ID FROM TABLE_CREATED_IN
-                UNION
-                SELECT * FROM TABLE_UPDATED_IN
-            )
-            on WORKFLOWS.ID = W_ID
-            JOIN TABLES WHERE T_ID = TABLES.ID
-            AND TABLES.NAME IN ({''.join([f"'{s}', " for s in workflow.source_tables])[:-2]});
+        # relation columns have no affinity, unary plus on temp table ids lets them be searched by index
+        predecessors_sql: str = """
+            SELECT WORKFLOWS.NAME
+            FROM WORKFLOW_SOURCES S CROSS JOIN TABLE_CREATED_IN ON CREATED_TABLE = +S.ID
+            JOIN WORKFLOWS ON WORKFLOWS.ID = WORKFLOW
+            UNION
+            SELECT WORKFLOWS.NAME
+            FROM WORKFLOW_SOURCES S CROSS JOIN TABLE_UPDATED_IN ON UPDATED_TABLE = +S.ID
+            JOIN WORKFLOWS ON WORKFLOWS.ID = WORKFLOW;
         """
-        descendants_sql: str = f"""
+        descendants_sql: str = """
             SELECT DISTINCT WORKFLOWS.NAME
-            FROM WORKFLOWS JOIN TABLE_USED_IN
-            on WORKFLOWS.ID = WORKFLOW
-            JOIN TABLES WHERE USED_TABLE = TABLES.ID
-            AND TABLES.NAME IN ({''.join([f"'{s}', " for s in workflow.effected_tables])[:-2]});
+            FROM WORKFLOW_EFFECTED E CROSS JOIN TABLE_USED_IN ON USED_TABLE = +E.ID
+            JOIN WORKFLOWS ON WORKFLOWS.ID = WORKFLOW;
         """
-        workflow.predecessors = [t[0] for t in cursor.execute(predecessors_sql).fetchall() if t[0] != workflow.name]
-        workflow.descendants = [t[0] for t in cursor.execute(descendants_sql).fetchall() if
-                                t[0] != workflow.name and t[0] not in workflow.predecessors]
+        predecessors: List[str] = [t[0] for t in cursor.execute(predecessors_sql).fetchall() if t[0] != workflow.name]
+        descendants: List[str] = [t[0] for t in cursor.execute(descendants_sql).fetchall() if
+                                  t[0] != workflow.name and t[0] not in predecessors]
+        cursor.execute('DELETE FROM WORKFLOW_SOURCES')
+        cursor.execute('DELETE FROM WORKFLOW_EFFECTED')
         cursor.close()
+        return tuple(source_tables), tuple(effected_tables), tuple(predecessors), tuple(descendants)
 
     def populate_table_data(self, table: Table) -> Table:
-        cursor: sqlite3.Cursor = self.connection.cursor()
-        relations: List[Tuple] = cursor.execute(
-            'SELECT TARGET_TABLE, BASE_TABLE FROM TABLE_BASED_ON;'
-        ).fetchall()
-        relations_dict: Dict[int, Set[int]] = {}
-        for r in relations:
-            if r[0] not in relations_dict:
-                relations_dict[r[0]] = {r[1]}
-            else:
-                relations_dict[r[0]].add(r[1])
-        table_id_name: List[Tuple] = cursor.execute(
-            'SELECT ID, NAME FROM TABLES'
-        ).fetchall()
-        table_id_name_dict: Dict[int, str] = {t[0]: t[1] for t in table_id_name}
+        """
+        Fills workflows, lineage, partitions and columns of table, results are cached by table id
+        """
+        self._validate_cache()
+        populated: Union[Tuple[Tuple[str, ...], ...], None] = self.tables_cache.get(table.index)
+        if populated is None:
+            populated = self._query_table_data(table)
+            self.tables_cache.put(table.index, populated)
+        table.created_in_workflows, table.used_in_workflows, table.updated_in_workflows, table.based_on_tables, \
+            table.first_based_on_tables, table.partitions, table.columns = (list(p) for p in populated)
+        return table
+
+    def _query_table_data(self, table: Table) -> Tuple[Tuple[str, ...], ...]:
+        """
+        :return: created in, used in and updated in workflows, based on tables, first based on tables, partitions
+        and columns of table
+        """
+        cursor: sqlite3.Cursor = self.reader().cursor()
         used_in = cursor.execute("""
             SELECT DISTINCT WORKFLOWS.NAME FROM TABLE_USED_IN JOIN WORKFLOWS ON WORKFLOWS.ID = TABLE_USED_IN.WORKFLOW AND USED_TABLE = ?
         """, (table.index,)).fetchall()
@@ -426,18 +942,12 @@ class Store:
                             SELECT DISTINCT WORKFLOWS.NAME FROM TABLE_UPDATED_IN JOIN WORKFLOWS ON WORKFLOWS.ID = TABLE_UPDATED_IN.WORKFLOW AND UPDATED_TABLE = ?
                         """, (table.index,)).fetchall()
         updated_in = {u[0] for u in updated_in}
-        based_on = cursor.execute("""
-                                    SELECT DISTINCT BASE_TABLE FROM TABLE_BASED_ON WHERE TARGET_TABLE = ?
+        first_based_on = cursor.execute("""
+                                    SELECT DISTINCT TABLES.NAME FROM TABLE_BASED_ON JOIN TABLES ON TABLES.ID = BASE_TABLE 
+                                    AND TARGET_TABLE = ?
                                 """, (table.index,)).fetchall()
-        based_on_tables: Set[int] = {t[0] for t in based_on}
-        table.first_based_on_tables = list({table_id_name_dict[t[0]] for t in based_on})
-        base_tables: Set[int] = set()
-        while len(based_on_tables):
-            table_id: int = based_on_tables.pop()
-            base_tables.add(table_id)
-            if table_id in relations_dict:
-                based_on_tables.update(relations_dict[table_id].difference(base_tables))
-        based_on = [table_id_name_dict[i] for i in base_tables if i not in based_on_tables]
+        first_based_on = {t[0] for t in first_based_on}
+        based_on = self.get_lineage_tables(table.index)
         partitions = cursor.execute("""
                                     SELECT DISTINCT PARTITION_NAME FROM TABLE_PARTITIONS WHERE TARGET_TABLE = ?
                                 """, (table.index,)).fetchall()
@@ -447,13 +957,77 @@ class Store:
                                 """, (table.index,)).fetchall()
         columns = {c[0] for c in columns}
         cursor.close()
-        table.created_in_workflows = list(created_in)
-        table.used_in_workflows = list(used_in)
-        table.updated_in_workflows = list(updated_in)
-        table.based_on_tables = list(based_on)
-        table.partitions = list(partitions)
-        table.columns = list(columns)
-        return table
+        return tuple(created_in), tuple(used_in), tuple(updated_in), tuple(based_on), tuple(first_based_on), \
+            tuple(partitions), tuple(columns)
+
+    def get_lineage_tables(self, table_id: int, downstream: bool = False, max_depth: int = None) -> List[str]:
+        """
+        Finds tables, which table is based on, directly or through other tables
+        :param table_id: table id
+        :param downstream: find tables based on that table instead
+        :param max_depth: max number of based on relations between tables, not limited by default
+        :return: table names
+        """
+        cursor: sqlite3.Cursor = self.reader().cursor()
+        if downstream:
+            sql: str = """
+                SELECT TABLES.NAME FROM TABLE_LINEAGE_CLOSURE JOIN TABLES ON TABLES.ID = TARGET_TABLE AND ANCESTOR = ?
+            """
+        else:
+            sql: str = """
+                SELECT TABLES.NAME FROM TABLE_LINEAGE_CLOSURE JOIN TABLES ON TABLES.ID = ANCESTOR AND TARGET_TABLE = ?
+            """
+        params: Tuple = (table_id,)
+        if max_depth is not None:
+            sql += ' AND DEPTH <= ?'
+            params += (max_depth,)
+        tables: List[Tuple] = cursor.execute(sql, params).fetchall()
+        cursor.close()
+        return [t[0] for t in tables]
+
+    def refresh_lineage_closure(self):
+        """
+        Rebuilds TABLE_LINEAGE_CLOSURE from TABLE_BASED_ON: every table gets all its ancestors with the smallest
+        number of based on relations to them
+        """
+        cursor: sqlite3.Cursor = self.connection.cursor()
+        relations_dict: Dict[int, Set[int]] = {}
+        for r in cursor.execute('SELECT TARGET_TABLE, BASE_TABLE FROM TABLE_BASED_ON;'):
+            if r[0] not in relations_dict:
+                relations_dict[r[0]] = {r[1]}
+            else:
+                relations_dict[r[0]].add(r[1])
+        closure: List[Tuple[int, int, int]] = []
+        for target_table in relations_dict:
+            depths: Dict[int, int] = {}
+            level: Set[int] = relations_dict[target_table]
+            depth: int = 1
+            while len(level):
+                next_level: Set[int] = set()
+                for table_id in level:
+                    depths[table_id] = depth
+                for table_id in level:
+                    next_level.update(relations_dict.get(table_id, set()))
+                level = {t_i for t_i in next_level if t_i not in depths}
+                depth += 1
+            closure.extend((target_table, a, d) for a, d in depths.items())
+        cursor.execute('DELETE FROM TABLE_LINEAGE_CLOSURE;')
+        cursor.executemany("""
+                                INSERT INTO TABLE_LINEAGE_CLOSURE(TARGET_TABLE, ANCESTOR, DEPTH) VALUES(?, ?, ?)
+                            """, closure)
+        self.connection.commit()
+        self.invalidate_cache()
+        cursor.close()
+
+    def refresh_table_usage(self):
+        """
+        Recounts TABLE_USAGE, should be called after tables or their relations are changed
+        """
+        cursor: sqlite3.Cursor = self.connection.cursor()
+        for sql in REFRESH_TABLE_USAGE:
+            cursor.execute(sql)
+        self.connection.commit()
+        cursor.close()
 
     def insert_new_table(self, table_name) -> Table:
         cursor: sqlite3.Cursor = self.connection.cursor()
@@ -462,86 +1036,368 @@ class Store:
             TABLES(ID, NAME, MEANING, AUTHORS)
             VALUES((SELECT MAX(ID) + 1 FROM TABLES), ?, '', '') 
         """, (table_name,))
+        cursor.execute('INSERT OR IGNORE INTO TABLE_USAGE(TABLE_ID) SELECT ID FROM TABLES WHERE NAME = ?;',
+                       (table_name,))
         self.connection.commit()
         cursor.close()
         return self.get_tables_by_names([table_name])[0]
 
+    def import_tables_coroutine(self, table_names: List[str], chunk_size: int = 1000) -> Generator[int, None, int]:
+        """
+        Coroutine, imports tables from hive schema in one transaction: tables, found by full or bare name, are renamed
+        to full name, new ones are inserted, the rest are deleted
+        :param table_names: table names in schema.table form
+        :param chunk_size: number of names staged at once
+        :return: number of tables in schema (yields progress value after each staged chunk)
+        """
+        cursor: sqlite3.Cursor = self.connection.cursor()
+        try:
+            cursor.execute("""
+                CREATE TEMP TABLE IF NOT EXISTS HIVE_SCHEMA_STAGING
+                (
+                    POSITION INTEGER PRIMARY KEY,
+                    NAME TEXT NOT NULL UNIQUE,
+                    ONLY_NAME TEXT NOT NULL
+                );
+            """)
+            cursor.execute('CREATE INDEX IF NOT EXISTS temp.HSS_ONLY_NAME ON HIVE_SCHEMA_STAGING(ONLY_NAME);')
+            cursor.execute('DELETE FROM HIVE_SCHEMA_STAGING;')
+            length: int = len(table_names)
+            for i in range(0, length, chunk_size):
+                cursor.executemany("""
+                    INSERT OR IGNORE INTO HIVE_SCHEMA_STAGING(POSITION, NAME, ONLY_NAME) VALUES(?, ?, ?)
+                """, [(i + j, t_n, t_n.partition('.')[2]) for j, t_n in enumerate(table_names[i:i + chunk_size])])
+                yield int(min(i + chunk_size, length) / length * 90)
+            changes: int = self.connection.total_changes
+            cursor.execute("""
+                UPDATE OR IGNORE TABLES
+                SET NAME = (
+                    SELECT S.NAME FROM HIVE_SCHEMA_STAGING S WHERE S.ONLY_NAME = TABLES.NAME ORDER BY S.POSITION LIMIT 1
+                )
+                WHERE NAME IN (SELECT ONLY_NAME FROM HIVE_SCHEMA_STAGING)
+                AND NAME NOT IN (SELECT NAME FROM HIVE_SCHEMA_STAGING);
+            """)
+            cursor.execute('DELETE FROM TABLES WHERE NAME NOT IN (SELECT NAME FROM HIVE_SCHEMA_STAGING);')
+            cursor.execute("""
+                INSERT INTO TABLES(NAME, MEANING, AUTHORS)
+                SELECT NAME, '', '' FROM HIVE_SCHEMA_STAGING
+                WHERE NAME NOT IN (SELECT NAME FROM TABLES)
+                ORDER BY POSITION;
+            """)
+            if self.connection.total_changes != changes:
+                # workflows were matched against other tables, so all of them are parsed again by the next run
+                cursor.execute('DELETE FROM WORKFLOW_MANIFEST;')
+            cursor.execute('DELETE FROM HIVE_SCHEMA_STAGING;')
+            for sql in REFRESH_TABLE_USAGE:
+                cursor.execute(sql)
+            self.connection.commit()
+            self.invalidate_cache()
+        except BaseException:
+            self.connection.rollback()
+            raise
+        finally:
+            cursor.close()
+        yield 100
+        return length
+
+    def import_table_columns_coroutine(self, chunks: Iterable[Tuple[int, List[Tuple[str, str, str]]]]) -> Generator[
+            int, None, int]:
+        """
+        Coroutine, imports table columns from impala schema in one transaction, columns of unknown tables are skipped
+        :param chunks: (progress, [(table_name, column_name, column_type)]) chunks
+        :return: number of inserted columns (yields progress value after each chunk)
+        """
+        cursor: sqlite3.Cursor = self.connection.cursor()
+        inserted: int = 0
+        try:
+            cursor.execute("""
+                CREATE TEMP TABLE IF NOT EXISTS IMPALA_SCHEMA_STAGING
+                (
+                    TABLE_NAME TEXT NOT NULL,
+                    COLUMN_NAME TEXT NOT NULL,
+                    COLUMN_TYPE TEXT NOT NULL
+                );
+            """)
+            cursor.execute('DELETE FROM IMPALA_SCHEMA_STAGING;')
+            for progress, rows in chunks:
+                cursor.executemany("""
+                    INSERT INTO IMPALA_SCHEMA_STAGING(TABLE_NAME, COLUMN_NAME, COLUMN_TYPE) VALUES(?, ?, ?)
+                """, rows)
+                cursor.execute("""
+                    INSERT OR IGNORE INTO TABLE_COLUMNS(TABLE_ID, COLUMN_NAME, COLUMN_TYPE)
+                    SELECT T.ID, S.COLUMN_NAME, S.COLUMN_TYPE
+                    FROM IMPALA_SCHEMA_STAGING S JOIN TABLES T ON T.NAME = S.TABLE_NAME;
+                """)
+                inserted += cursor.rowcount
+                cursor.execute('DELETE FROM IMPALA_SCHEMA_STAGING;')
+                yield progress
+            if self.search_index:
+                cursor.execute(REFRESH_COLUMNS_SEARCH)
+            self.connection.commit()
+            self.invalidate_cache(workflows=False)
+        except BaseException:
+            self.connection.rollback()
+            raise
+        finally:
+            cursor.close()
+        return inserted
+
     def insert_tables(self, tables: List[Table]):
         cursor: sqlite3.Cursor = self.connection.cursor()
         cursor.executemany("""
                             INSERT OR IGNORE INTO TABLES(ID, NAME, MEANING, AUTHORS, SQOOPED) VALUES(?, ?, ?, ?, ?)
                            """, [(t.index, t.name, t.meaning, t.authors, t.sqooped) for t in tables])
+        cursor.execute('INSERT OR IGNORE INTO TABLE_USAGE(TABLE_ID) SELECT ID FROM TABLES;')
         self.connection.commit()
         cursor.close()
 
-    def insert_sqooped_tables(self, tables: Set[Tuple[int, str, bool]]):
-        insert_tables: List[Tuple[int, str]] = [(t[0], t[1]) for t in tables if t[2]]
-        update_tables: List[Tuple[int, str]] = [(t[0], t[1]) for t in tables if not t[2]]
+    def insert_sqooped_tables(self, tables: Set[Tuple[int, str, bool, int]]):
         cursor: sqlite3.Cursor = self.connection.cursor()
-        cursor.executemany("""
-                            INSERT OR IGNORE INTO TABLES(ID, NAME, MEANING, AUTHORS, SQOOPED) VALUES(?, ?, ?, ?, ?)
-                           """, [(t[0], t[1], '', '', True) for t in insert_tables])
-        cursor.executemany("""
-                                    UPDATE TABLES SET SQOOPED = 1 WHERE ID = ?
-                                   """, [(t[0],) for t in update_tables])
+        self._insert_sqooped_tables(cursor, tables)
         self.connection.commit()
         cursor.close()
 
     def insert_workflows(self, workflows: List[Workflow]):
         cursor: sqlite3.Cursor = self.connection.cursor()
-        cursor.executemany("""
-                            INSERT OR IGNORE INTO WORKFLOWS(ID, NAME) VALUES(?, ?)
-                           """, [(w.index, w.name,) for w in workflows])
+        self._insert_workflows(cursor, [(w.index, w.name) for w in workflows])
         self.connection.commit()
         cursor.close()
 
     def insert_table_created_in(self, created_ins: List[Tuple[int, int]]):
         cursor: sqlite3.Cursor = self.connection.cursor()
-        cursor.executemany("""
-                                INSERT OR IGNORE INTO TABLE_CREATED_IN(CREATED_TABLE, WORKFLOW) VALUES(?, ?)
-                            """, created_ins)
+        self._insert_table_created_in(cursor, created_ins)
         self.connection.commit()
+        self.invalidate_cache(c[0] for c in created_ins)
         cursor.close()
 
     def insert_table_used_in(self, used_ins: List[Tuple[int, int]]):
         cursor: sqlite3.Cursor = self.connection.cursor()
-        cursor.executemany("""
-                                INSERT OR IGNORE INTO TABLE_USED_IN(USED_TABLE, WORKFLOW) VALUES(?, ?)
-                            """, used_ins)
+        self._insert_table_used_in(cursor, used_ins)
         self.connection.commit()
+        self.invalidate_cache(u[0] for u in used_ins)
         cursor.close()
 
-    def insert_table_based_on(self, based_ons: List[Tuple[int, int]]):
+    def insert_table_based_on(self, based_ons: List[Tuple[int, int, int]]):
         cursor: sqlite3.Cursor = self.connection.cursor()
-        cursor.executemany("""
-                                INSERT OR IGNORE INTO TABLE_BASED_ON(TARGET_TABLE, BASE_TABLE) VALUES(?, ?)
-                            """, based_ons)
+        self._insert_table_based_on(cursor, based_ons)
         self.connection.commit()
+        self.invalidate_cache(b[0] for b in based_ons)
         cursor.close()
 
     def insert_table_updated_in(self, updated_ins: List[Tuple[int, int]]):
         cursor: sqlite3.Cursor = self.connection.cursor()
-        cursor.executemany("""
-                                INSERT OR IGNORE INTO TABLE_UPDATED_IN(UPDATED_TABLE, WORKFLOW) VALUES(?, ?)
-                            """, updated_ins)
+        self._insert_table_updated_in(cursor, updated_ins)
         self.connection.commit()
+        self.invalidate_cache(u[0] for u in updated_ins)
         cursor.close()
 
-    def insert_table_partitions(self, table_partitions: List[Tuple[int, str]]):
+    def insert_table_partitions(self, table_partitions: List[Tuple[int, str, int]]):
         cursor: sqlite3.Cursor = self.connection.cursor()
-        cursor.executemany("""
-                                        INSERT OR IGNORE INTO TABLE_PARTITIONS(TARGET_TABLE, PARTITION_NAME) VALUES(?, ?)
-                                    """, table_partitions)
+        self._insert_table_partitions(cursor, table_partitions)
         self.connection.commit()
+        self.invalidate_cache((p[0] for p in table_partitions), workflows=False)
         cursor.close()
 
+    def insert_workflows_results(self, results: List[Tuple[Set[Tuple], ...]],
+                                 manifest: Dict[str, Tuple[int, Dict[str, str]]]):
+        """
+        Inserts parse results of batch of workflows together with their manifest in one savepoint,
+        so interrupted parse run loses only the batch in progress and reparses only workflows missing in manifest
+        :param results: parse_workflow results
+        :param manifest: {workflow_xml_path: (workflow_id, {file_path: digest})} dict of workflows of results
+        """
+        cursor: sqlite3.Cursor = self.connection.cursor()
+        try:
+            cursor.execute('SAVEPOINT WORKFLOWS_BATCH;')
+            for sqooped_tables, workflows, table_based_on, table_created_in, table_partitions, table_updated_in, \
+                    table_used_in in results:
+                self._insert_sqooped_tables(cursor, sqooped_tables)
+                self._insert_workflows(cursor, workflows)
+                self._insert_table_based_on(cursor, table_based_on)
+                self._insert_table_created_in(cursor, table_created_in)
+                self._insert_table_used_in(cursor, table_used_in)
+                self._insert_table_updated_in(cursor, table_updated_in)
+                self._insert_table_partitions(cursor, table_partitions)
+            cursor.executemany("""
+                                INSERT OR REPLACE INTO WORKFLOW_MANIFEST(WORKFLOW_PATH, WORKFLOW, FILE_PATH, DIGEST) 
+                                VALUES(?, ?, ?, ?)
+                            """, [(p, m[0], f_p, d) for p, m in manifest.items() for f_p, d in m[1].items()])
+            cursor.execute('RELEASE WORKFLOWS_BATCH;')
+            self.connection.commit()
+            self.invalidate_cache(p[0] for r in results for relations in r[2:] for p in relations)
+        except BaseException:
+            cursor.execute('ROLLBACK TO WORKFLOWS_BATCH;')
+            cursor.execute('RELEASE WORKFLOWS_BATCH;')
+            raise
+        finally:
+            cursor.close()
+
+    @staticmethod
+    def _insert_sqooped_tables(cursor: sqlite3.Cursor, tables: Iterable[Tuple[int, str, bool, int]]):
+        tables = list(tables)
+        insert_tables: List[Tuple[int, str]] = [(t[0], t[1]) for t in tables if t[2]]
+        update_tables: List[Tuple[int, str]] = [(t[0], t[1]) for t in tables if not t[2]]
+        cursor.executemany("""
+                            INSERT OR IGNORE INTO TABLES(ID, NAME, MEANING, AUTHORS, SQOOPED) VALUES(?, ?, ?, ?, ?)
+                           """, [(t[0], t[1], '', '', True) for t in insert_tables])
+        cursor.executemany("""
+                                    UPDATE TABLES SET SQOOPED = 1 WHERE ID = ?
+                                   """, [(t[0],) for t in update_tables])
+        if len(insert_tables):
+            cursor.executemany('INSERT OR IGNORE INTO TABLE_USAGE(TABLE_ID) VALUES(?);',
+                               [(t[0],) for t in insert_tables])
+        cursor.executemany("""
+                                INSERT OR IGNORE INTO TABLE_SQOOPED_IN(SQOOPED_TABLE, WORKFLOW) VALUES(?, ?)
+                            """, [(t[0], t[3]) for t in tables])
+
+    @staticmethod
+    def _insert_workflows(cursor: sqlite3.Cursor, workflows: Iterable[Tuple[int, str]]):
+        cursor.executemany("""
+                            INSERT OR IGNORE INTO WORKFLOWS(ID, NAME) VALUES(?, ?)
+                           """, workflows)
+
+    @staticmethod
+    def _insert_table_created_in(cursor: sqlite3.Cursor, created_ins: Iterable[Tuple[int, int]]):
+        cursor.executemany("""
+                                INSERT OR IGNORE INTO TABLE_CREATED_IN(CREATED_TABLE, WORKFLOW) VALUES(?, ?)
+                            """, created_ins)
+
+    @staticmethod
+    def _insert_table_used_in(cursor: sqlite3.Cursor, used_ins: Iterable[Tuple[int, int]]):
+        cursor.executemany("""
+                                INSERT OR IGNORE INTO TABLE_USED_IN(USED_TABLE, WORKFLOW) VALUES(?, ?)
+                            """, used_ins)
+
+    @staticmethod
+    def _insert_table_based_on(cursor: sqlite3.Cursor, based_ons: Iterable[Tuple[int, int, int]]):
+        cursor.executemany("""
+                                INSERT OR IGNORE INTO TABLE_BASED_ON(TARGET_TABLE, BASE_TABLE) VALUES(?, ?)
+                            """, [(b[0], b[1]) for b in based_ons])
+        cursor.executemany("""
+                                INSERT OR IGNORE INTO TABLE_BASED_ON_IN(TARGET_TABLE, BASE_TABLE, WORKFLOW) 
+                                VALUES(?, ?, ?)
+                            """, based_ons)
+
+    @staticmethod
+    def _insert_table_updated_in(cursor: sqlite3.Cursor, updated_ins: Iterable[Tuple[int, int]]):
+        cursor.executemany("""
+                                INSERT OR IGNORE INTO TABLE_UPDATED_IN(UPDATED_TABLE, WORKFLOW) VALUES(?, ?)
+                            """, updated_ins)
+
+    @staticmethod
+    def _insert_table_partitions(cursor: sqlite3.Cursor, table_partitions: Iterable[Tuple[int, str, int]]):
+        table_partitions = list(table_partitions)
+        cursor.executemany("""
+                                        INSERT OR IGNORE INTO TABLE_PARTITIONS(TARGET_TABLE, PARTITION_NAME) VALUES(?, ?)
+                                    """, [(p[0], p[1]) for p in table_partitions])
+        cursor.executemany("""
+                                INSERT OR IGNORE INTO TABLE_PARTITIONS_IN(TARGET_TABLE, PARTITION_NAME, WORKFLOW) 
+                                VALUES(?, ?, ?)
+                            """, table_partitions)
+
     def insert_table_columns(self, table_columns: List[Tuple[int, str, str]]):
         cursor: sqlite3.Cursor = self.connection.cursor()
         cursor.executemany("""
                                         INSERT OR IGNORE INTO TABLE_COLUMNS(TABLE_ID, COLUMN_NAME, COLUMN_TYPE) 
                                         VALUES(?, ?, ?);
                                         """, table_columns)
+        if self.search_index:
+            cursor.execute(REFRESH_COLUMNS_SEARCH)
+        self.connection.commit()
+        self.invalidate_cache((c[0] for c in table_columns), workflows=False)
+        cursor.close()
+
+    def get_workflow_manifest(self) -> Dict[str, Tuple[int, Dict[str, str]]]:
+        cursor: sqlite3.Cursor = self.reader().cursor()
+        rows: List[Tuple] = cursor.execute(
+            'SELECT WORKFLOW_PATH, WORKFLOW, FILE_PATH, DIGEST FROM WORKFLOW_MANIFEST'
+        ).fetchall()
+        cursor.close()
+        manifest: Dict[str, Tuple[int, Dict[str, str]]] = {}
+        for r in rows:
+            if r[0] not in manifest:
+                manifest[r[0]] = (r[1], {})
+            manifest[r[0]][1][r[2]] = r[3]
+        return manifest
+
+    def prune_workflow_manifest(self, workflow_xml_paths: Iterable[str]):
+        """
+        Deletes manifest of workflows, which are not in repository anymore, and workflows, which are not in manifest
+        :param workflow_xml_paths: paths to workflow.xml of all workflows in repository
+        """
+        cursor: sqlite3.Cursor = self.connection.cursor()
+        kept: Set[str] = set(workflow_xml_paths)
+        removed: List[Tuple[str]] = [r for r in cursor.execute('SELECT DISTINCT WORKFLOW_PATH FROM WORKFLOW_MANIFEST')
+                                     if r[0] not in kept]
+        cursor.executemany('DELETE FROM WORKFLOW_MANIFEST WHERE WORKFLOW_PATH = ?', removed)
+        cursor.execute('DELETE FROM WORKFLOWS WHERE ID NOT IN (SELECT WORKFLOW FROM WORKFLOW_MANIFEST)')
+        self.connection.commit()
+        self.invalidate_cache()
+        cursor.close()
+
+    def get_hql_parse_cache(self) -> List[Tuple[str, str]]:
+        """
+        :return: (key, json result) pairs of cached hive scripts parse results from the least to the most recently used
+        """
+        cursor: sqlite3.Cursor = self.reader().cursor()
+        entries: List[Tuple[str, str]] = cursor.execute(
+            'SELECT KEY, RESULT FROM HQL_PARSE_CACHE ORDER BY POSITION'
+        ).fetchall()
+        cursor.close()
+        return entries
+
+    def replace_hql_parse_cache(self, entries: Iterable[Tuple[str, str]]):
+        """
+        Saves cached hive scripts parse results
+        :param entries: (key, json result) pairs from the least to the most recently used
+        """
+        cursor: sqlite3.Cursor = self.connection.cursor()
+        cursor.execute('DELETE FROM HQL_PARSE_CACHE')
+        cursor.executemany('INSERT INTO HQL_PARSE_CACHE(KEY, RESULT, POSITION) VALUES(?, ?, ?)',
+                           [(e[0], e[1], i) for i, e in enumerate(entries)])
+        self.connection.commit()
+        cursor.close()
+
+    def delete_workflows_relations(self, workflow_ids: Set[int]):
+        """
+        Deletes relations found in workflows and their manifest, so they are parsed again even if the run,
+        which replaces them, is interrupted. Based on relations and partitions are deleted and tables are not sqooped
+        anymore if no other workflow has them
+        :param workflow_ids: ids of workflows
+        """
+        cursor: sqlite3.Cursor = self.connection.cursor()
+        cursor.execute('CREATE TEMP TABLE IF NOT EXISTS STALE_WORKFLOWS(ID INTEGER PRIMARY KEY)')
+        cursor.execute('DELETE FROM STALE_WORKFLOWS')
+        cursor.executemany('INSERT OR IGNORE INTO STALE_WORKFLOWS(ID) VALUES(?)', [(w_i,) for w_i in workflow_ids])
+        cursor.execute('DELETE FROM TABLE_CREATED_IN WHERE WORKFLOW IN (SELECT ID FROM STALE_WORKFLOWS)')
+        cursor.execute('DELETE FROM TABLE_USED_IN WHERE WORKFLOW IN (SELECT ID FROM STALE_WORKFLOWS)')
+        cursor.execute('DELETE FROM TABLE_UPDATED_IN WHERE WORKFLOW IN (SELECT ID FROM STALE_WORKFLOWS)')
+        cursor.execute('DELETE FROM TABLE_BASED_ON_IN WHERE WORKFLOW IN (SELECT ID FROM STALE_WORKFLOWS)')
+        cursor.execute('DELETE FROM TABLE_PARTITIONS_IN WHERE WORKFLOW IN (SELECT ID FROM STALE_WORKFLOWS)')
+        cursor.execute('DELETE FROM TABLE_SQOOPED_IN WHERE WORKFLOW IN (SELECT ID FROM STALE_WORKFLOWS)')
+        cursor.execute('DELETE FROM WORKFLOW_MANIFEST WHERE WORKFLOW IN (SELECT ID FROM STALE_WORKFLOWS)')
+        cursor.execute("""
+            DELETE FROM TABLE_BASED_ON 
+            WHERE NOT EXISTS (
+                SELECT 1 FROM TABLE_BASED_ON_IN TBOI 
+                WHERE TBOI.TARGET_TABLE = TABLE_BASED_ON.TARGET_TABLE AND TBOI.BASE_TABLE = TABLE_BASED_ON.BASE_TABLE
+            )
+        """)
+        cursor.execute("""
+            DELETE FROM TABLE_PARTITIONS 
+            WHERE NOT EXISTS (
+                SELECT 1 FROM TABLE_PARTITIONS_IN TPI 
+                WHERE TPI.TARGET_TABLE = TABLE_PARTITIONS.TARGET_TABLE 
+                AND TPI.PARTITION_NAME = TABLE_PARTITIONS.PARTITION_NAME
+            )
+        """)
+        cursor.execute("""
+            UPDATE TABLES SET SQOOPED = 0 
+            WHERE SQOOPED = 1 AND NOT EXISTS (SELECT 1 FROM TABLE_SQOOPED_IN WHERE SQOOPED_TABLE = TABLES.ID)
+        """)
+        cursor.execute('DELETE FROM STALE_WORKFLOWS')
         self.connection.commit()
+        self.invalidate_cache()
         cursor.close()
 
     def delete_tables(self, except_table_names: Tuple = tuple()):
@@ -553,5 +1409,10 @@ class Store:
             sql = sql[:-1]
         sql += """)"""
         cursor.execute(sql)
+        if cursor.rowcount:
+            cursor.execute('DELETE FROM WORKFLOW_MANIFEST;')
+        for sql in REFRESH_TABLE_USAGE:
+            cursor.execute(sql)
         self.connection.commit()
+        self.invalidate_cache()
         cursor.close()
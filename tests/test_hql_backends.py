@@ -0,0 +1,35 @@
+import glob
+import os
+import unittest
+from typing import Dict
+
+from parsing_tool import HQL_BACKENDS
+
+FIXTURES_DIR: str = os.path.join(os.path.dirname(__file__), 'fixtures', 'hql')
+# number of CREATE, INSERT and WITH statements in every fixture
+STATEMENTS_COUNTS: Dict[str, int] = {
+    'backticks.hql': 2,
+    'comments.hql': 2,
+    'quoted_semicolons.hql': 2,
+    'variables.hql': 2,
+}
+
+
+class HqlBackendsTest(unittest.TestCase):
+    def test_fixtures_are_listed(self):
+        self.assertEqual(sorted(STATEMENTS_COUNTS),
+                         sorted(os.path.basename(p) for p in glob.glob(os.path.join(FIXTURES_DIR, '*.hql'))))
+
+    def test_backends_split_fixtures_equally(self):
+        for file_name, statements_count in STATEMENTS_COUNTS.items():
+            with open(os.path.join(FIXTURES_DIR, file_name), 'r') as file:
+                script_text: str = file.read()
+            statements = {backend: list(splitter(script_text)) for backend, splitter in HQL_BACKENDS.items()}
+            with self.subTest(script=file_name):
+                self.assertEqual(len(statements['fast']), statements_count)
+                for backend, backend_statements in statements.items():
+                    self.assertEqual(backend_statements, statements['fast'], backend)
+
+
+if __name__ == '__main__':
+    unittest.main()
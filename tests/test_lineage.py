@@ -0,0 +1,48 @@
+import unittest
+
+from lineage import LineageGraph
+
+
+def build_graph() -> LineageGraph:
+    """
+    src.a -> stg.b -> dm.c -> dm.d and src.a -> dm.d, src.e is not related to any table,
+    load_b reads src.a and writes stg.b, build_d reads stg.b and dm.c and writes dm.c and dm.d
+    """
+    graph: LineageGraph = LineageGraph()
+    graph.workflow_edges = {
+        1: ((), (((2, 1),), (1,), (2,))),
+        2: ((), (((3, 2), (4, 3), (4, 1)), (2, 3), (3, 4))),
+    }
+    graph.build([(1, 'src.a'), (2, 'stg.b'), (3, 'dm.c'), (4, 'dm.d'), (5, 'src.e')],
+                [(1, 'load_b'), (2, 'build_d')])
+    return graph
+
+
+class LineageGraphTest(unittest.TestCase):
+    def setUp(self):
+        self.graph: LineageGraph = build_graph()
+
+    def test_upstream_and_downstream(self):
+        self.assertEqual(self.graph.upstream('dm.d'), {'dm.c': 1, 'src.a': 1, 'stg.b': 2})
+        self.assertEqual(self.graph.downstream('src.a', max_depth=1), {'stg.b': 1, 'dm.d': 1})
+
+    def test_neighborhood(self):
+        self.assertEqual(self.graph.neighborhood('stg.b'), {'src.a', 'dm.c'})
+        self.assertEqual(self.graph.neighborhood('stg.b', depth=2), {'src.a', 'dm.c', 'dm.d'})
+        self.assertEqual(self.graph.neighborhood('src.e', depth=3), set())
+
+    def test_shortest_path(self):
+        self.assertEqual(self.graph.shortest_path('src.a', 'dm.d'), ['src.a', 'dm.d'])
+        self.assertEqual(self.graph.shortest_path('stg.b', 'dm.d'), ['stg.b', 'dm.c', 'dm.d'])
+        self.assertEqual(self.graph.shortest_path('src.a', 'src.a'), ['src.a'])
+        self.assertEqual(self.graph.shortest_path('dm.d', 'src.a'), [])
+        self.assertEqual(self.graph.shortest_path('src.a', 'src.e'), [])
+
+    def test_workflow_dependencies(self):
+        self.assertEqual(self.graph.workflow_dependencies('build_d'), {'load_b': 1})
+        self.assertEqual(self.graph.workflow_dependencies('load_b', dependents=True), {'build_d': 1})
+        self.assertEqual(self.graph.related_tables('build_d', 'load_b'), ['stg.b'])
+
+
+if __name__ == '__main__':
+    unittest.main()
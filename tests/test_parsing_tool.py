@@ -0,0 +1,53 @@
+import os
+import shutil
+import tempfile
+import unittest
+from typing import Dict
+
+from parsing_tool import WorkflowRepository
+
+WORKFLOW_XML: str = '''<workflow-app xmlns="uri:oozie:workflow:0.5" name="{name}">
+<start to="end"/>
+{actions}
+<end name="end"/>
+</workflow-app>
+'''
+SUB_WORKFLOW_ACTION: str = '''<action name="sub"><sub-workflow><app-path>{app_path}</app-path></sub-workflow>
+<ok to="end"/><error to="end"/></action>'''
+COORDINATOR_XML: str = '''<coordinator-app xmlns="uri:oozie:coordinator:0.4" name="nightly">
+<action><workflow><app-path>${{nameNode}}/apps/{app_path}</app-path></workflow></action>
+</coordinator-app>
+'''
+
+
+class WorkflowRepositoryTest(unittest.TestCase):
+    def setUp(self):
+        self.dir: str = tempfile.mkdtemp(prefix='oozie_repository_test_')
+
+    def tearDown(self):
+        shutil.rmtree(self.dir, ignore_errors=True)
+
+    def write(self, files: Dict[str, str]) -> None:
+        for path, text in files.items():
+            os.makedirs(os.path.dirname(os.path.join(self.dir, path)), exist_ok=True)
+            with open(os.path.join(self.dir, path), 'w') as file:
+                file.write(text)
+
+    def test_roots_at_any_depth(self):
+        self.write({
+            'top/workflow.xml': WORKFLOW_XML.format(
+                name='top', actions=SUB_WORKFLOW_ACTION.format(app_path='../shared/common')),
+            'shared/common/workflow.xml': WORKFLOW_XML.format(name='common', actions=''),
+            'teams/dm/nightly/workflow.xml': WORKFLOW_XML.format(name='nightly', actions=''),
+            'coordinators/nightly/coordinator.xml': COORDINATOR_XML.format(app_path='teams/dm/nightly'),
+        })
+        repository: WorkflowRepository = WorkflowRepository(self.dir)
+        self.assertEqual(sorted(os.path.relpath(p, self.dir) for p in repository.roots),
+                         ['teams/dm/nightly/workflow.xml', 'top/workflow.xml'])
+        nightly: str = os.path.join(self.dir, 'teams', 'dm', 'nightly', 'workflow.xml')
+        self.assertIn(os.path.join(self.dir, 'coordinators', 'nightly', 'coordinator.xml'),
+                      repository.digests(nightly))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,215 @@
+import os
+import re
+import shutil
+import sqlite3
+import tempfile
+import unittest
+from array import array
+from typing import List, Tuple, Dict, Set
+from unittest import mock
+
+import store as store_module
+from jobs import run_job, hive_schema_job
+from store import Store, Table, Workflow, MIGRATIONS, SEARCH_MIN_LENGTH, supports_search_index
+
+SEARCH_INDEX: bool = supports_search_index(sqlite3.connect(':memory:'))
+
+# (query pattern, scanned table) of known full scans of find_full_scans queries
+ALLOWED_FULL_SCANS: List[Tuple[str, str]] = [
+    # get_tables returns all tables
+    (r'^SELECT ID, NAME, MEANING, AUTHORS, SQOOPED, COLOR, .* FROM TABLES LEFT JOIN TABLE_USAGE ', 'TABLES'),
+    # search texts shorter than trigram are matched with instr in list order
+    (rf"^SELECT ID FROM TABLES WHERE instr\(lower\(NAME\), lower\('.{{0,{SEARCH_MIN_LENGTH - 1}}}'\)\) > 0 ",
+     'TABLES'),
+    (rf"^SELECT ID FROM WORKFLOWS WHERE instr\(lower\(NAME\), lower\('.{{0,{SEARCH_MIN_LENGTH - 1}}}'\)\) > 0 ",
+     'WORKFLOWS'),
+]
+# without search index every search text is matched with instr in list order
+ALLOWED_FULL_SCANS_WITHOUT_SEARCH_INDEX: List[Tuple[str, str]] = ALLOWED_FULL_SCANS[:1] + [
+    (r'^SELECT ID FROM TABLES WHERE instr\(lower\(NAME\), lower\(', 'TABLES'),
+    (r'^SELECT ID FROM WORKFLOWS WHERE instr\(lower\(NAME\), lower\(', 'WORKFLOWS'),
+]
+
+
+def build_store(db_name: str) -> Store:
+    """
+    Small store: dm.orders is based on src.orders in workflow load_orders, src.unused has no relations,
+    src.orphan has no TABLE_USAGE row at all
+    """
+    store: Store = Store(db_name)
+    store.insert_tables([Table(1, 'src.orders', '', '', False), Table(2, 'dm.orders', '', '', False),
+                         Table(3, 'src.unused', '', '', False)])
+    store.insert_workflows([Workflow(1, 'load_orders')])
+    store.insert_table_based_on([(2, 1, 1)])
+    store.insert_table_created_in([(2, 1)])
+    store.insert_table_used_in([(1, 1)])
+    store.refresh_lineage_closure()
+    store.refresh_table_usage()
+    store.connection.execute("INSERT INTO TABLES(ID, NAME, MEANING, AUTHORS, SQOOPED) "
+                             "VALUES(4, 'src.orphan', '', '', 0)")
+    store.connection.commit()
+    return store
+
+
+def find_full_scans(store: Store) -> Dict[str, List[str]]:
+    """
+    Runs hot lookups of the GUI for the first workflow and table, listing and search queries of tables
+    and workflows lists and checks their query plans, full text index lookups are not scans
+    :return: {sql: query plan} dict of queries, which scan whole tables
+    """
+    connection: sqlite3.Connection = store.reader()
+    db_tables: Set[str] = {t[0] for t in connection.execute(
+        "SELECT NAME FROM sqlite_master WHERE TYPE = 'table'").fetchall()}
+    queries: List[str] = []
+    store.invalidate_cache()
+    workflows: List[Workflow] = store.get_workflows_by_names(store.get_workflows(only_names=True)[:1])
+    tables: List[Table] = store.get_tables_by_names(store.get_tables(only_names=True)[:1])
+    connection.set_trace_callback(queries.append)
+    try:
+        for workflow in workflows:
+            store.get_workflows_by_names([workflow.name])
+            store.populate_workflow_data(workflow)
+        for table in tables:
+            store.get_tables_by_names([table.name])
+            store.populate_table_data(table)
+            store.get_lineage_tables(table.index, downstream=True)
+        search_text: str = tables[0].name[-SEARCH_MIN_LENGTH:] if len(tables) else 'a' * SEARCH_MIN_LENGTH
+        for text in ('', search_text[:1], search_text):
+            store.get_tables(text, only_names=True)
+            ids: array = store.get_table_list_ids(text)
+            store.get_table_list_ids(text, only_unplugged=True)
+            store.get_list_rows('TABLES', list(ids[:50]))
+            ids = store.get_workflow_list_ids(text)
+            store.get_list_rows('WORKFLOWS', list(ids[:50]))
+        store.get_tables(only_unplugged=True, only_names=True)
+    finally:
+        connection.set_trace_callback(None)
+    full_scans: Dict[str, List[str]] = {}
+    for sql in queries:
+        if not sql.lstrip().upper().startswith('SELECT'):
+            continue
+        plan: List[str] = [r[3] for r in connection.execute('EXPLAIN QUERY PLAN ' + sql).fetchall()]
+        if any(p.startswith('SCAN ') and p.split(' ')[1] in db_tables and ' VIRTUAL TABLE ' not in p for p in plan):
+            full_scans[sql] = plan
+    return full_scans
+
+
+class StoreTest(unittest.TestCase):
+    def setUp(self):
+        self.dir: str = tempfile.mkdtemp(prefix='oozie_store_test_')
+        self.store: Store = build_store(os.path.join(self.dir, 'test.sqlite3'))
+
+    def tearDown(self):
+        self.store.close()
+        shutil.rmtree(self.dir, ignore_errors=True)
+
+    def test_unplugged_tables(self):
+        self.assertEqual(sorted(self.store.get_tables(only_unplugged=True, only_names=True)),
+                         ['src.orphan', 'src.unused'])
+        self.assertEqual(sorted(self.store.get_table_list_ids(only_unplugged=True)), [3, 4])
+        self.assertEqual(sorted(self.store.get_table_list_ids('src', only_unplugged=True)), [3, 4])
+
+    def test_hive_schema_import_skips_malformed_lines(self):
+        schema_filepath: str = os.path.join(self.dir, 'hive_structure.csv')
+        with open(schema_filepath, 'w') as file:
+            file.write('schema_name,table_name\nsrc,orders\ndm, orders \nbroken\n,no_schema\n\n')
+        self.assertEqual(run_job(self.store, hive_schema_job(schema_filepath)), 2)
+        self.assertEqual(sorted(self.store.get_tables(only_names=True)), ['dm.orders', 'src.orders'])
+
+    def test_hive_schema_change_resets_workflow_manifest(self):
+        self.store.connection.execute("INSERT INTO WORKFLOW_MANIFEST(WORKFLOW_PATH, WORKFLOW, FILE_PATH, DIGEST) "
+                                      "VALUES('load_orders/workflow.xml', 1, 'load_orders/workflow.xml', 'x')")
+        self.store.connection.commit()
+        schema_filepath: str = os.path.join(self.dir, 'hive_structure.csv')
+        with open(schema_filepath, 'w') as file:
+            file.write('schema_name,table_name\nsrc,orders\ndm,orders\nsrc,unused\nsrc,orphan\n')
+        run_job(self.store, hive_schema_job(schema_filepath))
+        self.assertEqual(len(self.store.get_workflow_manifest()), 1)
+        with open(schema_filepath, 'a') as file:
+            file.write('dm,orders_daily\n')
+        run_job(self.store, hive_schema_job(schema_filepath))
+        self.assertEqual(self.store.get_workflow_manifest(), {})
+
+    def test_stale_workflows_partitions_and_sqooped_tables_are_deleted(self):
+        self.store.insert_workflows([Workflow(2, 'load_orders_daily')])
+        self.store.insert_sqooped_tables({(1, 'src.orders', False, 1), (3, 'src.unused', False, 1),
+                                          (3, 'src.unused', False, 2)})
+        self.store.insert_table_partitions([(2, 'dt', 1), (2, 'region', 1), (2, 'dt', 2)])
+        self.store.delete_workflows_relations({1})
+        tables: Dict[str, Table] = {t.name: t for t in self.store.get_tables()}
+        self.assertFalse(tables['src.orders'].sqooped)
+        self.assertTrue(tables['src.unused'].sqooped)
+        self.assertEqual(self.store.connection.execute(
+            'SELECT TARGET_TABLE, PARTITION_NAME FROM TABLE_PARTITIONS').fetchall(), [(2, 'dt')])
+
+    def assert_full_scans_allowed(self, store: Store, allowed_full_scans: List[Tuple[str, str]]):
+        for sql, plan in find_full_scans(store).items():
+            sql = ' '.join(sql.split())
+            scanned: List[str] = [p.split(' ')[1] for p in plan if p.startswith('SCAN ')]
+            with self.subTest(sql=sql):
+                for table in scanned:
+                    self.assertTrue(any(re.match(pattern, sql) and table == allowed_table
+                                        for pattern, allowed_table in allowed_full_scans), plan)
+
+    @unittest.skipUnless(SEARCH_INDEX, 'sqlite has no fts5 trigram tokenizer')
+    def test_no_unexpected_full_scans(self):
+        self.assertTrue(self.store.search_index)
+        self.assert_full_scans_allowed(self.store, ALLOWED_FULL_SCANS)
+
+    def test_no_unexpected_full_scans_without_search_index(self):
+        with mock.patch.object(store_module, 'supports_search_index', return_value=False):
+            store: Store = build_store(os.path.join(self.dir, 'no_search_index.sqlite3'))
+        self.assertFalse(store.search_index)
+        self.assert_full_scans_allowed(store, ALLOWED_FULL_SCANS_WITHOUT_SEARCH_INDEX)
+        store.close()
+
+
+class MigrationTest(unittest.TestCase):
+    def setUp(self):
+        self.dir: str = tempfile.mkdtemp(prefix='oozie_store_test_')
+        self.db_name: str = os.path.join(self.dir, 'test.sqlite3')
+
+    def tearDown(self):
+        shutil.rmtree(self.dir, ignore_errors=True)
+
+    def open_store(self, search_index: bool) -> Store:
+        with mock.patch.object(store_module, 'supports_search_index', return_value=search_index):
+            return Store(self.db_name)
+
+    @unittest.skipUnless(SEARCH_INDEX, 'sqlite has no fts5 trigram tokenizer')
+    def test_search_index_is_skipped_and_built_later(self):
+        store: Store = self.open_store(False)
+        self.assertFalse(store.search_index)
+        store.insert_tables([Table(1, 'src.orders', '', '', False), Table(2, 'dm.orders', '', '', False)])
+        self.assertEqual(list(store.get_table_list_ids('ORDERS')), [2, 1])
+        store.close()
+        store = self.open_store(True)
+        self.assertEqual(list(store.get_table_list_ids('src.ord')), [1])
+        store.close()
+
+    @unittest.skipUnless(SEARCH_INDEX, 'sqlite has no fts5 trigram tokenizer')
+    def test_search_triggers_are_dropped_without_search_index(self):
+        self.open_store(True).close()
+        store: Store = self.open_store(False)
+        store.insert_tables([Table(1, 'src.orders', '', '', False)])
+        store.insert_workflows([Workflow(1, 'load_orders')])
+        store.close()
+        store = self.open_store(True)
+        self.assertEqual(list(store.get_table_list_ids('orders')), [1])
+        self.assertEqual(list(store.get_workflow_list_ids('load')), [1])
+        store.close()
+
+    def test_failed_migration_is_rolled_back(self):
+        store: Store = self.open_store(SEARCH_INDEX)
+        broken: List[str] = ['CREATE TABLE BROKEN(ID);', 'SELECT * FROM MISSING;']
+        with mock.patch.object(store_module, 'MIGRATIONS', MIGRATIONS + [broken]):
+            with self.assertRaises(sqlite3.OperationalError):
+                store.migrate()
+        self.assertFalse(store.connection.in_transaction)
+        self.assertEqual(store.connection.execute('PRAGMA user_version;').fetchone()[0], len(MIGRATIONS))
+        self.assertIsNone(store.connection.execute("SELECT 1 FROM sqlite_master WHERE NAME = 'BROKEN'").fetchone())
+        store.close()
+
+
+if __name__ == '__main__':
+    unittest.main()